@@ -119,6 +119,7 @@ class ArchWorkbench(Workbench):
         FreeCADGui.addPreferencePage(":/ui/preferences-archdefaults.ui","Arch")
         FreeCADGui.addPreferencePage(":/ui/preferences-ifc.ui","Import-Export")
         FreeCADGui.addPreferencePage(":/ui/preferences-dae.ui","Import-Export")
+        FreeCADGui.addPreferencePage(":/ui/preferences-obj.ui","Import-Export")
         if hasattr(FreeCADGui,"draftToolBar"):
             if not hasattr(FreeCADGui.draftToolBar,"loadedPreferences"):
                 FreeCADGui.addPreferencePage(":/ui/preferences-draft.ui","Draft")
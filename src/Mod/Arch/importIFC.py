@@ -25,7 +25,7 @@ __title__ =  "FreeCAD IFC importer - Enhanced ifcopenshell-only version"
 __author__ = "Yorik van Havre"
 __url__ =    "http://www.freecadweb.org"
 
-import os,time,tempfile,uuid,FreeCAD,Part,Draft,Arch,math,DraftVecUtils
+import os,sys,time,tempfile,uuid,FreeCAD,Part,Draft,Arch,math,DraftVecUtils
 
 if open.__module__ == '__builtin__':
     pyopen = open # because we'll redefine open below
@@ -105,6 +105,64 @@ def decode(filename,utf=False):
         filename = filename.encode(encoding)
     return filename
 
+class PhaseTimer:
+    "PhaseTimer(): records the time spent in the successive phases of an import"
+
+    def __init__(self):
+        self.phases = []
+        self.last = time.time()
+
+    def mark(self,phase):
+        "records the time elapsed since the previous mark under the given phase name"
+        now = time.time()
+        self.phases.append((phase,now-self.last))
+        self.last = now
+
+    def report(self):
+        "prints the time spent in each phase"
+        print "Import timings:"
+        for phase,t in self.phases:
+            print "    ",phase,": %.3fs" % t
+        print "     total: %.3fs" % sum([t for phase,t in self.phases])
+
+def getGeometrySettings(flags):
+    """getGeometrySettings(flags): returns ifcopenshell geometry settings with the given
+    flags (names of settings attributes) set, and the list of flags that could not be set"""
+    import ifcopenshell
+    from ifcopenshell import geom
+    settings = ifcopenshell.geom.settings()
+    failed = []
+    for flag in flags:
+        try:
+            settings.set(getattr(settings,flag),True)
+        except:
+            failed.append(flag)
+    return settings,failed
+
+def getGeometryPool(processes,filename,flags):
+    """getGeometryPool(processes,filename,flags): returns a pool of processes creating the
+    geometry of the products of the given file with getGeometry, or None if not possible"""
+    pool = Draft.getProcessPool(processes,initGeometryWorker,(filename,flags))
+    if not pool:
+        FreeCAD.Console.PrintWarning("Unable to start the geometry processes, creating the geometry in FreeCAD\n")
+    return pool
+
+def initGeometryWorker(filename,flags):
+    "opens the IFC file in a geometry process"
+    global ifcopenshell,workerfile,workersettings
+    import ifcopenshell
+    workerfile = ifcopenshell.open(filename)
+    workersettings = getGeometrySettings(flags)[0]
+
+def getGeometry(pid):
+    "returns (id,brep) of the given product, run by the geometry processes. brep is None if the product has no shape"
+    try:
+        cr = ifcopenshell.geom.create_shape(workersettings,workerfile[pid])
+        return pid,cr.geometry.brep_data
+    except RuntimeError:
+        # IfcOpenShell yields an error if the product has no shape
+        return pid,None
+
 def doubleClickTree(item,column):
     txt = item.text(column)
     if "Entity #" in txt:
@@ -297,6 +355,7 @@ def insert(filename,docname,skip=[],only=[],root=None):
         ROOT_ELEMENT = root
     MERGE_MODE_ARCH = p.GetInt("ifcImportModeArch",0)
     MERGE_MODE_STRUCT = p.GetInt("ifcImportModeStruct",1)
+    PROCESSES = p.GetInt("ifcImportProcesses",1)
     if MERGE_MODE_ARCH > 0:
         SEPARATE_OPENINGS = False
         GET_EXTRUSIONS = False
@@ -309,6 +368,7 @@ def insert(filename,docname,skip=[],only=[],root=None):
         FreeCAD.Console.PrintError("IfcOpenShell was not found on this system. IFC support is disabled\n")
         return
 
+    timer = PhaseTimer()
     if DEBUG: print "Opening ",filename,"...",
     try:
         doc = FreeCAD.getDocument(docname)
@@ -322,18 +382,15 @@ def insert(filename,docname,skip=[],only=[],root=None):
     filename = decode(filename,utf=True)
     ifcfile = ifcopenshell.open(filename)
     from ifcopenshell import geom
-    settings = ifcopenshell.geom.settings()
-    settings.set(settings.USE_BREP_DATA,True)
-    settings.set(settings.SEW_SHELLS,True)
-    settings.set(settings.USE_WORLD_COORDS,True)
+    geomflags = ["USE_BREP_DATA","SEW_SHELLS","USE_WORLD_COORDS"]
     if SEPARATE_OPENINGS:
-        settings.set(settings.DISABLE_OPENING_SUBTRACTIONS,True)
+        geomflags.append("DISABLE_OPENING_SUBTRACTIONS")
     if MERGE_MODE_STRUCT != 3:
-        try:
-            settings.set(settings.INCLUDE_CURVES,True)
-        except:
-            FreeCAD.Console.PrintError("Set INCLUDE_CURVES failed. IfcOpenShell seams to be an Outdated Developer Version.\n")
-            FreeCAD.Console.PrintError("Import of StructuralAnalysisView Entities will not work!\n")
+        geomflags.append("INCLUDE_CURVES")
+    settings,failed = getGeometrySettings(geomflags)
+    if "INCLUDE_CURVES" in failed:
+        FreeCAD.Console.PrintError("Set INCLUDE_CURVES failed. IfcOpenShell seams to be an Outdated Developer Version.\n")
+        FreeCAD.Console.PrintError("Import of StructuralAnalysisView Entities will not work!\n")
     sites = ifcfile.by_type("IfcSite")
     buildings = ifcfile.by_type("IfcBuilding")
     floors = ifcfile.by_type("IfcBuildingStorey")
@@ -342,6 +399,7 @@ def insert(filename,docname,skip=[],only=[],root=None):
     annotations = ifcfile.by_type("IfcAnnotation")
     materials = ifcfile.by_type("IfcMaterial")
 
+    timer.mark("opening")
     if DEBUG: print "Building relationships table...",
 
     # building relations tables
@@ -355,21 +413,38 @@ def insert(filename,docname,skip=[],only=[],root=None):
     structshapes = {} # { id:shaoe } only used for merge mode
     mattable = {} # { objid:matid }
     sharedobjects = {} # { representationmapid:object }
-    for r in ifcfile.by_type("IfcRelContainedInSpatialStructure"):
-        additions.setdefault(r.RelatingStructure.id(),[]).extend([e.id() for e in r.RelatedElements])
-    for r in ifcfile.by_type("IfcRelAggregates"):
-        additions.setdefault(r.RelatingObject.id(),[]).extend([e.id() for e in r.RelatedObjects])
-    for r in ifcfile.by_type("IfcRelAssignsToGroup"):
-        groups.setdefault(r.RelatingGroup.id(),[]).extend([e.id() for e in r.RelatedObjects])
-    for r in ifcfile.by_type("IfcRelVoidsElement"):
-        subtractions.append([r.RelatedOpeningElement.id(), r.RelatingBuildingElement.id()])
-    for r in ifcfile.by_type("IfcRelDefinesByProperties"):
-        for obj in r.RelatedObjects:
-            if r.RelatingPropertyDefinition.is_a("IfcPropertySet"):
-                properties.setdefault(obj.id(),[]).extend([e.id() for e in r.RelatingPropertyDefinition.HasProperties])
-    for r in ifcfile.by_type("IfcRelAssociatesMaterial"):
-        for o in r.RelatedObjects:
-            mattable[o.id()] = r.RelatingMaterial.id()
+    # all relationships in one pass
+    for r in ifcfile.by_type("IfcRelationship"):
+        if r.is_a("IfcRelContainedInSpatialStructure"):
+            additions.setdefault(r.RelatingStructure.id(),[]).extend([e.id() for e in r.RelatedElements])
+        elif r.is_a("IfcRelAggregates"):
+            additions.setdefault(r.RelatingObject.id(),[]).extend([e.id() for e in r.RelatedObjects])
+        elif r.is_a("IfcRelAssignsToGroup"):
+            groups.setdefault(r.RelatingGroup.id(),[]).extend([e.id() for e in r.RelatedObjects])
+        elif r.is_a("IfcRelVoidsElement"):
+            subtractions.append([r.RelatedOpeningElement.id(), r.RelatingBuildingElement.id()])
+        elif r.is_a("IfcRelDefinesByProperties"):
+            for obj in r.RelatedObjects:
+                if r.RelatingPropertyDefinition.is_a("IfcPropertySet"):
+                    properties.setdefault(obj.id(),[]).extend([e.id() for e in r.RelatingPropertyDefinition.HasProperties])
+        elif r.is_a("IfcRelAssociatesMaterial"):
+            for o in r.RelatedObjects:
+                mattable[o.id()] = r.RelatingMaterial.id()
+
+    # reverse indexes of the styled items
+    itemproducts = {} # { representation item id:[product id, ...] }
+    for p in ifcfile.by_type("IfcProduct"):
+        if p.Representation:
+            for it in p.Representation.Representations:
+                if it.Items:
+                    itemproducts.setdefault(it.Items[0].id(),[]).append(p.id())
+                    if it.Items[0].is_a("IfcBooleanResult"):
+                        itemproducts.setdefault(it.Items[0].FirstOperand.id(),[]).append(p.id())
+    itemmaterials = {} # { styled item id:[material id, ...] }
+    for m in ifcfile.by_type("IfcMaterialDefinitionRepresentation"):
+        for it in m.Representations:
+            if it.Items:
+                itemmaterials.setdefault(it.Items[0].id(),[]).append(m.RepresentedMaterial.id())
     for r in ifcfile.by_type("IfcStyledItem"):
         if r.Styles[0].is_a("IfcPresentationStyleAssignment"):
             if r.Styles[0].Styles[0].is_a("IfcSurfaceStyle"):
@@ -377,32 +452,23 @@ def insert(filename,docname,skip=[],only=[],root=None):
                     if r.Styles[0].Styles[0].Styles[0].SurfaceColour:
                         c = r.Styles[0].Styles[0].Styles[0].SurfaceColour
                         if r.Item:
-                            for p in ifcfile.by_type("IfcProduct"):
-                                if p.Representation:
-                                    for it in p.Representation.Representations:
-                                        if it.Items:
-                                            if it.Items[0].id() == r.Item.id():
-                                                colors[p.id()] = (c.Red,c.Green,c.Blue)
-                                            elif it.Items[0].is_a("IfcBooleanResult"):
-                                                if (it.Items[0].FirstOperand.id() == r.Item.id()):
-                                                    colors[p.id()] = (c.Red,c.Green,c.Blue)
+                            for pid in itemproducts.get(r.Item.id(),[]):
+                                colors[pid] = (c.Red,c.Green,c.Blue)
                         else:
-                            for m in ifcfile.by_type("IfcMaterialDefinitionRepresentation"):
-                                for it in m.Representations:
-                                    if it.Items:
-                                        if it.Items[0].id() == r.id():
-                                            colors[m.RepresentedMaterial.id()] = (c.Red,c.Green,c.Blue)
+                            for mid in itemmaterials.get(r.id(),[]):
+                                colors[mid] = (c.Red,c.Green,c.Blue)
 
     if only: # only import a list of IDs and their children
         ids = []
         while only:
             currentid = only.pop()
             ids.append(currentid)
-            if currentid in additions.keys():
+            if currentid in additions:
                 only.extend(additions[currentid])
         products = [ifcfile[currentid] for currentid in ids]
 
     if DEBUG: print "done."
+    timer.mark("relationships")
 
     count = 0
     from FreeCAD import Base
@@ -410,206 +476,237 @@ def insert(filename,docname,skip=[],only=[],root=None):
     progressbar.start("Importing IFC objects...",len(products))
     if DEBUG: print "Processing objects..."
 
-    # products
-    for product in products:
-
-        pid = product.id()
-        guid = product.GlobalId
-        ptype = product.is_a()
-        if DEBUG: print count+1,"/",len(products)," creating object #",pid," : ",ptype,
-        name = str(ptype[3:])
-        if product.Name:
-            name = product.Name.decode("unicode_escape").encode("utf8")
-        if PREFIX_NUMBERS: name = "ID" + str(pid) + " " + name
-        obj = None
-        baseobj = None
-        brep = None
-        shape = None
-
-        archobj = True  # assume all objects not in structuralifcobjects are architecture
-        if ptype in structuralifcobjects:
-            archobj = False
-            if DEBUG: print " (struct)",
-        else:
-            if DEBUG: print " (arch)",
-        if MERGE_MODE_ARCH == 4 and archobj:
-            if DEBUG: print " skipped."
-            continue
-        if MERGE_MODE_STRUCT == 3 and not archobj:
-            if DEBUG: print " skipped."
-            continue
-        if pid in skip: # user given id skip list
-            if DEBUG: print " skipped."
-            continue
-        if ptype in SKIP: # preferences-set type skip list
-            if DEBUG: print " skipped."
-            continue
+    # geometry created by worker processes, consumed in the products order as it comes
+    pool = None
+    geometries = None
+    breps = {} # { id:brep } geometries received ahead of their product
+    if PROCESSES != 1:
+        geomids = []
+        for product in products:
+            # same skipping rules as below
+            archobj = not (product.is_a() in structuralifcobjects)
+            if (MERGE_MODE_ARCH == 4 and archobj) or (MERGE_MODE_STRUCT == 3 and not archobj):
+                continue
+            if (product.id() in skip) or (product.is_a() in SKIP):
+                continue
+            geomids.append(product.id())
+        pool = getGeometryPool(PROCESSES or None,filename,geomflags)
+        if pool:
+            geometries = pool.imap(getGeometry,geomids,8)
+            geomids = set(geomids)
 
-        # detect if this object is sharing its shape
-        clone = None
-        store = None
-        if product.Representation and MERGE_MODE_ARCH == 0 and archobj:
-            for s in product.Representation.Representations:
-                if s.RepresentationIdentifier.upper() == "BODY":
-                    if s.Items[0].is_a("IfcMappedItem"):
-                        bid = s.Items[0].MappingSource.id()
-                        if bid in sharedobjects:
-                            clone = sharedobjects[bid]
-                        else:
-                            sharedobjects[bid] = None
-                            store = bid
+    try:
+        # products
+        for product in products:
+
+            pid = product.id()
+            guid = product.GlobalId
+            ptype = product.is_a()
+            if DEBUG: print count+1,"/",len(products)," creating object #",pid," : ",ptype,
+            name = str(ptype[3:])
+            if product.Name:
+                name = product.Name.decode("unicode_escape").encode("utf8")
+            if PREFIX_NUMBERS: name = "ID" + str(pid) + " " + name
+            obj = None
+            baseobj = None
+            brep = None
+            shape = None
+
+            archobj = True  # assume all objects not in structuralifcobjects are architecture
+            if ptype in structuralifcobjects:
+                archobj = False
+                if DEBUG: print " (struct)",
+            else:
+                if DEBUG: print " (arch)",
+            if MERGE_MODE_ARCH == 4 and archobj:
+                if DEBUG: print " skipped."
+                continue
+            if MERGE_MODE_STRUCT == 3 and not archobj:
+                if DEBUG: print " skipped."
+                continue
+            if pid in skip: # user given id skip list
+                if DEBUG: print " skipped."
+                continue
+            if ptype in SKIP: # preferences-set type skip list
+                if DEBUG: print " skipped."
+                continue
 
-        try:
-            cr = ifcopenshell.geom.create_shape(settings,product)
-            brep = cr.geometry.brep_data
-        except:
-            pass # IfcOpenShell will yield an error if a given product has no shape, but we don't care
+            # detect if this object is sharing its shape
+            clone = None
+            store = None
+            if product.Representation and MERGE_MODE_ARCH == 0 and archobj:
+                for s in product.Representation.Representations:
+                    if s.RepresentationIdentifier.upper() == "BODY":
+                        if s.Items[0].is_a("IfcMappedItem"):
+                            bid = s.Items[0].MappingSource.id()
+                            if bid in sharedobjects:
+                                clone = sharedobjects[bid]
+                            else:
+                                sharedobjects[bid] = None
+                                store = bid
+
+            if geometries and (pid in geomids):
+                while not pid in breps:
+                    gid,gbrep = geometries.next()
+                    breps[gid] = gbrep
+                brep = breps.pop(pid)
+            else:
+                try:
+                    cr = ifcopenshell.geom.create_shape(settings,product)
+                    brep = cr.geometry.brep_data
+                except:
+                    pass # IfcOpenShell will yield an error if a given product has no shape, but we don't care
 
-        if brep:
-            if DEBUG: print " ",str(len(brep)/1000),"k ",
+            if brep:
+                if DEBUG: print " ",str(len(brep)/1000),"k ",
 
-            shape = Part.Shape()
-            shape.importBrepFromString(brep)
+                shape = Part.Shape()
+                shape.importBrepFromString(brep)
 
-            shape.scale(1000.0) # IfcOpenShell always outputs in meters
+                shape.scale(1000.0) # IfcOpenShell always outputs in meters
 
-            if not shape.isNull():
-                if (MERGE_MODE_ARCH > 0 and archobj) or not archobj:
-                    if ptype == "IfcSpace": # do not add spaces to compounds
-                        if DEBUG: print "skipping space ",pid
-                    elif not archobj:
-                        structshapes[pid] = shape
-                        if DEBUG: print shape.Solids," ",
-                        baseobj = shape
+                if not shape.isNull():
+                    if (MERGE_MODE_ARCH > 0 and archobj) or not archobj:
+                        if ptype == "IfcSpace": # do not add spaces to compounds
+                            if DEBUG: print "skipping space ",pid
+                        elif not archobj:
+                            structshapes[pid] = shape
+                            if DEBUG: print shape.Solids," ",
+                            baseobj = shape
+                        else:
+                            shapes[pid] = shape
+                            if DEBUG: print shape.Solids," ",
+                            baseobj = shape
                     else:
-                        shapes[pid] = shape
-                        if DEBUG: print shape.Solids," ",
-                        baseobj = shape
+                        if clone:
+                            if DEBUG: print "clone ",
+                        else:
+                            if GET_EXTRUSIONS:
+                                ex = Arch.getExtrusionData(shape)
+                                if ex:
+                                    print "extrusion ",
+                                    baseface = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_footprint")
+                                    baseface.Shape = ex[0]
+                                    baseobj = FreeCAD.ActiveDocument.addObject("Part::Extrusion",name+"_body")
+                                    baseobj.Base = baseface
+                                    baseobj.Dir = ex[1]
+                                    if FreeCAD.GuiUp:
+                                        baseface.ViewObject.hide()
+                            if (not baseobj):
+                                baseobj = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_body")
+                                baseobj.Shape = shape
                 else:
-                    if clone:
-                        if DEBUG: print "clone ",
-                    else:
-                        if GET_EXTRUSIONS:
-                            ex = Arch.getExtrusionData(shape)
-                            if ex:
-                                print "extrusion ",
-                                baseface = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_footprint")
-                                baseface.Shape = ex[0]
-                                baseobj = FreeCAD.ActiveDocument.addObject("Part::Extrusion",name+"_body")
-                                baseobj.Base = baseface
-                                baseobj.Dir = ex[1]
-                                if FreeCAD.GuiUp:
-                                    baseface.ViewObject.hide()
-                        if (not baseobj):
-                            baseobj = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_body")
-                            baseobj.Shape = shape
-            else:
-                if DEBUG: print  "null shape ",
-            if not shape.isValid():
-                if DEBUG: print "invalid shape ",
-                #continue
+                    if DEBUG: print  "null shape ",
+                if not shape.isValid():
+                    if DEBUG: print "invalid shape ",
+                    #continue
 
-        else:
-            if DEBUG: print " no brep ",
-
-        if MERGE_MODE_ARCH == 0 and archobj:
-
-            # full Arch objects
-            for freecadtype,ifctypes in typesmap.items():
-                if ptype in ifctypes:
-                    if clone:
-                        obj = getattr(Arch,"make"+freecadtype)(name=name)
-                        obj.CloneOf = clone
-                        if shape:
-                            v = shape.Solids[0].CenterOfMass.sub(clone.Shape.Solids[0].CenterOfMass)
-                            r = getRotation(product)
-                            if not r.isNull():
-                                v = v.add(clone.Shape.Solids[0].CenterOfMass)
-                                v = v.add(r.multVec(clone.Shape.Solids[0].CenterOfMass.negative()))
-                            obj.Placement.Rotation = r
-                            obj.Placement.move(v)
-                    else:
-                        obj = getattr(Arch,"make"+freecadtype)(baseobj=baseobj,name=name)
-                        if store:
-                            sharedobjects[store] = obj
-                    obj.Label = name
-                    if FreeCAD.GuiUp and baseobj:
-                        if hasattr(baseobj,"ViewObject"):
-                            baseobj.ViewObject.hide()
-                    # setting role
-                    try:
-                        r = ptype[3:]
-                        tr = dict((v,k) for k, v in translationtable.iteritems())
-                        if r in tr.keys():
-                            r = tr[r]
-                        # remove the "StandardCase"
-                        if "StandardCase" in r:
-                            r = r[:-12]
-                        obj.Role = r
-                    except:
-                        pass
-                    # setting uid
-                    if hasattr(obj,"IfcAttributes"):
-                        a = obj.IfcAttributes
-                        a["IfcUID"] = str(guid)
-                        obj.IfcAttributes = a
-                    break
-            if not obj:
-                obj = Arch.makeComponent(baseobj,name=name)
-            if obj:
-                sols = str(obj.Shape.Solids) if hasattr(obj,"Shape") else ""
-                if DEBUG: print sols
-                objects[pid] = obj
+            else:
+                if DEBUG: print " no brep ",
 
-        elif (MERGE_MODE_ARCH == 1 and archobj) or (MERGE_MODE_STRUCT == 0 and not archobj):
+            if MERGE_MODE_ARCH == 0 and archobj:
 
-            # non-parametric Arch objects
-            if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
+                # full Arch objects
                 for freecadtype,ifctypes in typesmap.items():
                     if ptype in ifctypes:
-                        obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
-            elif baseobj:
-                obj = Arch.makeComponent(baseobj,name=name,delete=True)
+                        if clone:
+                            obj = getattr(Arch,"make"+freecadtype)(name=name)
+                            obj.CloneOf = clone
+                            if shape:
+                                v = shape.Solids[0].CenterOfMass.sub(clone.Shape.Solids[0].CenterOfMass)
+                                r = getRotation(product)
+                                if not r.isNull():
+                                    v = v.add(clone.Shape.Solids[0].CenterOfMass)
+                                    v = v.add(r.multVec(clone.Shape.Solids[0].CenterOfMass.negative()))
+                                obj.Placement.Rotation = r
+                                obj.Placement.move(v)
+                        else:
+                            obj = getattr(Arch,"make"+freecadtype)(baseobj=baseobj,name=name)
+                            if store:
+                                sharedobjects[store] = obj
+                        obj.Label = name
+                        if FreeCAD.GuiUp and baseobj:
+                            if hasattr(baseobj,"ViewObject"):
+                                baseobj.ViewObject.hide()
+                        # setting role
+                        try:
+                            r = ptype[3:]
+                            tr = dict((v,k) for k, v in translationtable.iteritems())
+                            if r in tr.keys():
+                                r = tr[r]
+                            # remove the "StandardCase"
+                            if "StandardCase" in r:
+                                r = r[:-12]
+                            obj.Role = r
+                        except:
+                            pass
+                        # setting uid
+                        if hasattr(obj,"IfcAttributes"):
+                            a = obj.IfcAttributes
+                            a["IfcUID"] = str(guid)
+                            obj.IfcAttributes = a
+                        break
+                if not obj:
+                    obj = Arch.makeComponent(baseobj,name=name)
+                if obj:
+                    sols = str(obj.Shape.Solids) if hasattr(obj,"Shape") else ""
+                    if DEBUG: print sols
+                    objects[pid] = obj
+
+            elif (MERGE_MODE_ARCH == 1 and archobj) or (MERGE_MODE_STRUCT == 0 and not archobj):
+
+                # non-parametric Arch objects
+                if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
+                    for freecadtype,ifctypes in typesmap.items():
+                        if ptype in ifctypes:
+                            obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
+                elif baseobj:
+                    obj = Arch.makeComponent(baseobj,name=name,delete=True)
+
+            elif (MERGE_MODE_ARCH == 2 and archobj) or (MERGE_MODE_STRUCT == 1 and not archobj):
+
+                # Part shapes
+                if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
+                    for freecadtype,ifctypes in typesmap.items():
+                        if ptype in ifctypes:
+                            obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
+                elif baseobj:
+                    obj = FreeCAD.ActiveDocument.addObject("Part::Feature",name)
+                    obj.Shape = shape
 
-        elif (MERGE_MODE_ARCH == 2 and archobj) or (MERGE_MODE_STRUCT == 1 and not archobj):
+            if obj:
 
-            # Part shapes
-            if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
-                for freecadtype,ifctypes in typesmap.items():
-                    if ptype in ifctypes:
-                        obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
-            elif baseobj:
-                obj = FreeCAD.ActiveDocument.addObject("Part::Feature",name)
-                obj.Shape = shape
-
-        if obj:
-
-            obj.Label = name
-            objects[pid] = obj
-
-            # properties
-            if pid in properties:
-                if hasattr(obj,"IfcAttributes"):
-                    a = obj.IfcAttributes
-                    for p in properties[pid]:
-                        o = ifcfile[p]
-                        if o.is_a("IfcPropertySingleValue"):
-                            a[o.Name.decode("unicode_escape").encode("utf8")] = str(o.NominalValue)
-                    obj.IfcAttributes = a
-
-            # color
-            if FreeCAD.GuiUp and (pid in colors) and hasattr(obj.ViewObject,"ShapeColor"):
-                if DEBUG: print "    setting color: ",int(colors[pid][0]*255),"/",int(colors[pid][1]*255),"/",int(colors[pid][2]*255)
-                obj.ViewObject.ShapeColor = colors[pid]
-
-            # if DEBUG is on, recompute after each shape
-            if DEBUG: FreeCAD.ActiveDocument.recompute()
+                obj.Label = name
+                objects[pid] = obj
 
-        count += 1
-        progressbar.next()
+                # properties
+                if pid in properties:
+                    if hasattr(obj,"IfcAttributes"):
+                        a = obj.IfcAttributes
+                        for p in properties[pid]:
+                            o = ifcfile[p]
+                            if o.is_a("IfcPropertySingleValue"):
+                                a[o.Name.decode("unicode_escape").encode("utf8")] = str(o.NominalValue)
+                        obj.IfcAttributes = a
+
+                # color
+                if FreeCAD.GuiUp and (pid in colors) and hasattr(obj.ViewObject,"ShapeColor"):
+                    if DEBUG: print "    setting color: ",int(colors[pid][0]*255),"/",int(colors[pid][1]*255),"/",int(colors[pid][2]*255)
+                    obj.ViewObject.ShapeColor = colors[pid]
+
+                # if DEBUG is on, recompute after each shape
+                if DEBUG: FreeCAD.ActiveDocument.recompute()
 
-    progressbar.stop()
+            count += 1
+            progressbar.next()
+
+        progressbar.stop()
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
     FreeCAD.ActiveDocument.recompute()
+    timer.mark("products")
 
     if MERGE_MODE_STRUCT == 2:
 
@@ -718,6 +815,7 @@ def insert(filename,docname,skip=[],only=[],root=None):
                     Arch.rebuildArchShape(obj)
 
     FreeCAD.ActiveDocument.recompute()
+    timer.mark("joining")
 
     # 2D elements
 
@@ -743,12 +841,16 @@ def insert(filename,docname,skip=[],only=[],root=None):
         count += 1
 
     FreeCAD.ActiveDocument.recompute()
+    timer.mark("annotations")
 
     # Materials
 
     if DEBUG and materials: print "Creating materials..."
 
     fcmats = {}
+    matobjects = {} # { matid:[objid, ...] }
+    for o,m in mattable.items():
+        matobjects.setdefault(m,[]).append(o)
     for material in materials:
         name = "Material"
         if material.Name:
@@ -763,18 +865,19 @@ def insert(filename,docname,skip=[],only=[],root=None):
             if mdict:
                 mat.Material = mdict
             fcmats[name] = mat
-        for o,m in mattable.items():
-            if m == material.id():
-                if o in objects:
-                    if hasattr(objects[o],"BaseMaterial"):
-                        objects[o].BaseMaterial = mat
+        for o in matobjects.get(material.id(),[]):
+            if o in objects:
+                if hasattr(objects[o],"BaseMaterial"):
+                    objects[o].BaseMaterial = mat
 
     FreeCAD.ActiveDocument.recompute()
+    timer.mark("materials")
 
     if FreeCAD.GuiUp:
         import FreeCADGui
         FreeCADGui.SendMsgToActiveView("ViewFit")
     print "Finished importing."
+    if DEBUG: timer.report()
     return doc
 
 
@@ -813,7 +916,7 @@ def export(exportList,filename):
     of = pyopen(templatefile,"wb")
     of.write(template.encode("utf8"))
     of.close()
-    global ifcfile, surfstyles, clones, sharedobjects
+    global ifcfile, surfstyles, clones, clonebases, sharedobjects, fingerprints, sharedshapes
     ifcfile = ifcopenshell.open(templatefile)
     history = ifcfile.by_type("IfcOwnerHistory")[0]
     context = ifcfile.by_type("IfcGeometricRepresentationContext")[0]
@@ -823,7 +926,10 @@ def export(exportList,filename):
     products = {} # { Name: IfcEntity, ... }
     surfstyles = {} # { (r,g,b): IfcEntity, ... }
     clones = {} # { Basename:[Clonename1,Clonename2,...] }
+    clonebases = {} # { Clonename:Basename }
     sharedobjects = {} # { BaseName: IfcRepresentationMap }
+    fingerprints = {} # { Name:fingerprint } for the objects sharing their geometry with others
+    sharedshapes = {} # { fingerprint: IfcRepresentationMap }
     count = 1
 
     # build clones table
@@ -831,9 +937,29 @@ def export(exportList,filename):
         b = Draft.getCloneBase(o,strict=True)
         if b:
             clones.setdefault(b.Name,[]).append(o.Name)
-            
-    print "clones table: ",clones
-    print objectslist
+            clonebases[o.Name] = b.Name
+
+    if DEBUG: print "clones table: ",clones
+
+    # find the other objects with identical geometry
+    candidates = {}
+    for o in objectslist:
+        if (not o.Name in clones) and (not o.Name in clonebases):
+            if hasattr(o,"Shape") and o.Shape and (not o.Shape.isNull()):
+                candidates.setdefault(getShapeFingerprint(o.Shape),[]).append(o)
+    for f,objs in candidates.items():
+        if len(objs) < 2:
+            continue
+        # the fingerprint is only a hint, identical shapes must have the same brep
+        breps = {}
+        for o in objs:
+            breps.setdefault(getShapeBrep(o.Shape),[]).append(o.Name)
+        for i,names in enumerate(breps.values()):
+            if len(names) > 1:
+                for n in names:
+                    fingerprints[n] = f + "-" + str(i)
+
+    if DEBUG: print len(fingerprints)," objects sharing ",len(set(fingerprints.values()))," shapes"
 
     # products
     for obj in objectslist:
@@ -1015,6 +1141,36 @@ def export(exportList,filename):
     ifcfile.write(filename)
 
 
+def getShapeFingerprint(shape):
+    """getShapeFingerprint(shape): returns a string summarizing the geometry of a shape
+    in its own coordinates, i.e. regardless of its placement. Different shapes can have
+    the same fingerprint, use getShapeBrep to check if they are identical"""
+    import hashlib
+    shape = shape.copy()
+    shape.Placement = FreeCAD.Placement()
+    pts = sorted([(round(v.X,4),round(v.Y,4),round(v.Z,4)) for v in shape.Vertexes])
+    return hashlib.md5(repr((shape.ShapeType,len(shape.Faces),len(shape.Edges),round(shape.Area,4),pts))).hexdigest()
+
+
+def getShapeBrep(shape):
+    """getShapeBrep(shape): returns the brep of a shape in its own coordinates, i.e.
+    regardless of its placement"""
+    shape = shape.copy()
+    shape.Placement = FreeCAD.Placement()
+    return shape.exportBrepToString()
+
+
+def getMappedItem(ifcfile,repmap,pla):
+    """getMappedItem(ifcfile,repmap,placement): returns an IfcMappedItem placing the given
+    IfcRepresentationMap with the given FreeCAD placement"""
+    axis1 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(1,0,0))))
+    axis2 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,1,0))))
+    axis3 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,0,1))))
+    origin = ifcfile.createIfcCartesianPoint(tuple(FreeCAD.Vector(pla.Base).multiply(0.001)))
+    transf = ifcfile.createIfcCartesianTransformationOperator3D(axis1,axis2,origin,1.0,axis3)
+    return ifcfile.createIfcMappedItem(repmap,transf)
+
+
 def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tessellation=1):
     """returns an IfcShapeRepresentation object or None"""
 
@@ -1026,24 +1182,19 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
     tostore = False
     
     # check for clones
-    for k,v in clones.items():
-        if (obj.Name == k ) or (obj.Name in v):
-            if k in sharedobjects:
-                # base shape already exists
-                repmap = sharedobjects[k]
-                pla = obj.Placement
-                axis1 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(1,0,0))))
-                axis2 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,1,0))))
-                axis3 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,0,1))))
-                origin = ifcfile.createIfcCartesianPoint(tuple(FreeCAD.Vector(pla.Base).multiply(0.001)))
-                transf = ifcfile.createIfcCartesianTransformationOperator3D(axis1,axis2,origin,1.0,axis3)
-                mapitem = ifcfile.createIfcMappedItem(repmap,transf)
-                shapes = [mapitem]
-                solidType = "MappedRepresentation"
-                shapetype = "clone"
-            else:
-                # base shape not yet created
-                tostore = k
+    if obj.Name in clones:
+        k = obj.Name
+    else:
+        k = clonebases.get(obj.Name)
+    if k:
+        if k in sharedobjects:
+            # base shape already exists
+            shapes = [getMappedItem(ifcfile,sharedobjects[k],obj.Placement)]
+            solidType = "MappedRepresentation"
+            shapetype = "clone"
+        else:
+            # base shape not yet created
+            tostore = k
 
     if (not shapes) and (not forcebrep):
         profile = None
@@ -1145,6 +1296,15 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
             solidType = "SweptSolid"
             shapetype = "extrusion"
 
+    # check for objects with the same geometry, only shared when written as brep
+    fingerprint = None
+    if (not shapes) and (not subtraction):
+        fingerprint = fingerprints.get(obj.Name)
+        if fingerprint in sharedshapes:
+            shapes = [getMappedItem(ifcfile,sharedshapes[fingerprint],obj.Shape.Placement)]
+            solidType = "MappedRepresentation"
+            shapetype = "shared"
+
     if not shapes:
         # brep representation
         fcshape = None
@@ -1158,6 +1318,10 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
                 if obj.Shape:
                     if not obj.Shape.isNull():
                         fcshape = obj.Shape
+                        if fingerprint:
+                            # the shared geometry is written in the object coordinates
+                            fcshape = fcshape.copy()
+                            fcshape.Placement = FreeCAD.Placement()
             elif hasattr(obj,"Terrain"):
                 if obj.Terrain:
                     if hasattr(obj.Terrain,"Shape"):
@@ -1233,17 +1397,21 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
             ovc = ifcfile.createIfcCartesianPoint((0.0,0.0,0.0))
             gpl = ifcfile.createIfcAxis2Placement3D(ovc,zvc,xvc)
             repmap = ifcfile.createIfcRepresentationMap(gpl,subrep)
-            pla = FreeCAD.ActiveDocument.getObject(k).Placement
-            axis1 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(1,0,0))))
-            axis2 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,1,0))))
-            origin = ifcfile.createIfcCartesianPoint(tuple(FreeCAD.Vector(pla.Base).multiply(0.001)))
-            axis3 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,0,1))))
-            transf = ifcfile.createIfcCartesianTransformationOperator3D(axis1,axis2,origin,1.0,axis3)
-            mapitem = ifcfile.createIfcMappedItem(repmap,transf)
-            shapes = [mapitem]
+            shapes = [getMappedItem(ifcfile,repmap,FreeCAD.ActiveDocument.getObject(k).Placement)]
             sharedobjects[k] = repmap
             solidType = "MappedRepresentation"
 
+        elif fingerprint and (shapetype == "brep"):
+            subrep = ifcfile.createIfcShapeRepresentation(context,'Body',solidType,shapes)
+            xvc = ifcfile.createIfcDirection((1.0,0.0,0.0))
+            zvc = ifcfile.createIfcDirection((0.0,0.0,1.0))
+            ovc = ifcfile.createIfcCartesianPoint((0.0,0.0,0.0))
+            gpl = ifcfile.createIfcAxis2Placement3D(ovc,zvc,xvc)
+            repmap = ifcfile.createIfcRepresentationMap(gpl,subrep)
+            shapes = [getMappedItem(ifcfile,repmap,obj.Shape.Placement)]
+            sharedshapes[fingerprint] = repmap
+            solidType = "MappedRepresentation"
+
         # set surface style
         if FreeCAD.GuiUp and (not subtraction) and hasattr(obj.ViewObject,"ShapeColor"):
             # only set a surface style if the object has no material.
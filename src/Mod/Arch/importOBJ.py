@@ -29,17 +29,43 @@ p = Draft.precision()
 if open.__module__ == '__builtin__':
     pythonopen = open
 
-def findVert(aVertex,aList):
-    "finds aVertex in aList, returns index"
-    for i in range(len(aList)):
-        if ( round(aVertex.X,p) == round(aList[i].X,p) ):
-            if ( round(aVertex.Y,p) == round(aList[i].Y,p) ):
-                if ( round(aVertex.Z,p) == round(aList[i].Z,p) ):
-                    return i
+class VertexIndex:
+    """VertexIndex(offset=1): indexes the vertices written to an OBJ file in a
+    grid of their coordinates, so that vertices closer than the Draft precision
+    share the same OBJ index. offset is the index of the first vertex."""
 
-def getIndices(shape,offset):
-    "returns a list with 2 lists: vertices and face indexes, offsetted with the given amount"
-    vlist = []
+    def __init__(self,offset=1):
+        self.next = offset
+        self.grid = DraftGeomUtils.PointGrid()
+        self.vlist = []
+
+    def getIndex(self,x,y,z):
+        "returns the OBJ index of the given point, adding it if needed"
+        indices = self.grid.find((x,y,z))
+        if indices:
+            return min(indices)
+        i = self.next
+        self.next += 1
+        self.grid.add((x,y,z),i)
+        self.vlist.append(" %s %s %s" % (round(x,p),round(y,p),round(z,p)))
+        return i
+
+    def getVertexIndex(self,v):
+        "returns the OBJ index of the given Part.Vertex"
+        return self.getIndex(v.X,v.Y,v.Z)
+
+    def flush(self):
+        "returns the vertices added since the last call, as OBJ strings"
+        vlist = self.vlist
+        self.vlist = []
+        return vlist
+
+def getIndices(shape,offset,vindex=None):
+    """returns a list with 3 lists: vertices, edge and face indexes, offsetted with the given amount.
+    If a VertexIndex is given, it is used instead of offset and only the vertices not
+    already in it are returned"""
+    if vindex is None:
+        vindex = VertexIndex(offset)
     elist = []
     flist = []
     curves = None
@@ -55,65 +81,49 @@ def getIndices(shape,offset):
             FreeCAD.Console.PrintWarning(translate("Arch","Found a shape containing curves, triangulating\n"))
             break
     if curves:
-        for v in curves[0]:
-            vlist.append(" "+str(round(v.x,p))+" "+str(round(v.y,p))+" "+str(round(v.z,p)))
+        indices = [vindex.getIndex(v.x,v.y,v.z) for v in curves[0]]
         for f in curves[1]:
-            fi = ""
-            for vi in f:
-                fi += " " + str(vi + offset)
-            flist.append(fi)
+            flist.append(" " + " ".join([str(indices[vi]) for vi in f]))
     else:
         for v in shape.Vertexes:
-            vlist.append(" "+str(round(v.X,p))+" "+str(round(v.Y,p))+" "+str(round(v.Z,p)))
+            vindex.getVertexIndex(v)
         if not shape.Faces:
             for e in shape.Edges:
                 if DraftGeomUtils.geomType(e) == "Line":
-                    ei = " " + str(findVert(e.Vertexes[0],shape.Vertexes) + offset)
-                    ei += " " + str(findVert(e.Vertexes[-1],shape.Vertexes) + offset)
-                    elist.append(ei)
+                    elist.append(" %i %i" % (vindex.getVertexIndex(e.Vertexes[0]),vindex.getVertexIndex(e.Vertexes[-1])))
         for f in shape.Faces:
             if len(f.Wires) > 1:
                 # if we have holes, we triangulate
                 tris = f.tessellate(1)
+                indices = [vindex.getIndex(v.x,v.y,v.z) for v in tris[0]]
                 for fdata in tris[1]:
-                    fi = ""
-                    for vi in fdata:
-                        vdata = Part.Vertex(tris[0][vi])
-                        fi += " " + str(findVert(vdata,shape.Vertexes) + offset)
-                    flist.append(fi)
+                    flist.append(" " + " ".join([str(indices[vi]) for vi in fdata]))
             else:
-                fi = ""
                 # OCC vertices are unsorted. We need to sort in the right order...
                 edges = Part.__sortEdges__(f.OuterWire.Edges)
-                #print edges
-                for e in edges:
-                    #print e.Vertexes[0].Point,e.Vertexes[1].Point
-                    v = e.Vertexes[0]
-                    fi += " " + str(findVert(v,shape.Vertexes) + offset)
-                flist.append(fi)
-    return vlist,elist,flist
+                flist.append(" " + " ".join([str(vindex.getVertexIndex(e.Vertexes[0])) for e in edges]))
+    return vindex.flush(),elist,flist
 
 def export(exportList,filename):
     "called when freecad exports a file"
+    # welding merges the coincident vertices of different objects
+    weld = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Arch").GetBool("ObjWeldVertices",False)
     outfile = pythonopen(filename,"wb")
     ver = FreeCAD.Version()
     outfile.write("# FreeCAD v" + ver[0] + "." + ver[1] + " build" + ver[2] + " Arch module\n")
     outfile.write("# http://www.freecadweb.org\n")
-    offset = 1
+    vindex = VertexIndex()
     for obj in exportList:
         if obj.isDerivedFrom("Part::Feature"):
             if obj.ViewObject.isVisible():
-                vlist,elist,flist = getIndices(obj.Shape,offset)
-                offset += len(vlist)
-                outfile.write("o " + obj.Name + "\n")
-                for v in vlist:
-                    outfile.write("v" + v + "\n")
-                for e in elist:
-                    outfile.write("l" + e + "\n")
-                for f in flist:
-                    outfile.write("f" + f + "\n")
+                if not weld:
+                    vindex = VertexIndex(vindex.next)
+                vlist,elist,flist = getIndices(obj.Shape,vindex.next,vindex)
+                lines = ["o " + obj.Name]
+                lines.extend(["v" + v for v in vlist])
+                lines.extend(["l" + e for e in elist])
+                lines.extend(["f" + f for f in flist])
+                lines.append("")
+                outfile.write("\n".join(lines))
     outfile.close()
     FreeCAD.Console.PrintMessage(translate("Arch","successfully written ")+filename+"\n")
-            
-            
-            
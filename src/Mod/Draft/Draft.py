@@ -86,7 +86,7 @@ def getParamType(param):
     if param in ["dimsymbol","dimPrecision","dimorientation","precision","defaultWP",
                  "snapRange","gridEvery","linewidth","UiMode","modconstrain","modsnap",
                  "maxSnapEdges","modalt","HatchPatternResolution","snapStyle",
-                 "dimstyle","gridSize"]:
+                 "dimstyle","gridSize","shape2DViewBackgroundFaces"]:
         return "int"
     elif param in ["constructiongroupname","textfont","patternFile","template",
                    "snapModes","FontFile"]:
@@ -1670,6 +1670,89 @@ def getDXF(obj,direction=None):
     return result
 
 
+class LRUCache:
+    """LRUCache(size): a dictionary keeping only its size most recently used items"""
+
+    def __init__(self,size):
+        import collections
+        self.size = size
+        self.items = collections.OrderedDict()
+
+    def __contains__(self,key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self,key,default=None):
+        "returns the value of key, marking it as recently used"
+        if key in self.items:
+            value = self.items.pop(key)
+            self.items[key] = value
+            return value
+        return default
+
+    def __setitem__(self,key,value):
+        self.items.pop(key,None)
+        self.items[key] = value
+        while len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+    def pop(self,key,default=None):
+        return self.items.pop(key,default)
+
+    def keys(self):
+        return self.items.keys()
+
+# the revision of the shapes of the document objects, { (document,object):revision },
+# a number changed by shapeobserver each time the shape or the placement of the object changes
+shaperevisions = {}
+shaperevisioncount = 0
+# the caches holding values computed from the shapes of objects, keyed by (document,object),
+# purged by shapeobserver when their objects or documents are deleted
+objectcaches = []
+
+def getShapeRevision(obj):
+    """getShapeRevision(obj): returns a number identifying the current shape of the given
+    object, which changes each time its shape changes. The values computed from the shape
+    of an object can be cached with it"""
+    global shaperevisioncount
+    key = (obj.Document.Name,obj.Name)
+    if not key in shaperevisions:
+        shaperevisioncount += 1
+        shaperevisions[key] = shaperevisioncount
+    return shaperevisions[key]
+
+class _ShapeObserver:
+    "The document observer keeping the shape revisions and the object caches up to date"
+
+    def slotChangedObject(self,obj,prop):
+        global shaperevisioncount
+        # Part features move their shape in place when their placement changes
+        if prop in ["Shape","Placement"]:
+            shaperevisioncount += 1
+            shaperevisions[(obj.Document.Name,obj.Name)] = shaperevisioncount
+
+    def slotDeletedObject(self,obj):
+        key = (obj.Document.Name,obj.Name)
+        shaperevisions.pop(key,None)
+        for cache in objectcaches:
+            cache.pop(key,None)
+
+    def slotDeletedDocument(self,doc):
+        for cache in [shaperevisions]+objectcaches:
+            for key in cache.keys():
+                if key[0] == doc.Name:
+                    cache.pop(key,None)
+
+if hasattr(FreeCAD,"addDocumentObserver"):
+    shapeobserver = _ShapeObserver()
+    FreeCAD.addDocumentObserver(shapeobserver)
+
+# the SVG fragments of the Part-based objects, { (document,object):(shape revision,{ view key:svg }) }
+svgcache = LRUCache(4096)
+objectcaches.append(svgcache)
+
 def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direction=None,linestyle=None,color=None):
     '''getSVG(object,[scale], [linewidth],[fontsize],[fillstyle],[direction],[linestyle],[color]):
     returns a string containing a SVG representation of the given object,
@@ -1707,15 +1790,23 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
             return p.GetString("svgDottedLine","0.02,0.02")
         return "none"
 
+    if plane:
+        # the signed lengths of the projections on the plane axes are dot products
+        # with the unit axes, computed once here rather than for each point
+        pu = Vector(plane.u).normalize()
+        pv = Vector(plane.v).normalize()
+
     def getProj(vec):
         if not plane: return vec
-        nx = DraftVecUtils.project(vec,plane.u)
-        lx = nx.Length
-        if abs(nx.getAngle(plane.u)) > 0.1: lx = -lx
-        ny = DraftVecUtils.project(vec,plane.v)
-        ly = ny.Length
-        if abs(ny.getAngle(plane.v)) > 0.1: ly = -ly
-        return Vector(lx,ly,0)
+        return Vector(vec.dot(pu),vec.dot(pv),0)
+
+    def getProjPath(points,command=""):
+        "returns the projected points as a path string, each preceded by command"
+        if plane:
+            coords = [(p.dot(pu),p.dot(pv)) for p in points]
+        else:
+            coords = [(p.x,p.y) for p in points]
+        return "".join([command+str(x)+' '+str(y)+' ' for x,y in coords])
 
     def getPattern(pat):
         if pat in svgpatterns():
@@ -1819,15 +1910,11 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
                                 svg +='Q '
                             elif bezierseg.Degree==3:
                                 svg +='C '
-                            for pole in bezierseg.getPoles()[1:]:
-                                v = getProj(pole)
-                                svg += str(v.x) +' '+ str(v.y) + ' '
+                            svg += getProjPath(bezierseg.getPoles()[1:])
                     else: 
                         print("Debug: one edge (hash ",e.hashCode(),\
                                 ") has been discretized with parameter 0.1")
-                        for linepoint in bspline.discretize(0.1)[1:]:
-                            v = getProj(linepoint)
-                            svg += 'L '+ str(v.x) +' '+ str(v.y) + ' '
+                        svg += getProjPath(bspline.discretize(0.1)[1:],'L ')
             if fill != 'none': svg += 'Z '
         svg += '" '
         svg += 'stroke="' + stroke + '" '
@@ -2145,7 +2232,25 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
         else:
             fill = 'none'
         lstyle = getLineStyle()
-        
+
+        # the svg of this object is reused as long as its shape and the view settings don't change
+        cachekey = (obj.Document.Name,obj.Name)
+        revision = getShapeRevision(obj)
+        if plane:
+            viewkey = (tuple(plane.u),tuple(plane.v),tuple(plane.axis))
+        elif hasattr(FreeCAD,"DraftWorkingPlane"):
+            viewkey = (tuple(FreeCAD.DraftWorkingPlane.axis),)
+        else:
+            viewkey = ()
+        viewkey += (scale,linewidth,fill,stroke,lstyle,svg)
+        cached = svgcache.get(cachekey)
+        if cached and (cached[0] == revision):
+            if viewkey in cached[1]:
+                return cached[1].get(viewkey)
+        else:
+            cached = (revision,LRUCache(8))
+            svgcache[cachekey] = cached
+
         if len(obj.Shape.Vertexes) > 1:
             wiredEdges = []
             if obj.Shape.Faces:
@@ -2169,6 +2274,7 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
                 svg = getCircle(obj.Shape.Edges[0])
             else:
                 svg = getPath(obj.Shape.Edges)
+        cached[1][viewkey] = svg
     return svg
     
 def getrgb(color,testbw=True):
@@ -2261,7 +2367,11 @@ def makeSketch(objectslist,autoconstraints=False,addTo=None,delete=False,name="S
     objectslist with the given Draft objects. If autoconstraints is True,
     constraints will be automatically added to wire nodes, rectangles
     and circles. If addTo is an existing sketch, geometry will be added to it instead of
-    creating a new one. If delete is True, the original object will be deleted'''
+    creating a new one. If delete is True, the original object will be deleted.
+    The geometry and constraints of all the objects are added in one go, so the
+    sketch is solved only once however long objectslist is. If objectslist is a
+    list, the objects that cannot be converted are skipped with a warning,
+    otherwise nothing is done if the given object cannot be converted.'''
     import Part, DraftGeomUtils
     from Sketcher import Constraint
     from DraftTools import translate
@@ -2271,7 +2381,8 @@ def makeSketch(objectslist,autoconstraints=False,addTo=None,delete=False,name="S
     MiddlePoint = 3
     deletable = None
     
-    if not isinstance(objectslist,list):
+    skip = isinstance(objectslist,list)
+    if not skip:
         objectslist = [objectslist]
     if addTo:
         nobj = addTo
@@ -2279,75 +2390,104 @@ def makeSketch(objectslist,autoconstraints=False,addTo=None,delete=False,name="S
         nobj = FreeCAD.ActiveDocument.addObject("Sketcher::SketchObject",name)
         deletable = nobj
         nobj.ViewObject.Autoconstraints = False
+    placed = bool(addTo)
+    first = nobj.GeometryCount
+    geoms = []
+    constraints = []
+    formatted = False
+    skipped = 0
     for obj in objectslist:
         ok = False
+        error = None
         tp = getType(obj)
         if tp in ["BSpline","BezCurve"]:
-            FreeCAD.Console.PrintError(translate("draft","BSplines and Bezier curves are not supported by this tool"))
-            if deletable: FreeCAD.ActiveDocument.removeObject(deletable.Name)
-            return None
+            error = translate("draft","BSplines and Bezier curves are not supported by this tool")
         elif tp in ["Circle","Ellipse"]:
             g = (DraftGeomUtils.geom(obj.Shape.Edges[0],nobj.Placement))
-            nobj.addGeometry(g)
+            geoms.append(g)
             # TODO add Radius constraits
             ok = True
         elif tp == "Rectangle":
             if obj.FilletRadius.Value == 0:
                 for edge in obj.Shape.Edges:
-                    nobj.addGeometry(edge.Curve)
+                    geoms.append(edge.Curve)
                 if autoconstraints:
-                    last = nobj.GeometryCount - 1
-                    segs = [last-3,last-2,last-1,last]
-                    if obj.Placement.Rotation.Q == (0,0,0,1):
-                        nobj.addConstraint(Constraint("Coincident",last-3,EndPoint,last-2,StartPoint))
-                        nobj.addConstraint(Constraint("Coincident",last-2,EndPoint,last-1,StartPoint))
-                        nobj.addConstraint(Constraint("Coincident",last-1,EndPoint,last,StartPoint))
-                        nobj.addConstraint(Constraint("Coincident",last,EndPoint,last-3,StartPoint))
-                    nobj.addConstraint(Constraint("Horizontal",last-3))
-                    nobj.addConstraint(Constraint("Vertical",last-2))
-                    nobj.addConstraint(Constraint("Horizontal",last-1))
-                    nobj.addConstraint(Constraint("Vertical",last))
+                    last = first + len(geoms) - 1
+                    constraints.append(Constraint("Horizontal",last-3))
+                    constraints.append(Constraint("Vertical",last-2))
+                    constraints.append(Constraint("Horizontal",last-1))
+                    constraints.append(Constraint("Vertical",last))
                 ok = True
         elif tp in ["Wire","Polygon"]:
             if obj.FilletRadius.Value == 0:
-                closed = False
-                if tp == "Polygon":
-                    closed = True
-                elif hasattr(obj,"Closed"):
-                    closed = obj.Closed
                 for edge in obj.Shape.Edges:
-                    nobj.addGeometry(edge.Curve)
-                if autoconstraints:
-                    last = nobj.GeometryCount
-                    segs = list(range(last-len(obj.Shape.Edges),last-1))
-                    for seg in segs:
-                        nobj.addConstraint(Constraint("Coincident",seg,EndPoint,seg+1,StartPoint))
-                        if DraftGeomUtils.isAligned(nobj.Geometry[seg],"x"):
-                            nobj.addConstraint(Constraint("Vertical",seg))
-                        elif DraftGeomUtils.isAligned(nobj.Geometry[seg],"y"):
-                            nobj.addConstraint(Constraint("Horizontal",seg))
-                    if closed:
-                        nobj.addConstraint(Constraint("Coincident",last-1,EndPoint,segs[0],StartPoint))
+                    g = edge.Curve
+                    if autoconstraints:
+                        seg = first + len(geoms)
+                        if DraftGeomUtils.isAligned(g,"x"):
+                            constraints.append(Constraint("Vertical",seg))
+                        elif DraftGeomUtils.isAligned(g,"y"):
+                            constraints.append(Constraint("Horizontal",seg))
+                    geoms.append(g)
                 ok = True
-        if (not ok) and obj.isDerivedFrom("Part::Feature"):
+        if (not ok) and (not error) and obj.isDerivedFrom("Part::Feature"):
             if not DraftGeomUtils.isPlanar(obj.Shape):
-                FreeCAD.Console.PrintError(translate("draft","The given object is not planar and cannot be converted into a sketch."))
+                error = translate("draft","The given object is not planar and cannot be converted into a sketch.")
+            elif [e for e in obj.Shape.Edges if DraftGeomUtils.geomType(e) in ["BSplineCurve","BezierCurve"]]:
+                error = translate("draft","BSplines and Bezier curves are not supported by this tool")
+        if error:
+            if not skip:
+                FreeCAD.Console.PrintError(error)
+                if deletable: FreeCAD.ActiveDocument.removeObject(deletable.Name)
                 return None
-            for e in obj.Shape.Edges:
-                if DraftGeomUtils.geomType(e) in ["BSplineCurve","BezierCurve"]:
-                    FreeCAD.Console.PrintError(translate("draft","BSplines and Bezier curves are not supported by this tool"))
-                    return None
-            if not addTo:
+            FreeCAD.Console.PrintWarning(translate("draft","Skipping")+" "+obj.Label+": "+error+"\n")
+            skipped += 1
+            continue
+        if (not ok) and obj.isDerivedFrom("Part::Feature"):
+            if not placed:
                 nobj.Placement.Rotation = DraftGeomUtils.calculatePlacement(obj.Shape).Rotation
-            edges = []
+                placed = True
             for e in obj.Shape.Edges:
                 g = (DraftGeomUtils.geom(e,nobj.Placement))
                 if g:
-                    nobj.addGeometry(g)
+                    geoms.append(g)
             ok = True
-        formatObject(nobj,obj)
+        if not formatted:
+            formatObject(nobj,obj)
+            formatted = True
         if ok and delete:
             FreeCAD.ActiveDocument.removeObject(obj.Name)
+    if skipped and (not geoms):
+        # none of the objects could be converted
+        if deletable: FreeCAD.ActiveDocument.removeObject(deletable.Name)
+        return None
+    if autoconstraints:
+        # coincident end points are found through a grid of the points, which
+        # also links the ends of separate objects. Each end point joins the
+        # first group of points it is close to
+        grid = DraftGeomUtils.PointGrid()
+        ends = []
+        for i,g in enumerate(geoms):
+            if isinstance(g,Part.Line):
+                points = [(StartPoint,g.StartPoint),(EndPoint,g.EndPoint)]
+            elif isinstance(g,Part.ArcOfCircle):
+                points = [(StartPoint,g.value(g.FirstParameter)),(EndPoint,g.value(g.LastParameter))]
+            else:
+                continue
+            for pos,p in points:
+                groups = grid.find(p)
+                if groups:
+                    ends[min(groups)].append((first+i,pos))
+                else:
+                    grid.add(p,len(ends))
+                    ends.append([(first+i,pos)])
+        for pts in ends:
+            for j in range(1,len(pts)):
+                constraints.append(Constraint("Coincident",pts[j-1][0],pts[j-1][1],pts[j][0],pts[j][1]))
+    if geoms:
+        nobj.addGeometry(geoms)
+    if constraints:
+        nobj.addConstraint(constraints)
     FreeCAD.ActiveDocument.recompute()
     return nobj
 
@@ -4561,6 +4701,224 @@ class _Block(_DraftObject):
             obj.Shape = shape
         obj.Placement = plm
 
+# the projections of the Shape2DViews, { (document,object):LRUCache({ projection key:shape }) }
+projectioncache = LRUCache(256)
+objectcaches.append(projectioncache)
+# the projections computed in the background, { (document,object,projection key):result }
+projectionjobs = {}
+projectionpool = None
+
+def getPythonExecutable():
+    """getPythonExecutable(): returns the python interpreter running FreeCAD's python,
+    or None if it cannot be found. sys.executable is the FreeCAD executable itself"""
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+    if sys.platform == 'win32':
+        executable = os.path.join(sys.exec_prefix,'python.exe')
+    else:
+        executable = os.path.join(sys.exec_prefix,'bin','python%d.%d' % sys.version_info[:2])
+    if os.path.exists(executable):
+        return executable
+    return None
+
+# the loop of the processes of a ProcessPool: sets the module path, runs the initializer,
+# then reads pickled (function,args) calls from stdin and writes (success,result) to stdout
+processworker = """
+import sys,cPickle
+calls,results = sys.stdin,sys.stdout
+sys.stdout = sys.stderr
+sys.path[:0] = cPickle.load(calls)
+initializer,initargs = cPickle.load(calls)
+if initializer:
+    initializer(*initargs)
+while True:
+    try:
+        function,args = cPickle.load(calls)
+    except EOFError:
+        break
+    try:
+        result = (True,function(*args))
+    except Exception as e:
+        result = (False,type(e).__name__+': '+str(e))
+    cPickle.dump(result,results,2)
+    results.flush()
+"""
+
+class ProcessResult:
+    "The result of a call given to a ProcessPool, like a multiprocessing AsyncResult"
+
+    def __init__(self):
+        import threading
+        self.event = threading.Event()
+        self.success = False
+        self.value = None
+
+    def set(self,success,value):
+        self.success = success
+        self.value = value
+        self.event.set()
+
+    def ready(self):
+        return self.event.is_set()
+
+    def get(self):
+        "returns the result of the call, raises a RuntimeError if it failed"
+        self.event.wait()
+        if not self.success:
+            raise RuntimeError(self.value)
+        return self.value
+
+class ProcessPool:
+    """ProcessPool(processes,[initializer],[initargs]): a pool of python interpreters
+    started as new processes, with the map, imap, apply_async, terminate and join
+    methods of a multiprocessing pool. Unlike the latter under python 2, it does not
+    fork FreeCAD, and can be used with the GUI running. The functions and their
+    arguments are pickled, the functions must be at the top level of a module"""
+
+    def __init__(self,processes=None,initializer=None,initargs=()):
+        import subprocess,threading,Queue,cPickle,multiprocessing
+        executable = getPythonExecutable()
+        if not executable:
+            raise OSError("No python interpreter found")
+        if not processes:
+            processes = multiprocessing.cpu_count()
+        self.calls = Queue.Queue()
+        self.processes = []
+        self.lock = threading.Lock()
+        try:
+            for i in range(processes):
+                process = subprocess.Popen([executable,"-c",processworker],stdin=subprocess.PIPE,stdout=subprocess.PIPE)
+                self.processes.append(process)
+                cPickle.dump(sys.path,process.stdin,2)
+                cPickle.dump((initializer,initargs),process.stdin,2)
+                process.stdin.flush()
+        except (OSError,IOError,cPickle.PicklingError):
+            self.terminate()
+            raise OSError("Unable to start the python processes")
+        self.running = len(self.processes)
+        for process in self.processes:
+            thread = threading.Thread(target=self.serve,args=(process,))
+            thread.daemon = True
+            thread.start()
+
+    def serve(self,process):
+        """gives the queued calls to one process until terminate is called. If the process
+        dies, the other processes take its calls, or they fail if it was the last one"""
+        import cPickle
+        running = True
+        while True:
+            call = self.calls.get()
+            if call is None:
+                return
+            function,args,result = call
+            if not running:
+                result.set(False,"The process has stopped")
+                continue
+            try:
+                cPickle.dump((function,args),process.stdin,2)
+                process.stdin.flush()
+                success,value = cPickle.load(process.stdout)
+            except (IOError,EOFError,cPickle.PickleError) as e:
+                # the process died or the call couldn't be pickled
+                running = False
+                success,value = False,str(e) or "The process has stopped"
+                with self.lock:
+                    self.running -= 1
+                    last = not self.running
+                if not last:
+                    result.set(success,value)
+                    return
+            result.set(success,value)
+
+    def apply_async(self,function,args=()):
+        result = ProcessResult()
+        self.calls.put((function,args,result))
+        return result
+
+    def imap(self,function,iterable,chunksize=1):
+        results = [self.apply_async(function,(arg,)) for arg in iterable]
+        for result in results:
+            yield result.get()
+
+    def map(self,function,iterable,chunksize=None):
+        return list(self.imap(function,iterable))
+
+    def terminate(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+            self.calls.put(None)
+
+    def join(self):
+        for process in self.processes:
+            process.wait()
+
+def getProcessPool(processes=None,initializer=None,initargs=()):
+    """getProcessPool([processes],[initializer],[initargs]): returns a pool of the given
+    number of processes (default: one per core), or None if it cannot be started. The
+    caller must terminate it once done"""
+    try:
+        import multiprocessing
+        if hasattr(multiprocessing,"get_context"):
+            # fresh interpreters rather than copies of the running FreeCAD
+            context = multiprocessing.get_context("spawn")
+        elif gui and sys.platform != 'win32':
+            # python 2 can only fork the processes, which is unsafe with Qt running
+            return ProcessPool(processes,initializer,initargs)
+        else:
+            context = multiprocessing
+        if sys.platform == 'win32' or context is not multiprocessing:
+            # the workers are started with sys.executable, i.e. the FreeCAD executable
+            executable = getPythonExecutable()
+            if executable:
+                context.set_executable(executable)
+        return context.Pool(processes,initializer,initargs)
+    except (ImportError,OSError,ValueError) as e:
+        FreeCAD.Console.PrintLog("Draft: unable to start a process pool: "+str(e)+"\n")
+        return None
+
+def getProjectedEdges(shape,direction,hiddenlines=False):
+    """getProjectedEdges(shape,direction,[hiddenlines]): returns a compound of the visible
+    edges of shape seen along direction, and of its hidden edges if hiddenlines is True"""
+    import Part,Drawing
+    edges = []
+    groups = Drawing.projectEx(shape,direction)
+    for g in groups[0:5]:
+        if g:
+            edges.append(g)
+    if hiddenlines:
+        for g in groups[5:]:
+            edges.append(g)
+    return Part.makeCompound(edges)
+
+def getProjectionPool():
+    """getProjectionPool(): returns the pool of processes projecting the shapes of big
+    Shape2DViews, or None if it cannot be started"""
+    global projectionpool
+    if projectionpool is None:
+        projectionpool = getProcessPool()
+        if not projectionpool:
+            FreeCAD.Console.PrintWarning("Unable to start the projection processes, projecting in FreeCAD\n")
+            projectionpool = False
+    return projectionpool or None
+
+def closeProjectionPool():
+    """closeProjectionPool(): terminates the projection processes once no projection
+    is running in the background anymore"""
+    global projectionpool
+    if projectionpool and not projectionjobs:
+        projectionpool.terminate()
+        projectionpool.join()
+        projectionpool = None
+
+def projectBrep(brep,direction,hiddenlines):
+    """projectBrep(brep,direction,hiddenlines): returns the brep of the projected edges of
+    the given brep, run by the projection processes"""
+    import Part
+    shape = Part.Shape()
+    shape.importBrepFromString(brep)
+    return getProjectedEdges(shape,Vector(direction[0],direction[1],direction[2]),hiddenlines).exportBrepToString()
+
 class _Shape2DView(_DraftObject):
     "The Shape2DView object"
 
@@ -4579,24 +4937,79 @@ class _Shape2DView(_DraftObject):
         obj.SegmentLength = .05
         _DraftObject.__init__(self,obj,"Shape2DView")
 
-    def getProjected(self,obj,shape,direction):
-        "returns projected edges from a shape and a direction"
-        import Part,Drawing,DraftGeomUtils
-        edges = []
-        groups = Drawing.projectEx(shape,direction)
-        for g in groups[0:5]:
-            if g:
-                edges.append(g)
-        if hasattr(obj,"HiddenLines"):
-            if obj.HiddenLines:
-                for g in groups[5:]:
-                    edges.append(g)
-        #return Part.makeCompound(edges)
-        if hasattr(obj,"Tessellation") and obj.Tessellation:
-            return DraftGeomUtils.cleanProjection(Part.makeCompound(edges),obj.Tessellation,obj.SegmentLength)
+    def getProjected(self,obj,shape,direction,inputs):
+        """returns projected edges from a shape and a direction, or None if they are
+        still being computed in the background. inputs is a key identifying the shape
+        (the names and shape revisions of the objects it is made from), and shape can
+        be a function building it, only called if its projection is not cached"""
+        import Part,DraftGeomUtils
+        hiddenlines = hasattr(obj,"HiddenLines") and obj.HiddenLines
+        tessellation = hasattr(obj,"Tessellation") and obj.Tessellation
+        key = (inputs,(direction.x,direction.y,direction.z),hiddenlines,tessellation)
+        if tessellation:
+            key += (obj.SegmentLength,)
+        viewkey = (obj.Document.Name,obj.Name)
+        cache = projectioncache.get(viewkey)
+        if cache is None:
+            cache = LRUCache(8)
+            projectioncache[viewkey] = cache
+        if obj.ProjectionMode == "Individual Faces":
+            # one projection per face, keep those of the current and of the former settings
+            cache.size = max(8,2*len(obj.FaceNumbers))
+        if key in cache:
+            return cache.get(key)
+        comp = None
+        jobkey = viewkey+(key,)
+        if jobkey in projectionjobs:
+            job = projectionjobs[jobkey]
+            if not job.ready():
+                return None
+            del projectionjobs[jobkey]
+            closeProjectionPool()
+            try:
+                comp = Part.Shape()
+                comp.importBrepFromString(job.get())
+            except:
+                FreeCAD.Console.PrintWarning("Background projection of "+obj.Label+" failed, projecting in FreeCAD\n")
+                comp = None
         else:
-            return Part.makeCompound(edges)
-            #return DraftGeomUtils.cleanProjection(Part.makeCompound(edges))
+            if callable(shape):
+                shape = shape()
+            faces = getParam("shape2DViewBackgroundFaces",0)
+            if gui and faces and (len(shape.Faces) >= faces):
+                pool = getProjectionPool()
+                if pool:
+                    projectionjobs[jobkey] = pool.apply_async(projectBrep,(shape.exportBrepToString(),(direction.x,direction.y,direction.z),hiddenlines))
+                    from PySide import QtCore
+                    QtCore.QTimer.singleShot(500,lambda: self.checkProjection(jobkey))
+                    return None
+        if comp is None:
+            if callable(shape):
+                shape = shape()
+            comp = getProjectedEdges(shape,direction,hiddenlines)
+        if tessellation:
+            comp = DraftGeomUtils.cleanProjection(comp,obj.Tessellation,obj.SegmentLength)
+        cache[key] = comp
+        return comp
+
+    def checkProjection(self,jobkey):
+        "recomputes the view once its background projection is done"
+        if not jobkey in projectionjobs:
+            return
+        if not projectionjobs[jobkey].ready():
+            from PySide import QtCore
+            QtCore.QTimer.singleShot(500,lambda: self.checkProjection(jobkey))
+            return
+        docname,name = jobkey[:2]
+        if docname in FreeCAD.listDocuments():
+            doc = FreeCAD.getDocument(docname)
+            obj = doc.getObject(name)
+            if obj:
+                obj.touch()
+                doc.recompute()
+        # the job was not used if the view changed in the meantime
+        projectionjobs.pop(jobkey,None)
+        closeProjectionPool()
 
     def execute(self,obj):
         import DraftGeomUtils
@@ -4617,32 +5030,39 @@ class _Shape2DView(_DraftObject):
                                 shapes.extend(o.Shape.Solids)
                             else:
                                 shapes.append(o.Shape.copy())
-                    cutp,cutv,iv =Arch.getCutVolume(obj.Base.Shape,shapes)
                     cuts = []
                     if obj.ProjectionMode == "Solid":
-                        for sh in shapes:
-                            if cutv:
-                                if sh.Volume < 0:
-                                    sh.reverse()
-                                #if cutv.BoundBox.isIntersection(sh.BoundBox):
-                                #    c = sh.cut(cutv)
-                                #else:
-                                #    c = sh.copy()
-                                c = sh.cut(cutv)
-                                if onlysolids:
-                                    cuts.extend(c.Solids)
+                        def cut():
+                            cutp,cutv,iv =Arch.getCutVolume(obj.Base.Shape,shapes)
+                            for sh in shapes:
+                                if cutv:
+                                    if sh.Volume < 0:
+                                        sh.reverse()
+                                    #if cutv.BoundBox.isIntersection(sh.BoundBox):
+                                    #    c = sh.cut(cutv)
+                                    #else:
+                                    #    c = sh.copy()
+                                    c = sh.cut(cutv)
+                                    if onlysolids:
+                                        cuts.extend(c.Solids)
+                                    else:
+                                        cuts.append(c)
                                 else:
-                                    cuts.append(c)
-                            else:
-                                if onlysolids:
-                                    cuts.extend(sh.Solids)
-                                else:
-                                    cuts.append(sh.copy())
-                        comp = Part.makeCompound(cuts)
+                                    if onlysolids:
+                                        cuts.extend(sh.Solids)
+                                    else:
+                                        cuts.append(sh.copy())
+                            return Part.makeCompound(cuts)
+                        # the section only depends on the section plane and on the cut objects
+                        inputs = ("section",getShapeRevision(obj.Base),onlysolids)
+                        inputs += tuple([(o.Name,getShapeRevision(o)) for o in objs if o.isDerivedFrom("Part::Feature")])
                         opl = FreeCAD.Placement(obj.Base.Placement)
                         proj = opl.Rotation.multVec(FreeCAD.Vector(0,0,1))
-                        obj.Shape = self.getProjected(obj,comp,proj)
+                        comp = self.getProjected(obj,cut,proj,inputs)
+                        if comp is not None:
+                            obj.Shape = comp
                     elif obj.ProjectionMode in ["Cutlines","Cutfaces"]:
+                        cutp,cutv,iv =Arch.getCutVolume(obj.Base.Shape,shapes)
                         for sh in shapes:
                             if sh.Volume < 0:
                                 sh.reverse()
@@ -4666,32 +5086,36 @@ class _Shape2DView(_DraftObject):
                     
             elif obj.Base.isDerivedFrom("App::DocumentObjectGroup"):
                 shapes = []
+                inputs = ("group",)
                 objs = getGroupContents(obj.Base)
                 for o in objs:
                     if o.isDerivedFrom("Part::Feature"):
                         if o.Shape:
                             if not o.Shape.isNull():
                                 shapes.append(o.Shape)
+                                inputs += ((o.Name,getShapeRevision(o)),)
                 if shapes:
                     import Part
                     comp = Part.makeCompound(shapes)
-                    obj.Shape = self.getProjected(obj,comp,obj.Projection)
+                    comp = self.getProjected(obj,comp,obj.Projection,inputs)
+                    if comp is not None:
+                        obj.Shape = comp
                             
             elif obj.Base.isDerivedFrom("Part::Feature"):
                 if not DraftVecUtils.isNull(obj.Projection):
                     if obj.ProjectionMode == "Solid":
-                        obj.Shape = self.getProjected(obj,obj.Base.Shape,obj.Projection)
+                        comp = self.getProjected(obj,obj.Base.Shape,obj.Projection,("base",getShapeRevision(obj.Base)))
+                        if comp is not None:
+                            obj.Shape = comp
                     elif obj.ProjectionMode == "Individual Faces":
                         import Part
                         if obj.FaceNumbers:
-                            faces = []
+                            views = []
                             for i in obj.FaceNumbers:
                                 if len(obj.Base.Shape.Faces) > i:
-                                    faces.append(obj.Base.Shape.Faces[i])
-                            views = []
-                            for f in faces:
-                                views.append(self.getProjected(obj,f,obj.Projection))
-                            if views:
+                                    inputs = ("face",getShapeRevision(obj.Base),i)
+                                    views.append(self.getProjected(obj,obj.Base.Shape.Faces[i],obj.Projection,inputs))
+                            if views and not (None in views):
                                 obj.Shape = Part.makeCompound(views)
         if not DraftGeomUtils.isNull(pl):
             obj.Placement = pl
@@ -4746,31 +5170,34 @@ class _Array(_DraftObject):
             if not DraftGeomUtils.isNull(pl):
                 obj.Placement = pl
 
+    def getInstances(self,shape,num):
+        "returns num references to the geometry of shape, that can be moved independently"
+        import Part
+        return Part.makeCompound([shape]*max(num,1)).childShapes()
+
+    def fuseShapes(self,shapes):
+        "fuses the given shapes by halves, so that each boolean operation stays small"
+        if len(shapes) <= 8:
+            return shapes[0].multiFuse(shapes[1:])
+        half = len(shapes)//2
+        return self.fuseShapes(shapes[:half]).multiFuse([self.fuseShapes(shapes[half:])])
+
     def rectArray(self,shape,xvector,yvector,zvector,xnum,ynum,znum,fuse=False):
         import Part
-        base = [shape.copy()]
-        for xcount in range(xnum):
-            currentxvector=Vector(xvector).multiply(xcount)
-            if not xcount==0:
-                nshape = shape.copy()
-                nshape.translate(currentxvector)
-                base.append(nshape)
-            for ycount in range(ynum):
-                currentyvector=FreeCAD.Vector(currentxvector)
-                currentyvector=currentyvector.add(Vector(yvector).multiply(ycount))
-                if not ycount==0:
-                    nshape = shape.copy()
-                    nshape.translate(currentyvector)
-                    base.append(nshape)
-                for zcount in range(znum):
-                    currentzvector=FreeCAD.Vector(currentyvector)
-                    currentzvector=currentzvector.add(Vector(zvector).multiply(zcount))
-                    if not zcount==0:
-                        nshape = shape.copy()
-                        nshape.translate(currentzvector)
-                        base.append(nshape)
+        # a zero count also drops the next directions, only the base shape is kept if xnum is 0
+        if xnum < 1:
+            ynum = 0
+        if ynum < 1:
+            znum = 0
+        xvectors = [Vector(xvector).multiply(xcount) for xcount in range(xnum)] or [Vector()]
+        yvectors = [Vector(yvector).multiply(ycount) for ycount in range(ynum)] or [Vector()]
+        zvectors = [Vector(zvector).multiply(zcount) for zcount in range(znum)] or [Vector()]
+        moves = [xv.add(yv).add(zv) for xv in xvectors for yv in yvectors for zv in zvectors]
+        base = self.getInstances(shape,len(moves))
+        for nshape,move in zip(base[1:],moves[1:]):
+            nshape.translate(move)
         if fuse and len(base) > 1:
-            return base[0].multiFuse(base[1:]).removeSplitter()
+            return self.fuseShapes(base).removeSplitter()
         else:
             return Part.makeCompound(base)
 
@@ -4783,17 +5210,19 @@ class _Array(_DraftObject):
             if num == 0:
                 return shape
             fraction = float(angle)/(num-1)
-        base = [shape.copy()]
+        base = self.getInstances(shape,num)
+        center = DraftVecUtils.tup(center)
+        axis = DraftVecUtils.tup(axis)
+        if axisvector and DraftVecUtils.isNull(axisvector):
+            axisvector = None
         for i in range(num-1):
             currangle = fraction + (i*fraction)
-            nshape = shape.copy()
-            nshape.rotate(DraftVecUtils.tup(center), DraftVecUtils.tup(axis), currangle)
+            nshape = base[i+1]
+            nshape.rotate(center, axis, currangle)
             if axisvector:
-                if not DraftVecUtils.isNull(axisvector):
-                    nshape.translate(FreeCAD.Vector(axisvector).multiply(i+1))
-            base.append(nshape)
+                nshape.translate(FreeCAD.Vector(axisvector).multiply(i+1))
         if fuse and len(base) > 1:
-            return base[0].multiFuse(base[1:]).removeSplitter()
+            return self.fuseShapes(base).removeSplitter()
         else:
             return Part.makeCompound(base)
 
@@ -4855,8 +5284,9 @@ class _PathArray(_DraftObject):
             length = offset
         return(edge.getParameterByLength(length))
         
-    def orientShape(self,shape,edge,offset,RefPt,xlate,align,normal=None):
-        '''Orient shape to tangent at parm offset along edge.'''
+    def orientShape(self,shape,edge,offset,RefPt,xlate,align,normal=None,parm=None):
+        '''Orient shape to tangent at parm offset along edge. parm is the edge
+        parameter at offset, computed if not given.'''
         # http://en.wikipedia.org/wiki/Euler_angles
         import Part
         import DraftGeomUtils
@@ -4866,7 +5296,7 @@ class _PathArray(_DraftObject):
         x = FreeCAD.Vector(1,0,0)                                    # unit +X
         nullv = FreeCAD.Vector(0,0,0)
         nullPlace =FreeCAD.Placement()
-        ns = shape.copy()
+        ns = Part.makeCompound([shape]).childShapes()[0]             # shares the geometry of shape
         ns.Placement.Base = nullPlace.Base                           # reset Placement point so translate goes to right place.
         ns.Placement.Rotation = shape.Placement.Rotation             # preserve global orientation
         ns.translate(RefPt+xlate)
@@ -4874,13 +5304,15 @@ class _PathArray(_DraftObject):
             return ns
             
         # get local coord system - tangent, normal, binormal, if possible
-        t = edge.tangentAt(self.getParameterFromV0(edge,offset))
+        if parm is None:
+            parm = self.getParameterFromV0(edge,offset)
+        t = edge.tangentAt(parm)
         t.normalize()
         try:
             if normal:
                 n = normal
             else:
-                n = edge.normalAt(self.getParameterFromV0(edge,offset))
+                n = edge.normalAt(parm)
                 n.normalize()
             b = (t.cross(n)) 
             b.normalize()
@@ -4945,18 +5377,18 @@ class _PathArray(_DraftObject):
         step = float(cdist)/stop   
         remain = 0
         travel = step
+        iend = 0
         for i in range(1,stop):                            
-            # which edge in path should contain this shape?
-            iend = len(ends) - 1                                       # avoids problems with float math travel > ends[-1]
-            for j in range(0,len(ends)):  
-                if travel <= ends[j]:                      
-                    iend = j
-                    break
+            # which edge in path should contain this shape? travel only grows,
+            # so the search goes on from the edge of the previous shape
+            while (iend < len(ends) - 1) and (travel > ends[iend]):   # avoids problems with float math travel > ends[-1]
+                iend += 1
             # place shape at proper spot on proper edge
             remains = ends[iend] - travel
             offset = path[iend].Length - remains           
-            pt = path[iend].valueAt(self.getParameterFromV0(path[iend],offset))
-            ns = self.orientShape(shape,path[iend],offset,pt,xlate,align,normal)
+            parm = self.getParameterFromV0(path[iend],offset)
+            pt = path[iend].valueAt(parm)
+            ns = self.orientShape(shape,path[iend],offset,pt,xlate,align,normal,parm)
             base.append(ns)
             travel += step
         return(Part.makeCompound(base))      
@@ -867,64 +867,135 @@ def flattenWire(wire):
     return w
 
 
-def findWires(edgeslist):
-    '''finds connected wires in the given list of edges'''
+class PointGrid:
+    '''PointGrid([tolerance]): an index of points by grid cells, which finds the points
+    closer than tolerance (default: the Draft precision) to a given point without
+    comparing it to all the others. Points are (x,y,z) sequences such as vectors,
+    and each one is added with a value.'''
+
+    def __init__(self,tolerance=None):
+        if tolerance is None:
+            tolerance = 10**(-DraftVecUtils.precision())
+        self.tolerance = tolerance
+        # with cells 4 times the tolerance, the points close to a point are in its
+        # cell and at most in the neighbour cells on the closest sides
+        self.size = 4*tolerance
+        self.cells = {}
+
+    def add(self,point,value):
+        "adds a point with the given value"
+        point = tuple(point)
+        key = tuple([int(math.floor(c/self.size)) for c in point])
+        self.cells.setdefault(key,[]).append((point,value))
+
+    def getCells(self,point):
+        "returns the keys of the cells which can hold points close to the given point"
+        ranges = []
+        for c in point:
+            c = c/self.size
+            i = int(math.floor(c))
+            f = c-i
+            if f < 0.25:
+                ranges.append((i-1,i))
+            elif f > 0.75:
+                ranges.append((i,i+1))
+            else:
+                ranges.append((i,))
+        return [(cx,cy,cz) for cx in ranges[0] for cy in ranges[1] for cz in ranges[2]]
+
+    def isClose(self,p1,p2):
+        "returns True if the two points are closer than the tolerance"
+        return (p1[0]-p2[0])**2+(p1[1]-p2[1])**2+(p1[2]-p2[2])**2 < self.tolerance**2
+
+    def find(self,point):
+        "returns the values of the points close to the given point"
+        values = []
+        for key in self.getCells(point):
+            for p,value in self.cells.get(key,[]):
+                if self.isClose(p,point):
+                    values.append(value)
+        return values
+
+def findConnectedEdges(edgeslist,tolerance=None):
+    '''findConnectedEdges(edgeslist,[tolerance]): sorts the given edges into chains of
+    connected edges. Returns a list of chains, each chain being a list of (edge,forward)
+    tuples in the order the chain is walked, forward being False for edges walked from
+    their last vertex to their first. End points closer than tolerance (default: the
+    Draft precision) are considered connected. A chain starts with the first edge not
+    already used, and at each point continues with the first unused edge ending there,
+    so the result only depends on the order of edgeslist. Closed edges such as full
+    circles are chains of their own.'''
+
+    # index of the end points, with (edge index,end index) values
+    grid = PointGrid(tolerance)
+    ends = []
+    for i,e in enumerate(edgeslist):
+        if len(e.Vertexes) < 2:
+            ends.append(None)
+            continue
+        pts = (tuple(e.Vertexes[0].Point),tuple(e.Vertexes[-1].Point))
+        ends.append(pts)
+        for j in (0,1):
+            grid.add(pts[j],(i,j))
+    free = [True]*len(edgeslist)
+
+    def nextEnd(point):
+        "returns (edge index,end index) of the first free edge ending at point, or None"
+        found = None
+        for key in grid.getCells(point):
+            candidates = grid.cells.get(key)
+            if not candidates:
+                continue
+            if not all([free[c[0]] for p,c in candidates]):
+                # forget the edges already used
+                candidates = grid.cells[key] = [(p,c) for p,c in candidates if free[c[0]]]
+            for p,c in candidates:
+                if (found is None) or (c < found):
+                    if grid.isClose(p,point):
+                        found = c
+        return found
+
+    def walk(point):
+        "returns the (edge,forward) chain leaving from point"
+        chain = []
+        while True:
+            n = nextEnd(point)
+            if not n:
+                return chain
+            i,j = n
+            free[i] = False
+            chain.append((edgeslist[i],j == 0))
+            point = ends[i][1-j]
+
+    chains = []
+    for i,e in enumerate(edgeslist):
+        if not free[i]:
+            continue
+        free[i] = False
+        chain = [(e,True)]
+        if ends[i]:
+            chain.extend(walk(ends[i][1]))
+            before = walk(ends[i][0])
+            before.reverse()
+            chain = [(edge,not forward) for edge,forward in before] + chain
+        chains.append(chain)
+    return chains
 
-    def touches(e1,e2):
-        if len(e1.Vertexes) < 2:
-            return False
-        if len(e2.Vertexes) < 2:
-            return False
-        if DraftVecUtils.equals(e1.Vertexes[0].Point,e2.Vertexes[0].Point):
-            return True
-        if DraftVecUtils.equals(e1.Vertexes[0].Point,e2.Vertexes[-1].Point):
-            return True
-        if DraftVecUtils.equals(e1.Vertexes[-1].Point,e2.Vertexes[0].Point):
-            return True
-        if DraftVecUtils.equals(e1.Vertexes[-1].Point,e2.Vertexes[-1].Point):
-            return True
-        return False
-    
-    edges = edgeslist[:]
-    wires = []
-    lost = []
-    while edges:
-        e = edges[0]
-        if not wires:
-            # create first group
-            edges.remove(e)
-            wires.append([e])
-        else:
-            found = False
-            for w in wires:
-                if not found:
-                    for we in w:
-                        if touches(e,we):
-                            edges.remove(e)
-                            w.append(e)
-                            found = True
-                            break
-            if not found:
-                if e in lost:
-                    # we already tried this edge, and still nothing
-                    edges.remove(e)
-                    wires.append([e])
-                    lost = []
-                else:
-                    # put to the end of the list
-                    edges.remove(e)
-                    edges.append(e)
-                    lost.append(e)
+def findWires(edgeslist):
+    '''findWires(edgeslist): finds connected wires in the given list of edges.
+    The wires have no branches: where more than two edges meet, a wire continues
+    with the first unused edge in list order, and the other edges start other
+    wires. The edges of a group with branches are thus split into several wires.'''
     nwires = []
-    for w in wires:
+    for chain in findConnectedEdges(edgeslist):
         try:
-            wi = Part.Wire(w)
+            wi = Part.Wire([edge for edge,forward in chain])
         except:
             print("couldn't join some edges")
         else:
             nwires.append(wi)
     return nwires
-                
+
 def superWire(edgeslist,closed=False):
         '''superWire(edges,[closed]): forces a wire between edges that don't necessarily
         have coincident endpoints. If closed=True, wire will always be closed'''
@@ -31,6 +31,57 @@ from FreeCAD import Vector
 from pivy import coin
 from PySide import QtCore,QtGui
 
+class EdgeGrid:
+    """A uniform grid of the edges of a shape, indexed by their bounding
+    boxes, used by the Snapper to find the edges near a given edge without
+    testing all the edges of the shape. Cells are about the size of an
+    average edge; edges spanning too many cells are kept aside and always
+    returned."""
+
+    def __init__(self,shape):
+        self.edges = shape.Edges
+        self.boxes = [e.BoundBox for e in self.edges]
+        self.cells = {}
+        self.large = []
+        self.size = 10**(-Draft.precision())
+        if self.boxes:
+            self.size = max(self.size,sum([max(b.XLength,b.YLength,b.ZLength) for b in self.boxes])/len(self.boxes))
+        for i,b in enumerate(self.boxes):
+            r = self.getRange(b)
+            if self.count(r) > 64:
+                self.large.append(i)
+            else:
+                for c in self.getCells(r):
+                    self.cells.setdefault(c,[]).append(i)
+
+    def getRange(self,bb):
+        "returns the min and max cell coordinates covered by a bounding box"
+        s = self.size
+        return ((int(math.floor(bb.XMin/s)),int(math.floor(bb.YMin/s)),int(math.floor(bb.ZMin/s))),
+                (int(math.floor(bb.XMax/s)),int(math.floor(bb.YMax/s)),int(math.floor(bb.ZMax/s))))
+
+    def count(self,r):
+        return (r[1][0]-r[0][0]+1)*(r[1][1]-r[0][1]+1)*(r[1][2]-r[0][2]+1)
+
+    def getCells(self,r):
+        return [(i,j,k) for i in range(r[0][0],r[1][0]+1)
+                        for j in range(r[0][1],r[1][1]+1)
+                        for k in range(r[0][2],r[1][2]+1)]
+
+    def getEdges(self,bb):
+        "returns the edges whose bounding box intersects the given one"
+        r = self.getRange(bb)
+        found = set(self.large)
+        if self.count(r) > len(self.cells):
+            for c,ids in self.cells.items():
+                if (r[0][0] <= c[0] <= r[1][0]) and (r[0][1] <= c[1] <= r[1][1]) and (r[0][2] <= c[2] <= r[1][2]):
+                    found.update(ids)
+        else:
+            for c in self.getCells(r):
+                if c in self.cells:
+                    found.update(self.cells[c])
+        return [self.edges[i] for i in sorted(found) if self.boxes[i].intersect(bb)]
+
 class Snapper:
     """The Snapper objects contains all the functionality used by draft
     and arch module to manage object snapping. It is responsible for
@@ -53,6 +104,8 @@ class Snapper:
 
     def __init__(self):
         self.lastObj = [None,None]
+        self.edgeGrids = Draft.LRUCache(16) # { (document,object):(shape revision,EdgeGrid) }
+        Draft.objectcaches.append(self.edgeGrids)
         self.maxEdges = 0
         self.radius = 0
         self.constraintAxis = None
@@ -301,8 +354,9 @@ class Snapper:
                         if "Edge" in comp:
                             # we are snapping to an edge
                             en = int(comp[4:])-1
-                            if len(obj.Shape.Edges) > en:
-                                edge = obj.Shape.Edges[en]
+                            edges = self.getEdgeGrid(obj).edges
+                            if len(edges) > en:
+                                edge = edges[en]
                                 snaps.extend(self.snapToEndpoints(edge))
                                 snaps.extend(self.snapToMidpoint(edge))
                                 snaps.extend(self.snapToPerpendicular(edge,lastpoint))
@@ -464,7 +518,7 @@ class Snapper:
                 ob = FreeCAD.ActiveDocument.getObject(o)
                 if ob:
                     if ob.isDerivedFrom("Part::Feature"):
-                        edges = ob.Shape.Edges
+                        edges = self.getEdgeGrid(ob).edges[:]
                         if Draft.getType(ob) == "Wall":
                             for so in [ob]+ob.Additions:
                                 if Draft.getType(so) == "Wall":
@@ -758,8 +812,12 @@ class Snapper:
                 obj = FreeCAD.ActiveDocument.getObject(self.lastObj[0])
                 if obj:
                     if obj.isDerivedFrom("Part::Feature"):
-                        if (not self.maxEdges) or (len(obj.Shape.Edges) <= self.maxEdges):
-                            for e in obj.Shape.Edges:
+                        grid = self.getEdgeGrid(obj)
+                        if (not self.maxEdges) or (len(grid.edges) <= self.maxEdges):
+                            # only the edges whose bounding box meets this one can intersect it
+                            bb = shape.BoundBox
+                            bb.enlarge(10**(-Draft.precision()))
+                            for e in grid.getEdges(bb):
                                 # get the intersection points
                                 pt = DraftGeomUtils.findIntersection(e,shape)
                                 if pt:
@@ -767,6 +825,16 @@ class Snapper:
                                         snaps.append([p,'intersection',self.toWP(p)])
         return snaps
         
+    def getEdgeGrid(self,obj):
+        "returns the EdgeGrid of the given object, rebuilt when its shape changes"
+        key = (obj.Document.Name,obj.Name)
+        revision = Draft.getShapeRevision(obj)
+        cached = self.edgeGrids.get(key)
+        if (not cached) or (cached[0] != revision):
+            cached = (revision,EdgeGrid(obj.Shape))
+            self.edgeGrids[key] = cached
+        return cached[1]
+
     def snapToPolygon(self,obj):
         "returns a list of polygon center snap locations"
         snaps = []
@@ -132,6 +132,95 @@ class DraftTest(unittest.TestCase):
         r2 = Draft.offset(r,FreeCAD.Vector(-1,-1,0),copy=True)
         self.failUnless(r2,"Draft Offset failed")
 
+    # geometry utilities
+
+    def testFindWires(self):
+        FreeCAD.Console.PrintLog ('Checking DraftGeomUtils.findWires...\n')
+        import Part, DraftGeomUtils
+        v = FreeCAD.Vector
+        # a square in mixed order and directions
+        edges = [Part.makeLine(v(0,0,0),v(2,0,0)),Part.makeLine(v(0,2,0),v(2,2,0)),
+                 Part.makeLine(v(0,2,0),v(0,0,0)),Part.makeLine(v(2,0,0),v(2,2,0))]
+        # a T: the wire goes on with the first edge in list order, the stem is left alone
+        edges.extend([Part.makeLine(v(5,0,0),v(6,0,0)),Part.makeLine(v(6,1,0),v(6,0,0)),
+                      Part.makeLine(v(7,0,0),v(6,0,0))])
+        wires = DraftGeomUtils.findWires(edges)
+        self.failUnless([len(w.Edges) for w in wires] == [4,2,1],"DraftGeomUtils.findWires failed")
+        self.failUnless(wires[0].isClosed(),"DraftGeomUtils.findWires failed")
+        self.failUnless(wires[2].Vertexes[0].Point == v(7,0,0),"DraftGeomUtils.findWires failed")
+
+    def testGetSVG(self):
+        FreeCAD.Console.PrintLog ('Checking Draft.getSVG...\n')
+        r = Draft.makeRectangle(4,2)
+        FreeCAD.ActiveDocument.recompute()
+        svg = Draft.getSVG(r,direction=FreeCAD.Vector(0,0,1))
+        self.failUnless(svg == Draft.getSVG(r,direction=FreeCAD.Vector(0,0,1)),"Draft.getSVG failed")
+        r.Length = 6
+        FreeCAD.ActiveDocument.recompute()
+        svg2 = Draft.getSVG(r,direction=FreeCAD.Vector(0,0,1))
+        self.failUnless(svg != svg2,"Draft.getSVG failed")
+        # a new shape with the same bounding box
+        r.FilletRadius = 1
+        FreeCAD.ActiveDocument.recompute()
+        self.failUnless(svg2 != Draft.getSVG(r,direction=FreeCAD.Vector(0,0,1)),"Draft.getSVG failed")
+        svg3 = Draft.getSVG(r,direction=FreeCAD.Vector(0,0,1))
+        r.Placement = FreeCAD.Placement(FreeCAD.Vector(1,0,0),FreeCAD.Rotation())
+        self.failUnless(svg3 != Draft.getSVG(r,direction=FreeCAD.Vector(0,0,1)),"Draft.getSVG failed")
+        key = (FreeCAD.ActiveDocument.Name,r.Name)
+        FreeCAD.ActiveDocument.removeObject(r.Name)
+        self.failUnless(not key in Draft.svgcache,"Draft.getSVG cache failed")
+
+    def testEdgeGrid(self):
+        FreeCAD.Console.PrintLog ('Checking DraftSnap.EdgeGrid...\n')
+        import Part, DraftSnap
+        edges = [Part.makeLine(FreeCAD.Vector(i,0,0),FreeCAD.Vector(i,10,0)) for i in range(100)]
+        grid = DraftSnap.EdgeGrid(Part.makeCompound(edges))
+        e = Part.makeLine(FreeCAD.Vector(9.5,5,0),FreeCAD.Vector(12.5,5,0))
+        found = grid.getEdges(e.BoundBox)
+        self.failUnless(len(found) == 3,"DraftSnap.EdgeGrid failed")
+
+    def testSketch(self):
+        FreeCAD.Console.PrintLog ('Checking Draft.makeSketch...\n')
+        pts = [FreeCAD.Vector(0,0,0),FreeCAD.Vector(2,0,0),FreeCAD.Vector(2,2,0),FreeCAD.Vector(0,2,0)]
+        lines = [Draft.makeLine(pts[i-1],pts[i]) for i in range(4)]
+        FreeCAD.ActiveDocument.recompute()
+        s = Draft.makeSketch(lines,autoconstraints=True)
+        self.failUnless(s.GeometryCount == 4,"Draft.makeSketch failed")
+        self.failUnless(len([c for c in s.Constraints if c.Type == "Coincident"]) == 4,"Draft.makeSketch failed")
+        # end points on both sides of a rounding boundary are still coincident
+        e = 10**(-Draft.precision())
+        l1 = Draft.makeLine(FreeCAD.Vector(0,0,0),FreeCAD.Vector(1+0.4*e,0,0))
+        l2 = Draft.makeLine(FreeCAD.Vector(1+0.6*e,0,0),FreeCAD.Vector(1,1,0))
+        FreeCAD.ActiveDocument.recompute()
+        s = Draft.makeSketch([l1,l2],autoconstraints=True)
+        self.failUnless(len([c for c in s.Constraints if c.Type == "Coincident"]) == 1,"Draft.makeSketch failed")
+        # unsupported objects are skipped in a list, and make the whole sketch fail alone
+        b = Draft.makeBSpline([FreeCAD.Vector(0,0,0),FreeCAD.Vector(2,1,0),FreeCAD.Vector(4,0,0)])
+        FreeCAD.ActiveDocument.recompute()
+        s = Draft.makeSketch(lines+[b])
+        self.failUnless(s and s.GeometryCount == 4,"Draft.makeSketch failed")
+        count = len(FreeCAD.ActiveDocument.Objects)
+        self.failUnless(Draft.makeSketch(b) is None,"Draft.makeSketch failed")
+        self.failUnless(len(FreeCAD.ActiveDocument.Objects) == count,"Draft.makeSketch failed")
+
+    def testShape2DView(self):
+        FreeCAD.Console.PrintLog ('Checking Draft Shape2DView...\n')
+        import Part
+        b = FreeCAD.ActiveDocument.addObject("Part::Box","Box")
+        v = Draft.makeShape2DView(b,FreeCAD.Vector(1,1,1))
+        FreeCAD.ActiveDocument.recompute()
+        self.failUnless(not v.Shape.isNull(),"Draft Shape2DView failed")
+        cache = Draft.projectioncache.get((FreeCAD.ActiveDocument.Name,v.Name))
+        self.failUnless(len(cache) == 1,"Draft Shape2DView projection cache failed")
+        key = cache.keys()[0]
+        projected = cache.get(key)
+        v.Placement = FreeCAD.Placement(FreeCAD.Vector(10,0,0),FreeCAD.Rotation())
+        FreeCAD.ActiveDocument.recompute()
+        self.failUnless((cache.keys() == [key]) and (cache.get(key) is projected),"Draft Shape2DView projection cache failed")
+        b.Length = 20
+        FreeCAD.ActiveDocument.recompute()
+        self.failUnless(len(cache) == 2,"Draft Shape2DView projection cache failed")
+
     # modification tools
 
     def tearDown(self):
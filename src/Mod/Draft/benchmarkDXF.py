@@ -0,0 +1,108 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2015 FreeCAD developers                                 *
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="FreeCAD Draft Workbench - DXF join benchmark"
+__author__ = "FreeCAD developers"
+__url__ = ["http://www.freecadweb.org"]
+
+'''
+Measures the joining of the edges of big DXF floor plans.
+Usage: FreeCADCmd benchmarkDXF.py [rooms]
+A floor plan of rooms x rooms square rooms (default 158, about 100000
+segments) is written in random order and directions as LINE entities of a DXF
+file. The file is imported with the "join geometry" option, and its edges are
+joined with DraftGeomUtils.findWires.
+'''
+
+import FreeCAD, os, sys, time, random, tempfile
+import Part, DraftGeomUtils, importDXF
+
+def floorplan(rooms,seed=0):
+    "returns the ((x1,y1),(x2,y2)) segments of a floor plan of rooms x rooms rooms, shuffled"
+    rnd = random.Random(seed)
+    segments = []
+    for i in range(rooms):
+        for j in range(rooms):
+            pts = [(i*10,j*10),(i*10+8,j*10),(i*10+8,j*10+8),(i*10,j*10+8)]
+            for k in range(4):
+                if rnd.random() < 0.5:
+                    segments.append((pts[k],pts[k-1]))
+                else:
+                    segments.append((pts[k-1],pts[k]))
+    rnd.shuffle(segments)
+    return segments
+
+def writeDXF(filename,segments):
+    "writes the segments as the LINE entities of a DXF file"
+    f = open(filename,'w')
+    for section in ("HEADER","TABLES","BLOCKS"):
+        f.write("0\nSECTION\n2\n%s\n0\nENDSEC\n" % section)
+    f.write("0\nSECTION\n2\nENTITIES\n")
+    for (x1,y1),(x2,y2) in segments:
+        f.write("0\nLINE\n8\n0\n10\n%f\n20\n%f\n30\n0.0\n11\n%f\n21\n%f\n31\n0.0\n" % (x1,y1,x2,y2))
+    f.write("0\nENDSEC\n0\nEOF\n")
+    f.close()
+
+def bench_findwires(segments):
+    "returns the time to join the segments with findWires and the number of wires"
+    v = FreeCAD.Vector
+    edges = [Part.makeLine(v(p1[0],p1[1],0),v(p2[0],p2[1],0)) for p1,p2 in segments]
+    init_time = time.time()
+    wires = DraftGeomUtils.findWires(edges)
+    return time.time()-init_time, len(wires)
+
+def bench_import(filename):
+    "returns the time to import filename with the join geometry option"
+    p = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Draft")
+    join = p.GetBool("joingeometry",False)
+    legacy = p.GetBool("dxfUseLegacyImporter",True)
+    p.SetBool("joingeometry",True)
+    p.SetBool("dxfUseLegacyImporter",True)
+    doc = FreeCAD.newDocument("DXFBenchmark")
+    try:
+        init_time = time.time()
+        importDXF.insert(filename,doc.Name)
+        return time.time()-init_time
+    finally:
+        FreeCAD.closeDocument(doc.Name)
+        p.SetBool("joingeometry",join)
+        p.SetBool("dxfUseLegacyImporter",legacy)
+
+def run(rooms=158):
+    segments = floorplan(rooms)
+    t, n = bench_findwires(segments)
+    print "findWires: %d edges joined into %d wires in %.2fs" % (len(segments), n, t)
+    if n != rooms*rooms:
+        print "  wrong number of wires, %d expected" % (rooms*rooms)
+    fd, filename = tempfile.mkstemp(suffix='.dxf')
+    os.close(fd)
+    try:
+        writeDXF(filename,segments)
+        print "DXF import with join geometry: %.2fs" % bench_import(filename)
+    finally:
+        os.remove(filename)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(int(sys.argv[1]))
+    else:
+        run()
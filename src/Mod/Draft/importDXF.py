@@ -773,6 +773,7 @@ def drawBlock(blockref,num=None,createObject=False):
         return None
     #print("creating block ", blockref.name, " containing ", len(blockref.entities.data), " entities")
     shapes = []
+    shape = None
     for line in blockref.entities.get_type('line'):
         s = drawLine(line,forceShape=True)
         if s: shapes.append(s)
@@ -841,17 +842,23 @@ def drawInsert(insert,num=None,clone=False):
         else:
             shape = None
     else:
-        if insert in blockshapes:
-            shape = blockshapes[insert.block].copy()
+        if insert.block in blockshapes:
+            shape = blockshapes[insert.block]
         else:
             shape = None
-            for b in drawing.blocks.data:
-                if b.name == insert.block:
-                    shape = drawBlock(b,num)
+            b = getBlockDef(insert.block)
+            if b:
+                shape = drawBlock(b,num)
         if shape:
             pos = vec(insert.loc)
             rot = math.radians(insert.rotation)
             scale = insert.scale
+            if (scale[0] == 1) and (scale[1] == 1):
+                # a placed reference to the block shape, which is shared by all its inserts
+                # instead of being copied. Inserts nested in blocks compose their placements
+                shape = Part.makeCompound([shape])
+                shape.Placement = FreeCAD.Placement(pos,FreeCAD.Rotation(FreeCAD.Vector(0,0,1),insert.rotation))
+                return shape
             tsf = FreeCAD.Matrix()
             tsf.scale(scale[0],scale[1],0) # for some reason z must be 0 to work
             tsf.rotateZ(rot)
@@ -875,24 +882,33 @@ def drawLayerBlock(objlist):
             pass
     return obj
 
+def getBlockDef(name):
+    "returns the dxf block definition with the given name, or None"
+    global blockdefs
+    if blockdefs is None:
+        blockdefs = {}
+        for b in drawing.blocks.data:
+            blockdefs.setdefault(b.name,b)
+    return blockdefs.get(name)
+
 def attribs(insert):
     "checks if an insert has attributes, and returns the values if yes"
+    global entityindex
     atts = []
     if rawValue(insert,66) != 1: return []
-    index = None
-    for i in range(len(drawing.entities.data)):
-        if drawing.entities.data[i] == insert:
-            index = i
-            break
+    if entityindex is None:
+        entityindex = dict([(id(e),i) for i,e in enumerate(drawing.entities.data)])
+    index = entityindex.get(id(insert))
     if index == None: return []
     j = index+1
-    while True:
+    while j < len(drawing.entities.data):
         ent = drawing.entities.data[j]
-        if str(ent) == 'seqend':
-            return atts
-        elif str(ent) == 'attrib':
+        if str(ent) == 'attrib':
             atts.append(ent)
             j += 1
+        else:
+            break
+    return atts
 
 def addObject(shape,name="Shape",layer=None):
     "adds a new object to the document with passed arguments"
@@ -982,12 +998,54 @@ def addText(text,attrib=False):
             newob.ViewObject.DisplayMode = "World"
             formatObject(newob,text)
 
-def addToBlock(obj,layer):
-    "adds given shape to the layer dict"
-    if layer in layerBlocks:
-        layerBlocks[layer].append(obj)
+def addToBlock(obj,layer,dxfobj=None):
+    "adds given shape to the layer dict, keeping the handle of the dxf entity it comes from"
+    key = layer
+    if dxfGroupColors and hasattr(dxfobj,"color_index"):
+        key = (layer,dxfobj.color_index)
+    if key in layerBlocks:
+        layerBlocks[key].append(obj)
     else:
-        layerBlocks[layer] = [obj]
+        layerBlocks[key] = [obj]
+        layerFormats[key] = dxfobj
+    if isinstance(obj,Part.Shape):
+        handle = None
+        if dxfobj:
+            handle = rawValue(dxfobj,5)
+        layerSources.setdefault(key,[]).append((str(handle or ""),len(obj.Edges)))
+
+def addLayerBlock(shape,name,layer,sources):
+    """adds a layer compound to the document. The handles of the DXF entities it is made of
+    are kept in its DxfHandles property, and the index of the first edge of each of them
+    in its DxfEdges property (see getDxfHandle)"""
+    newob = doc.addObject("Part::FeaturePython",name)
+    newob.addProperty("App::PropertyStringList","DxfHandles","Dxf","The handles of the DXF entities this object is made of")
+    newob.addProperty("App::PropertyIntegerList","DxfEdges","Dxf","The index of the first edge of each DXF entity")
+    newob.Shape = shape
+    handles = []
+    edges = []
+    count = 0
+    for handle,n in sources:
+        handles.append(handle)
+        edges.append(count)
+        count += n
+    newob.DxfHandles = handles
+    newob.DxfEdges = edges
+    if newob.ViewObject:
+        newob.ViewObject.Proxy = 0
+    if layer:
+        locateLayer(layer).addObject(newob)
+    return newob
+
+def getDxfHandle(obj,index):
+    """getDxfHandle(obj,index): returns the handle of the DXF entity the edge number index
+    (starting at 0, Edge1 being 0) of an object imported as a layer compound comes from"""
+    import bisect
+    if hasattr(obj,"DxfEdges") and obj.DxfEdges:
+        i = bisect.bisect_right(obj.DxfEdges,index)-1
+        if (i >= 0) and obj.DxfHandles[i]:
+            return obj.DxfHandles[i]
+    return None
 
 def processdxf(document,filename,getShapes=False):
     "this does the translation of the dxf contents into FreeCAD Part objects"
@@ -1000,13 +1058,18 @@ def processdxf(document,filename,getShapes=False):
     doc = document
     global blockshapes
     blockshapes = {}
+    global blockdefs, entityindex
+    blockdefs = None # { name:block } built on first use
+    entityindex = None # { id(entity):index in drawing.entities.data } built on first use
     global blockobjects
     blockobjects = {}
     global badobjects
     badobjects = []
-    global layerBlocks
-    layerBlocks = {}
-    sketch = None
+    global layerBlocks, layerSources, layerFormats
+    layerBlocks = {} # { layer or (layer,color):[shape,...] }
+    layerSources = {} # { layer or (layer,color):[(handle,number of edges),...] }
+    layerFormats = {} # { layer or (layer,color):first dxf entity }
+    sketchobjects = [] # objects converted together into a single sketch
     shapes = []
 
     # drawing lines
@@ -1019,11 +1082,7 @@ def processdxf(document,filename,getShapes=False):
             if shape:
                 if dxfCreateSketch:
                     if dxfMakeBlocks or dxfJoin:
-                        if sketch:
-                            shape = Draft.makeSketch(shape,autoconstraints=True,addTo=sketch)
-                        else:
-                            shape = Draft.makeSketch(shape,autoconstraints=True)
-                            sketch = shape
+                        sketchobjects.append(shape)
                     else:
                         shape = Draft.makeSketch(shape,autoconstraints=True)
                 elif dxfJoin or getShapes:
@@ -1032,7 +1091,7 @@ def processdxf(document,filename,getShapes=False):
                     else:
                         shapes.append(shape.Shape)
                 elif dxfMakeBlocks:
-                    addToBlock(shape,line.layer)
+                    addToBlock(shape,line.layer,line)
                 else:
                     newob = addObject(shape,"Line",line.layer)
                     if gui: formatObject(newob,line)
@@ -1064,11 +1123,7 @@ def processdxf(document,filename,getShapes=False):
                         t.Shape = shape
                         shape = t
                     if dxfMakeBlocks or dxfJoin:
-                        if sketch:
-                            shape = Draft.makeSketch(shape,autoconstraints=True,addTo=sketch)
-                        else:
-                            shape = Draft.makeSketch(shape,autoconstraints=True)
-                            sketch = shape
+                        sketchobjects.append(shape)
                     else:
                         shape = Draft.makeSketch(shape,autoconstraints=True)
                 elif dxfJoin or getShapes:
@@ -1077,7 +1132,7 @@ def processdxf(document,filename,getShapes=False):
                     else:
                         shapes.append(shape.Shape)
                 elif dxfMakeBlocks:
-                    addToBlock(shape,polyline.layer)
+                    addToBlock(shape,polyline.layer,polyline)
                 else:
                     newob = addObject(shape,"Polyline",polyline.layer)
                     if gui: formatObject(newob,polyline)
@@ -1093,11 +1148,7 @@ def processdxf(document,filename,getShapes=False):
             if shape:
                 if dxfCreateSketch:
                     if dxfMakeBlocks or dxfJoin:
-                        if sketch:
-                            shape = Draft.makeSketch(shape,autoconstraints=True,addTo=sketch)
-                        else:
-                            shape = Draft.makeSketch(shape,autoconstraints=True)
-                            sketch = shape
+                        sketchobjects.append(shape)
                     else:
                         shape = Draft.makeSketch(shape,autoconstraints=True)
                 elif dxfJoin or getShapes:
@@ -1106,7 +1157,7 @@ def processdxf(document,filename,getShapes=False):
                     else:
                         shapes.append(shape.Shape)
                 elif dxfMakeBlocks:
-                    addToBlock(shape,arc.layer)
+                    addToBlock(shape,arc.layer,arc)
                 else:
                     newob = addObject(shape,"Arc",arc.layer)
                     if gui: formatObject(newob,arc)
@@ -1118,12 +1169,12 @@ def processdxf(document,filename,getShapes=False):
         edges = []
         for s in shapes:
             edges.extend(s.Edges)
-        if len(edges) > (100):
-            FreeCAD.Console.PrintMessage(str(len(edges))+" edges to join\n")
+        FreeCAD.Console.PrintMessage(str(len(edges))+" edges to join\n")
+        if gui and (len(edges) > 100000):
             from PySide import QtGui
             d = QtGui.QMessageBox()
-            d.setText("Warning: High number of entities to join (>100)")
-            d.setInformativeText("This might take a long time or even freeze your computer. Are you sure? You can also disable the \"join geometry\" setting in DXF import preferences")
+            d.setText("Warning: High number of entities to join (>100000)")
+            d.setInformativeText("This might take a long time. Are you sure? You can also disable the \"join geometry\" setting in DXF import preferences")
             d.setStandardButtons(QtGui.QMessageBox.Ok | QtGui.QMessageBox.Cancel)
             d.setDefaultButton(QtGui.QMessageBox.Cancel)
             res = d.exec_()
@@ -1144,15 +1195,11 @@ def processdxf(document,filename,getShapes=False):
             if shape:
                 if dxfCreateSketch:
                     if dxfMakeBlocks or dxfJoin:
-                        if sketch:
-                            shape = Draft.makeSketch(shape,autoconstraints=True,addTo=sketch)
-                        else:
-                            shape = Draft.makeSketch(shape,autoconstraints=True)
-                            sketch = shape
+                        sketchobjects.append(shape)
                     else:
                         shape = Draft.makeSketch(shape,autoconstraints=True)
                 elif dxfMakeBlocks:
-                    addToBlock(shape,circle.layer)
+                    addToBlock(shape,circle.layer,circle)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
                         shapes.append(shape)
@@ -1162,6 +1209,10 @@ def processdxf(document,filename,getShapes=False):
                     newob = addObject(shape,"Circle",circle.layer)
                     if gui: formatObject(newob,circle)
 
+    if sketchobjects:
+        FreeCAD.Console.PrintMessage("creating sketch from "+str(len(sketchobjects))+" objects...\n")
+        Draft.makeSketch(sketchobjects,autoconstraints=True)
+
     # drawing solids
 
     solids = drawing.entities.get_type("solid")
@@ -1172,7 +1223,7 @@ def processdxf(document,filename,getShapes=False):
             shape = drawSolid(solid)
             if shape:
                 if dxfMakeBlocks:
-                    addToBlock(shape,lay)
+                    addToBlock(shape,lay,solid)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
                         shapes.append(shape)
@@ -1192,7 +1243,7 @@ def processdxf(document,filename,getShapes=False):
             shape = drawSpline(spline)
             if shape:
                 if dxfMakeBlocks:
-                    addToBlock(shape,lay)
+                    addToBlock(shape,lay,spline)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
                         shapes.append(shape)
@@ -1212,7 +1263,7 @@ def processdxf(document,filename,getShapes=False):
             shape = drawEllipse(ellipse)
             if shape:
                 if dxfMakeBlocks:
-                    addToBlock(shape,lay)
+                    addToBlock(shape,lay,ellipse)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
                         shapes.append(shape)
@@ -1247,6 +1298,8 @@ def processdxf(document,filename,getShapes=False):
                     shapes.append(shape)
                 else:
                     shapes.append(shape.Shape)
+            elif dxfMakeBlocks:
+                addToBlock(shape,face3d.layer,face3d)
             else:
                 newob = addObject(shape,"Face",face3d.layer)
                 if gui: formatObject(newob,face3d)
@@ -1340,7 +1393,7 @@ def processdxf(document,filename,getShapes=False):
                 if dxfImportLayouts or (not rawValue(point,67)):
                     if dxfMakeBlocks:
                         shape = Part.Vertex(x,y,z)
-                        addToBlock(shape,lay)
+                        addToBlock(shape,lay,point)
                     else:
                         newob = Draft.makePoint(x,y,z)
                         lay = locateLayer(lay)
@@ -1385,7 +1438,7 @@ def processdxf(document,filename,getShapes=False):
                         points.append(points[0])
                         s = Part.makePolygon(points)
                         if dxfMakeBlocks:
-                            addToBlock(s,lay)
+                            addToBlock(s,lay,hatch)
                         else:
                             newob = addObject(s,"Hatch",lay)
                             if gui:
@@ -1425,7 +1478,7 @@ def processdxf(document,filename,getShapes=False):
                 shape = drawInsert(insert,num)
             if shape:
                 if dxfMakeBlocks:
-                    addToBlock(shape,insert.layer)
+                    addToBlock(shape,insert.layer,insert)
                 else:
                     newob = addObject(shape,"Block."+insert.block,insert.layer)
                     if gui: formatObject(newob,insert)
@@ -1438,8 +1491,21 @@ def processdxf(document,filename,getShapes=False):
         for k,l in layerBlocks.items():
             shape = drawLayerBlock(l)
             if shape:
-                newob = addObject(shape,k)
-    del layerBlocks
+                if isinstance(k,tuple):
+                    layer = k[0]
+                    name = k[0]+"_"+str(k[1])
+                else:
+                    layer = name = k
+                if isinstance(shape,Part.Shape) and (len(layerSources.get(k,[])) == len(l)):
+                    newob = addLayerBlock(shape,name,layer,layerSources[k])
+                    if gui:
+                        if isinstance(k,tuple):
+                            formatObject(newob,layerFormats[k])
+                        else:
+                            formatObject(newob)
+                else:
+                    newob = addObject(shape,name)
+    del layerBlocks, layerSources, layerFormats
 
     # hide block objects, if any
 
@@ -1632,41 +1698,148 @@ def getWire(wire,nospline=False,lw=True):
     # print("wire verts: ",points)
     return points
 
+class DxfWriter:
+    """writes the dxf group codes of the exported objects directly to temporary
+    files as they come, instead of keeping a dxfLibrary Drawing of all of them
+    in memory. Lines, arcs, circles and polylines are written by the add*
+    methods, any other dxfLibrary entity can be passed to append(). The final
+    file is assembled by saveas(), once the layers are all known."""
+
+    def __init__(self):
+        import tempfile
+        self.layers = ["0"]
+        self.blocks = tempfile.TemporaryFile()
+        self.entities = tempfile.TemporaryFile()
+        self.out = self.entities
+
+    def _common(self,color,layer):
+        if not layer in self.layers:
+            self.layers.append(layer)
+        return "8\n%s\n62\n%i\n" % (layer,color)
+
+    def append(self,entity):
+        "writes a dxfLibrary entity"
+        if hasattr(entity,"layer") and not (entity.layer in self.layers):
+            self.layers.append(entity.layer)
+        self.out.write(str(entity))
+
+    def addLine(self,p1,p2,color,layer):
+        self.out.write("0\nLINE\n%s10\n%.12g\n20\n%.12g\n30\n%.12g\n11\n%.12g\n21\n%.12g\n31\n%.12g\n" %
+                       (self._common(color,layer),p1.x,p1.y,p1.z,p2.x,p2.y,p2.z))
+
+    def addCircle(self,center,radius,color,layer):
+        self.out.write("0\nCIRCLE\n%s10\n%.12g\n20\n%.12g\n30\n%.12g\n40\n%.12g\n" %
+                       ((self._common(color,layer),)+tuple(center)+(radius,)))
+
+    def addArc(self,center,radius,ang1,ang2,color,layer):
+        self.out.write("0\nARC\n%s10\n%.12g\n20\n%.12g\n30\n%.12g\n40\n%.12g\n50\n%.12g\n51\n%.12g\n" %
+                       ((self._common(color,layer),)+tuple(center)+(radius,ang1,ang2)))
+
+    def addPolyline(self,points,closed,color,layer,lw=True):
+        "writes a polyline from a list of points in the LWpolyline format of getWire()"
+        common = self._common(color,layer)
+        if lw:
+            self.out.write("0\nLWPOLYLINE\n%s90\n%i\n70\n%i\n38\n%.12g\n" % (common,len(points),closed,points[0][2]))
+            self.out.write("".join(["10\n%.12g\n20\n%.12g\n42\n%.12g\n" % (p[0],p[1],p[5]) for p in points]))
+        else:
+            self.out.write("0\nPOLYLINE\n%s66\n1\n10\n0.0\n20\n0.0\n30\n0.0\n70\n%i\n" % (common,closed))
+            vertex = "0\nVERTEX\n8\n"+layer+"\n10\n%.12g\n20\n%.12g\n30\n%.12g\n42\n%.12g\n"
+            self.out.write("".join([vertex % (p[0],p[1],p[2],p[5]) for p in points]))
+            self.out.write("0\nSEQEND\n8\n%s\n" % layer)
+
+    def beginBlock(self,name,layer):
+        "starts a block definition: what is written until endBlock() goes into it"
+        if not layer in self.layers:
+            self.layers.append(layer)
+        name = name.upper()
+        self.out = self.blocks
+        self.out.write("0\nBLOCK\n8\n%s\n2\n%s\n70\n0\n10\n0.0\n20\n0.0\n30\n0.0\n3\n%s\n" % (layer,name,name))
+
+    def endBlock(self):
+        self.out.write("0\nENDBLK\n")
+        self.out = self.entities
+
+    def saveas(self,filename):
+        "writes the dxf file"
+        import shutil
+        f = pythonopen(filename,"wb")
+        f.write("999\nFreeCAD DXF exporter v"+FreeCAD.Version()[0]+"."+FreeCAD.Version()[1]+"-"+FreeCAD.Version()[2]+"\n")
+        f.write("0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n0\nENDSEC\n")
+        f.write("0\nSECTION\n2\nTABLES\n")
+        f.write("0\nTABLE\n2\nLTYPE\n70\n1\n0\nLTYPE\n2\nCONTINUOUS\n70\n0\n3\nSolid line\n72\n65\n73\n0\n40\n0.0\n0\nENDTAB\n")
+        f.write("0\nTABLE\n2\nLAYER\n70\n%i\n" % len(self.layers))
+        for layer in self.layers:
+            f.write("0\nLAYER\n2\n%s\n70\n0\n62\n7\n6\nCONTINUOUS\n" % layer)
+        f.write("0\nENDTAB\n")
+        f.write("0\nTABLE\n2\nSTYLE\n70\n1\n0\nSTYLE\n2\nSTANDARD\n70\n0\n40\n0.0\n41\n1.0\n50\n0.0\n71\n0\n42\n1.0\n3\ntxt\n4\n\n0\nENDTAB\n")
+        f.write("0\nENDSEC\n")
+        f.write("0\nSECTION\n2\nBLOCKS\n")
+        self.blocks.seek(0)
+        shutil.copyfileobj(self.blocks,f)
+        f.write("0\nENDSEC\n")
+        f.write("0\nSECTION\n2\nENTITIES\n")
+        self.entities.seek(0)
+        shutil.copyfileobj(self.entities,f)
+        f.write("0\nENDSEC\n0\nEOF\n")
+        f.close()
+        self.blocks.close()
+        self.entities.close()
+
 def getBlock(sh,obj,lwPoly=False):
     "returns a dxf block with the contents of the object"
     block = dxfLibrary.Block(name=obj.Name,layer=getGroup(obj))
     writeShape(sh,obj,block,lwPoly)
     return block
 
+def writeBlock(sh,ob,dxf,nospline=False,lwPoly=False):
+    "writes the object's shape as a block of the given drawing, and inserts it"
+    if isinstance(dxf,DxfWriter):
+        dxf.beginBlock(ob.Name,getGroup(ob))
+        writeShape(sh,ob,dxf,nospline,lwPoly)
+        dxf.endBlock()
+    else:
+        dxf.blocks.append(getBlock(sh,ob,lwPoly))
+    dxf.append(dxfLibrary.Insert(name=ob.Name.upper()))
+
 def writeShape(sh,ob,dxfobject,nospline=False,lwPoly=False):
     "writes the object's shape contents in the given dxf object"
-    processededges = []
+    layer = getGroup(ob)
+    color = getACI(ob)
+    stream = isinstance(dxfobject,DxfWriter)
+    processededges = {}
     for wire in sh.Wires: # polylines
         for e in wire.Edges:
-            processededges.append(e.hashCode())
+            processededges[e.hashCode()] = True
         if (len(wire.Edges) == 1) and (DraftGeomUtils.geomType(wire.Edges[0]) == "Circle"):
             center, radius, ang1, ang2 = getArcData(wire.Edges[0])
             if center != None:
-                if len(wire.Edges[0].Vertexes) == 1: # circle
+                if stream:
+                    if len(wire.Edges[0].Vertexes) == 1:
+                        dxfobject.addCircle(center,radius,color,layer)
+                    else:
+                        dxfobject.addArc(center,radius,ang1,ang2,color,layer)
+                elif len(wire.Edges[0].Vertexes) == 1: # circle
                     dxfobject.append(dxfLibrary.Circle(center, radius,
-                                                       color=getACI(ob),
-                                                       layer=getGroup(ob)))
+                                                       color=color,
+                                                       layer=layer))
                 else: # arc
                     dxfobject.append(dxfLibrary.Arc(center, radius,
-                                                    ang1, ang2, color=getACI(ob),
-                                                    layer=getGroup(ob)))
+                                                    ang1, ang2, color=color,
+                                                    layer=layer))
         else:
-            if (lwPoly):
+            if stream:
+                dxfobject.addPolyline(getWire(wire,nospline),int(DraftGeomUtils.isReallyClosed(wire)),color,layer,lwPoly)
+            elif (lwPoly):
                 if hasattr(dxfLibrary,"LwPolyLine"):
                     dxfobject.append(dxfLibrary.LwPolyLine(getWire(wire,nospline), [0.0,0.0],
-                                                           int(DraftGeomUtils.isReallyClosed(wire)), color=getACI(ob),
-                                                           layer=getGroup(ob)))
+                                                           int(DraftGeomUtils.isReallyClosed(wire)), color=color,
+                                                           layer=layer))
                 else:
                     FreeCAD.Console.PrintWarning("LwPolyLine support not found. Please delete dxfLibrary.py from your FreeCAD user directory to force auto-update\n")
             else :
                 dxfobject.append(dxfLibrary.PolyLine(getWire(wire,nospline,lw=False), [0.0,0.0,0.0],
-                                                     int(DraftGeomUtils.isReallyClosed(wire)), color=getACI(ob),
-                                                     layer=getGroup(ob)))
+                                                     int(DraftGeomUtils.isReallyClosed(wire)), color=color,
+                                                     layer=layer))
     if len(processededges) < len(sh.Edges): # lone edges
         loneedges = []
         for e in sh.Edges:
@@ -1679,29 +1852,34 @@ def writeShape(sh,ob,dxfobject,nospline=False,lwPoly=False):
                     c = DraftGeomUtils.getCircleFromSpline(edge)
                     if c:
                         dxfobject.append(dxfLibrary.Circle(DraftVecUtils.tup(c.Curve.Center), c.Curve.Radius,
-                                                           color=getACI(ob),
-                                                           layer=getGroup(ob)))
+                                                           color=color,
+                                                           layer=layer))
                 else:
                     points = []
                     spline = getSplineSegs(edge)
                     for p in spline:
                         points.append(((p.x,p.y,p.z),None,[None,None],0.0))
                     dxfobject.append(dxfLibrary.PolyLine(points, [0.0,0.0,0.0],
-                                                         0, color=getACI(ob),
-                                                         layer=getGroup(ob)))
+                                                         0, color=color,
+                                                         layer=layer))
             elif DraftGeomUtils.geomType(edge) == "Circle": # curves
                 center, radius, ang1, ang2 = getArcData(edge)
                 if center != None:
                     if not isinstance(center,tuple):
                         center = DraftVecUtils.tup(center)
-                    if len(edge.Vertexes) == 1: # circles
+                    if stream:
+                        if len(edge.Vertexes) == 1:
+                            dxfobject.addCircle(center,radius,color,layer)
+                        else:
+                            dxfobject.addArc(center,radius,ang1,ang2,color,layer)
+                    elif len(edge.Vertexes) == 1: # circles
                         dxfobject.append(dxfLibrary.Circle(center, radius,
-                                                           color=getACI(ob),
-                                                           layer=getGroup(ob)))
+                                                           color=color,
+                                                           layer=layer))
                     else : # arcs
                         dxfobject.append(dxfLibrary.Arc(center, radius,
-                                                        ang1, ang2, color=getACI(ob),
-                                                        layer=getGroup(ob)))
+                                                        ang1, ang2, color=color,
+                                                        layer=layer))
             elif DraftGeomUtils.geomType(edge) == "Ellipse": # ellipses:
                 if FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Draft").GetBool("DiscretizeEllipses",True):
                     points = []
@@ -1709,8 +1887,8 @@ def writeShape(sh,ob,dxfobject,nospline=False,lwPoly=False):
                     for p in spline:
                         points.append(((p.x,p.y,p.z),None,[None,None],0.0))
                     dxfobject.append(dxfLibrary.PolyLine(points, [0.0,0.0,0.0],
-                                                         0, color=getACI(ob),
-                                                         layer=getGroup(ob)))
+                                                         0, color=color,
+                                                         layer=layer))
                 else:
                     if hasattr(dxfLibrary,"Ellipse"):
                         center = DraftVecUtils.tup(edge.Curve.Center)
@@ -1724,17 +1902,20 @@ def writeShape(sh,ob,dxfobject,nospline=False,lwPoly=False):
                         dxfobject.append(dxfLibrary.Ellipse(center=center,majorAxis=major,normalAxis=norm,
                                                             minorAxisRatio=minor,startParameter=start,
                                                             endParameter=end,
-                                                            color=getACI(ob),
-                                                            layer=getGroup(ob)))
+                                                            color=color,
+                                                            layer=layer))
                     else:
                         FreeCAD.Console.PrintWarning("Ellipses support not found. Please delete dxfLibrary.py from your FreeCAD user directory to force auto-update\n")
             else: # anything else is treated as lines
                 if len(edge.Vertexes) > 1:
                     ve1=edge.Vertexes[0].Point
                     ve2=edge.Vertexes[1].Point
-                    dxfobject.append(dxfLibrary.Line([DraftVecUtils.tup(ve1), DraftVecUtils.tup(ve2)],
-                                                     color=getACI(ob),
-                                                     layer=getGroup(ob)))
+                    if stream:
+                        dxfobject.addLine(ve1,ve2,color,layer)
+                    else:
+                        dxfobject.append(dxfLibrary.Line([DraftVecUtils.tup(ve1), DraftVecUtils.tup(ve2)],
+                                                         color=color,
+                                                         layer=layer))
 
 def writeMesh(ob,dxfobject):
     "export a shape as a polyface mesh"
@@ -1773,7 +1954,10 @@ def export(objectslist,filename,nospline=False,lwPoly=False):
 
         else:
             # other cases, treat edges
-            dxf = dxfLibrary.Drawing()
+            if dxfStreamExport:
+                dxf = DxfWriter()
+            else:
+                dxf = dxfLibrary.Drawing()
             for ob in exportList:
                 print("processing "+str(ob.Name))
                 if ob.isDerivedFrom("Part::Feature"):
@@ -1799,14 +1983,10 @@ def export(objectslist,filename,nospline=False,lwPoly=False):
                                         writeShape(sh,ob,dxf,nospline,lwPoly)
                                     else:
                                         # 1 wire + lone edges -> block
-                                        block = getBlock(sh,ob,lwPoly)
-                                        dxf.blocks.append(block)
-                                        dxf.append(dxfLibrary.Insert(name=ob.Name.upper()))
+                                        writeBlock(sh,ob,dxf,nospline,lwPoly)
                                 else:
                                     # all other cases: block
-                                    block = getBlock(sh,ob,lwPoly)
-                                    dxf.blocks.append(block)
-                                    dxf.append(dxfLibrary.Insert(name=ob.Name.upper()))
+                                    writeBlock(sh,ob,dxf,nospline,lwPoly)
                             else:
                                 writeShape(sh,ob,dxf,nospline,lwPoly)
 
@@ -1960,13 +2140,15 @@ def readPreferences():
     global dxfCreatePart, dxfCreateDraft, dxfCreateSketch, dxfDiscretizeCurves, dxfStarBlocks
     global dxfMakeBlocks, dxfJoin, dxfRenderPolylineWidth, dxfImportTexts, dxfImportLayouts
     global dxfImportPoints, dxfImportHatches, dxfUseStandardSize, dxfGetColors, dxfUseDraftVisGroups
-    global dxfFillMode, dxfBrightBackground, dxfDefaultColor, dxfUseLegacyImporter
+    global dxfFillMode, dxfBrightBackground, dxfDefaultColor, dxfUseLegacyImporter, dxfGroupColors
+    global dxfStreamExport
     dxfCreatePart = p.GetBool("dxfCreatePart",True)
     dxfCreateDraft = p.GetBool("dxfCreateDraft",False)
     dxfCreateSketch = p.GetBool("dxfCreateSketch",False)
     dxfDiscretizeCurves = p.GetBool("DiscretizeEllipses",True)
     dxfStarBlocks = p.GetBool("dxfstarblocks",False)
     dxfMakeBlocks = p.GetBool("groupLayers",False)
+    dxfGroupColors = p.GetBool("groupLayersColors",False)
     dxfJoin = p.GetBool("joingeometry",False)
     dxfRenderPolylineWidth = p.GetBool("renderPolylineWidth",False)
     dxfImportTexts = p.GetBool("dxftext",False)
@@ -1978,5 +2160,6 @@ def readPreferences():
     dxfUseDraftVisGroups = p.GetBool("dxfUseDraftVisGroups",False)
     dxfFillMode = p.GetBool("fillmode",True)
     dxfUseLegacyImporter = p.GetBool("dxfUseLegacyImporter",True)
+    dxfStreamExport = p.GetBool("dxfStreamExport",False)
     dxfBrightBackground = isBrightBackground()
     dxfDefaultColor = getColor()
@@ -379,6 +379,332 @@ def getrgb(color):
         b = str(hex(int(color[2]*255)))[2:].zfill(2)
         return "#"+r+g+b
 
+pathcommandsre=re.compile('\s*?([mMlLhHvVaAcCqQsStTzZ])\s*?([^mMlLhHvVaAcCqQsStTzZ]*)\s*?',re.DOTALL)
+pointsre=re.compile('([-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?)',re.DOTALL)
+
+# the number of path segments from which the paths are built by svgImportProcesses processes
+pathprocesssegments = 10000
+
+def parsePath(pathdata):
+        '''parsePath(pathdata): parses the d attribute of a svg path into its subpaths,
+        without building any shape. Returns [(kinds,coords,closed)], kinds being a
+        string of segment types: L for a line, Z for the line closing the subpath,
+        A for an arc, C and Q for cubic and quadratic bezier curves, coords an array
+        of the absolute coordinates of the segments (see makePathEdges), and closed
+        True if the subpath ends with a closepath command'''
+        import array
+        subpaths = []
+        kinds = []
+        coords = array.array('d')
+        lastvec = Vector(0,0,0)
+        lastpole = None
+        firstvec = None
+        for d,pointsstr in pathcommandsre.findall(pathdata):
+                relative = d.islower()
+                pointlist = [float(number) for number,exponent in pointsre.findall(pointsstr.replace(',',' '))]
+
+                if (d == "M" or d == "m"):
+                        x = pointlist.pop(0)
+                        y = pointlist.pop(0)
+                        if kinds:
+                                subpaths.append((''.join(kinds),coords,False))
+                                kinds = []
+                                coords = array.array('d')
+                        if relative:
+                                lastvec = lastvec.add(Vector(x,-y,0))
+                        else:
+                                lastvec = Vector(x,-y,0)
+                        firstvec = lastvec
+                        lastpole = None
+                if (d == "L" or d == "l") or \
+                        ((d == 'm' or d == 'M') and pointlist) :
+                        for x,y in zip(pointlist[0::2],pointlist[1::2]):
+                                if relative:
+                                        currentvec = lastvec.add(Vector(x,-y,0))
+                                else:
+                                        currentvec = Vector(x,-y,0)
+                                if not DraftVecUtils.equals(lastvec,currentvec):
+                                        kinds.append('L')
+                                        coords.extend((lastvec.x,lastvec.y,currentvec.x,currentvec.y))
+                                        lastvec = currentvec
+                                lastpole = None
+                elif (d == "H" or d == "h"):
+                        for x in pointlist:
+                                if relative:
+                                        currentvec = lastvec.add(Vector(x,0,0))
+                                else:
+                                        currentvec = Vector(x,lastvec.y,0)
+                                kinds.append('L')
+                                coords.extend((lastvec.x,lastvec.y,currentvec.x,currentvec.y))
+                                lastvec = currentvec
+                                lastpole = None
+                elif (d == "V" or d == "v"):
+                        for y in pointlist:
+                                if relative:
+                                        currentvec = lastvec.add(Vector(0,-y,0))
+                                else:
+                                        currentvec = Vector(lastvec.x,-y,0)
+                                kinds.append('L')
+                                coords.extend((lastvec.x,lastvec.y,currentvec.x,currentvec.y))
+                                lastvec = currentvec
+                                lastpole = None
+                elif (d == "A" or d == "a"):
+                        for rx,ry,xrotation, largeflag, sweepflag,x,y in \
+                                zip(pointlist[0::7],pointlist[1::7],pointlist[2::7],pointlist[3::7],pointlist[4::7],pointlist[5::7],pointlist[6::7]):
+                                if relative:
+                                        currentvec = lastvec.add(Vector(x,-y,0))
+                                else:
+                                        currentvec = Vector(x,-y,0)
+                                kinds.append('A')
+                                coords.extend((lastvec.x,lastvec.y,currentvec.x,currentvec.y,rx,ry,xrotation,largeflag,sweepflag))
+                                lastvec = currentvec
+                                lastpole = None
+                elif (d == "C" or d == "c") or\
+                        (d =="S" or d == "s"):
+                        smooth = (d == 'S'  or d == 's')
+                        if smooth:
+                            piter = list(zip(pointlist[2::4],pointlist[3::4],pointlist[0::4],pointlist[1::4],pointlist[2::4],pointlist[3::4]))
+                        else:
+                            piter = list(zip(pointlist[0::6],pointlist[1::6],pointlist[2::6],pointlist[3::6],pointlist[4::6],pointlist[5::6]))
+                        for p1x,p1y,p2x,p2y,x,y in piter:
+                                if smooth:
+                                        if lastpole is not None and lastpole[0]=='cubic':
+                                                pole1 = lastvec.sub(lastpole[1]).add(lastvec)
+                                        else:
+                                                pole1 = lastvec
+                                else:
+                                        if relative:
+                                                pole1 = lastvec.add(Vector(p1x,-p1y,0))
+                                        else:
+                                                pole1 = Vector(p1x,-p1y,0)
+                                if relative:
+                                        currentvec = lastvec.add(Vector(x,-y,0))
+                                        pole2 = lastvec.add(Vector(p2x,-p2y,0))
+                                else:
+                                        currentvec = Vector(x,-y,0)
+                                        pole2 = Vector(p2x,-p2y,0)
+                                if not DraftVecUtils.equals(currentvec,lastvec):
+                                        kinds.append('C')
+                                        coords.extend((lastvec.x,lastvec.y,pole1.x,pole1.y,pole2.x,pole2.y,currentvec.x,currentvec.y))
+                                        lastvec = currentvec
+                                        lastpole = ('cubic',pole2)
+                elif (d == "Q" or d == "q") or\
+                        (d =="T" or d == "t"):
+                        smooth = (d == 'T'  or d == 't')
+                        if smooth:
+                            piter = list(zip(pointlist[1::2],pointlist[1::2],pointlist[0::2],pointlist[1::2]))
+                        else:
+                            piter = list(zip(pointlist[0::4],pointlist[1::4],pointlist[2::4],pointlist[3::4]))
+                        for px,py,x,y in piter:
+                                if smooth:
+                                        if lastpole is not None and lastpole[0]=='quadratic':
+                                                pole = lastvec.sub(lastpole[1]).add(lastvec)
+                                        else:
+                                                pole = lastvec
+                                else:
+                                        if relative:
+                                                pole = lastvec.add(Vector(px,-py,0))
+                                        else:
+                                                pole = Vector(px,-py,0)
+                                if relative:
+                                        currentvec = lastvec.add(Vector(x,-y,0))
+                                else:
+                                        currentvec = Vector(x,-y,0)
+                                if not DraftVecUtils.equals(currentvec,lastvec):
+                                        kinds.append('Q')
+                                        coords.extend((lastvec.x,lastvec.y,pole.x,pole.y,currentvec.x,currentvec.y))
+                                        lastvec = currentvec
+                                        lastpole = ('quadratic',pole)
+                elif (d == "Z") or (d == "z"):
+                        if firstvec is not None and not DraftVecUtils.equals(lastvec,firstvec):
+                                kinds.append('Z')
+                                coords.extend((lastvec.x,lastvec.y,firstvec.x,firstvec.y))
+                        if kinds: #the path should be closed by now
+                                subpaths.append((''.join(kinds),coords,True))
+                                kinds = []
+                                coords = array.array('d')
+                                if firstvec:
+                                        lastvec = firstvec #Move relative to recent draw command
+        if kinds:
+                subpaths.append((''.join(kinds),coords,False))
+        return subpaths
+
+def makeArc(lastvec,currentvec,rx,ry,xrotation,largeflag,sweepflag):
+        "returns the edge of a svg arc going from lastvec to currentvec"
+        #support for large-arc and x-rotation are missing
+        chord = currentvec.sub(lastvec)
+        if (not largeflag) and abs(rx-ry) < 10**(-1*Draft.precision()): # small circular arc
+                # perp = chord.cross(Vector(0,0,-1))
+                # here is a better way to find the perpendicular
+                if sweepflag == 1:
+                        # clockwise
+                        perp = DraftVecUtils.rotate2D(chord,-math.pi/2)
+                else:
+                        # anticlockwise
+                        perp = DraftVecUtils.rotate2D(chord,math.pi/2)
+                chord.multiply(.5)
+                if chord.Length > rx: a = 0
+                else: a = math.sqrt(rx**2-chord.Length**2)
+                s = rx - a
+                perp.multiply(s/perp.Length)
+                midpoint = lastvec.add(chord.add(perp))
+                seg = Part.Arc(lastvec,midpoint,currentvec).toShape()
+        else:# big arc or elliptical arc
+                solution,(rx,ry) = arcend2center(lastvec,currentvec,rx,ry,math.radians(-xrotation),True) 
+                negsol = (largeflag != sweepflag)
+                vcenter,angle1,angledelta = solution[negsol]
+                #print angle1
+                #print angledelta
+                if ry > rx:
+                        rx,ry=ry,rx
+                        swapaxis = True
+                else:
+                        swapaxis = False
+                 #print 'Elliptical arc %s rx=%f ry=%f' % (vcenter,rx,ry)
+                e1 = Part.Ellipse(vcenter,rx,ry)
+                if sweepflag:
+                        #angledelta=-(-angledelta % (math.pi *2)) # Step4
+                        #angledelta=(-angledelta % (math.pi *2)) # Step4
+                        angle1  = angle1+angledelta
+                        angledelta = -angledelta
+                        #angle1 = math.pi - angle1 
+
+                e1a = Part.Arc(e1,angle1-swapaxis*math.radians(90),\
+                        angle1+angledelta-swapaxis*math.radians(90))
+                #e1a = Part.Arc(e1,angle1-0*swapaxis*math.radians(90),angle1+angledelta-0*swapaxis*math.radians(90))
+                if swapaxis or xrotation >  10**(-1*Draft.precision()):
+                        m3=FreeCAD.Matrix()
+                        m3.move(vcenter)
+                        rot90=FreeCAD.Matrix(0,-1,0,0,1,0) #90
+                        #swapaxism=FreeCAD.Matrix(0,1,0,0,1,0) 
+                        if swapaxis:
+                                m3=m3.multiply(rot90)
+                        m3.rotateZ(math.radians(-xrotation))
+                        m3.move(vcenter.multiply(-1))
+                        e1a.transform(m3)
+                seg = e1a.toShape()
+                if sweepflag:
+                        seg.reverse()
+        return seg
+
+def makePathEdges(kinds,coords):
+        '''makePathEdges(kinds,coords): returns the edges of a subpath returned by parsePath.
+        The coordinates of each segment are the x,y of its points: start and end for L and Z,
+        start, poles and end for C and Q, start, end, rx, ry, x rotation, large arc and
+        sweep flags for A'''
+        edges = []
+        tolerance = 10**(-1*(2+Draft.precision()))
+        i = 0
+        for kind in kinds:
+                if kind == 'L' or kind == 'Z':
+                        lastvec = Vector(coords[i],coords[i+1],0)
+                        currentvec = Vector(coords[i+2],coords[i+3],0)
+                        i += 4
+                        if kind == 'Z':
+                                try:
+                                        edges.append(Part.Line(lastvec,currentvec).toShape())
+                                except Part.OCCError:
+                                        pass
+                        else:
+                                edges.append(Part.Line(lastvec,currentvec).toShape())
+                elif kind == 'A':
+                        lastvec = Vector(coords[i],coords[i+1],0)
+                        currentvec = Vector(coords[i+2],coords[i+3],0)
+                        rx,ry,xrotation,largeflag,sweepflag = coords[i+4:i+9]
+                        i += 9
+                        edges.append(makeArc(lastvec,currentvec,rx,ry,xrotation,largeflag,sweepflag))
+                elif kind == 'C':
+                        lastvec,pole1,pole2,currentvec = [Vector(coords[j],coords[j+1],0) for j in range(i,i+8,2)]
+                        i += 8
+                        if pole1.distanceToLine(lastvec,currentvec) < tolerance and \
+                        pole2.distanceToLine(lastvec,currentvec) < tolerance:
+                                #print "straight segment"
+                                edges.append(Part.Line(lastvec,currentvec).toShape())
+                        else:
+                                #print "cubic bezier segment"
+                                b = Part.BezierCurve()
+                                b.setPoles([lastvec,pole1,pole2,currentvec])
+                                edges.append(b.toShape())
+                elif kind == 'Q':
+                        lastvec,pole,currentvec = [Vector(coords[j],coords[j+1],0) for j in range(i,i+6,2)]
+                        i += 6
+                        if pole.distanceToLine(lastvec,currentvec) < 20**(-1*(2+Draft.precision())):
+                                #print "straight segment"
+                                edges.append(Part.Line(lastvec,currentvec).toShape())
+                        else:
+                                #print "quadratic bezier segment"
+                                b = Part.BezierCurve()
+                                b.setPoles([lastvec,pole,currentvec])
+                                edges.append(b.toShape())
+        return edges
+
+def makePathShapes(paths):
+        '''makePathShapes(paths): builds the shapes of the given paths, [(subpaths,fill,matrix)],
+        subpaths being returned by parsePath and matrix the transformation of the path as a
+        tuple of 16 floats, or None. Returns the list of shapes of each path'''
+        global Part
+        import Part
+        result = []
+        for subpaths,fill,matrix in paths:
+                shapes = []
+                for kinds,coords,closed in subpaths:
+                        path = makePathEdges(kinds,coords)
+                        if not path:
+                                continue
+                        if closed:
+                                sh = makewire(path,donttry=False)
+                                if fill: sh = Part.Face(sh)
+                        else:
+                                sh = makewire(path,checkclosed=False)
+                                if fill and sh.isClosed():
+                                        sh = Part.Face(sh)
+                        if matrix:
+                                # see issue #2062
+                                sh = sh.transformGeometry(FreeCAD.Matrix(*matrix))
+                        shapes.append(sh)
+                result.append(shapes)
+        return result
+
+def makePathBreps(paths):
+        "makePathBreps(paths): returns the breps of makePathShapes(paths), run by the import processes"
+        return [[sh.exportBrepToString() for sh in shapes] for shapes in makePathShapes(paths)]
+
+def buildPaths(paths):
+        '''buildPaths(paths): returns the shapes of makePathShapes(paths). Many paths are built
+        in parallel by the number of processes set by svgImportProcesses, if not 1'''
+        global Part
+        import Part
+        processes = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Draft").GetInt("svgImportProcesses",1)
+        if processes != 1:
+                segments = 0
+                for subpaths,fill,matrix in paths:
+                        for kinds,coords,closed in subpaths:
+                                segments += len(kinds)
+                if segments >= pathprocesssegments:
+                        pool = Draft.getProcessPool(processes or None)
+                        if pool:
+                                import multiprocessing
+                                size = len(paths)//(4*(processes or multiprocessing.cpu_count()))+1
+                                try:
+                                        chunks = pool.map(makePathBreps,[paths[i:i+size] for i in range(0,len(paths),size)])
+                                except Exception as e:
+                                        FreeCAD.Console.PrintWarning("Building the paths in processes failed ("+str(e)+"), building them in FreeCAD\n")
+                                else:
+                                        result = []
+                                        for chunk in chunks:
+                                                for breps in chunk:
+                                                        shapes = []
+                                                        for brep in breps:
+                                                                sh = Part.Shape()
+                                                                sh.importBrepFromString(brep)
+                                                                shapes.append(sh)
+                                                        result.append(shapes)
+                                        return result
+                                finally:
+                                        pool.terminate()
+                                        pool.join()
+        return makePathShapes(paths)
+
 class svgHandler(xml.sax.ContentHandler):
         "this handler parses the svg files and creates freecad objects"
 
@@ -394,6 +720,12 @@ class svgHandler(xml.sax.ContentHandler):
                 self.viewbox = None
                 self.symbols = {}
                 self.currentsymbol = None
+                # with svgGroupShapes, the shapes of each group are gathered and added as
+                # one compound per style when the group closes, instead of one object each
+                self.groupShapes = params.GetBool("svgGroupShapes",False)
+                self.groups = [["Shapes",[]]]
+                # the paths parsed but not built yet, built in one batch by buildPaths
+                self.paths = []
 
                 global Part
                 import Part
@@ -419,14 +751,84 @@ class svgHandler(xml.sax.ContentHandler):
                         if self.width: v.LineWidth = self.width
                         if self.fill: v.ShapeColor = self.fill
         
+        def addShape(self,sh,pathname):
+                "transforms the shape and adds it to the document, or to the shapes of the current group"
+                # the pending paths come first, in document order
+                self.addPaths()
+                sh = self.applyTrans(sh)
+                if self.groupShapes and not self.currentsymbol:
+                        self.groups[-1][1].append(((self.color,self.width,self.fill),sh))
+                        return None
+                obj = self.doc.addObject("Part::Feature",pathname)
+                obj.Shape = sh
+                self.format(obj)
+                if self.currentsymbol:
+                        self.symbols[self.currentsymbol].append(obj)
+                return obj
+
+        def addPath(self,subpaths,pathname):
+                "records the parsed subpaths of a path, with its current transform and style"
+                m = self.getTransform()
+                if m is not None:
+                        m = (m.A11,m.A12,m.A13,m.A14,m.A21,m.A22,m.A23,m.A24,
+                             m.A31,m.A32,m.A33,m.A34,m.A41,m.A42,m.A43,m.A44)
+                group = None
+                if self.groupShapes and not self.currentsymbol:
+                        group = self.groups[-1][1]
+                self.paths.append((subpaths,bool(self.fill),m,(self.color,self.width,self.fill),pathname,self.currentsymbol,group))
+
+        def addPaths(self):
+                "builds the shapes of the recorded paths in one batch, and adds them like addShape"
+                if not self.paths:
+                        return
+                paths = self.paths
+                self.paths = []
+                style = (self.color,self.width,self.fill)
+                for (subpaths,fill,m,pathstyle,pathname,symbol,group),shapes in \
+                        zip(paths,buildPaths([path[:3] for path in paths])):
+                        for sh in shapes:
+                                if group is not None:
+                                        group.append((pathstyle,sh))
+                                else:
+                                        obj = self.doc.addObject("Part::Feature",pathname)
+                                        obj.Shape = sh
+                                        self.color,self.width,self.fill = pathstyle
+                                        self.format(obj)
+                                        if symbol:
+                                                self.symbols[symbol].append(obj)
+                self.color,self.width,self.fill = style
+
+        def addGroup(self,name,shapes):
+                "adds one compound object per style of the given (style,shape) list"
+                styles = []
+                compounds = {}
+                for style,sh in shapes:
+                        if not style in compounds:
+                                styles.append(style)
+                                compounds[style] = []
+                        compounds[style].append(sh)
+                for style in styles:
+                        obj = self.doc.addObject("Part::Feature","Group")
+                        obj.Label = name
+                        obj.Shape = Part.makeCompound(compounds[style])
+                        self.color,self.width,self.fill = style
+                        self.format(obj)
+
+        def endDocument(self):
+                self.addPaths()
+                if self.groupShapes:
+                        for name,shapes in self.groups:
+                                self.addGroup(name,shapes)
+                        self.groups = [["Shapes",[]]]
+
         def startElement(self, name, attrs):
 
                 # reorganizing data into a nice clean dictionary
 
                 self.count += 1
 
-                FreeCAD.Console.PrintMessage('processing element %d: %s\n'%(self.count,name))
-                FreeCAD.Console.PrintMessage('existing group transform: %s\n'%(str(self.grouptransform)))
+                FreeCAD.Console.PrintLog('processing element %d: %s\n'%(self.count,name))
+                FreeCAD.Console.PrintLog('existing group transform: %s\n'%(str(self.grouptransform)))
                 
                 data = {}
                 for (keyword,content) in list(attrs.items()):
@@ -520,6 +922,13 @@ class svgHandler(xml.sax.ContentHandler):
                 else:
                         if name == "g":
                                 self.grouptransform.append(FreeCAD.Matrix())
+                if name == "g":
+                        if 'inkscape:label' in data:
+                                self.groups.append([' '.join(data['inkscape:label']),[]])
+                        elif 'id' in data:
+                                self.groups.append([data['id'][0],[]])
+                        else:
+                                self.groups.append(["Group",[]])
 
                 if (self.style == 1):
                         self.color = self.col
@@ -528,23 +937,15 @@ class svgHandler(xml.sax.ContentHandler):
                 pathname = None
                 if 'id' in data:
                         pathname = data['id'][0]
-                        FreeCAD.Console.PrintMessage('name: %s\n'%pathname)
+                        FreeCAD.Console.PrintLog('name: %s\n'%pathname)
                         
                 # processing paths
                         
                 if name == "path":
-                        FreeCAD.Console.PrintMessage('data: %s\n'%str(data))
+                        FreeCAD.Console.PrintLog('data: %s\n'%str(data))
                         
                         if not pathname: pathname = 'Path'
 
-                        path = []
-                        point = []
-                        lastvec = Vector(0,0,0)
-                        lastpole = None
-                        command = None
-                        relative = False
-                        firstvec = None
-
                         if "freecad:basepoint1" in data:
                                 p1 = data["freecad:basepoint1"]
                                 p1 = Vector(float(p1[0]),-float(p1[1]),0)
@@ -557,252 +958,9 @@ class svgHandler(xml.sax.ContentHandler):
                                 self.format(obj)
                                 self.lastdim = obj
                                 data['d']=[]
-                        pathcommandsre=re.compile('\s*?([mMlLhHvVaAcCqQsStTzZ])\s*?([^mMlLhHvVaAcCqQsStTzZ]*)\s*?',re.DOTALL)
-                        pointsre=re.compile('([-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?)',re.DOTALL)
-                        for d,pointsstr in pathcommandsre.findall(' '.join(data['d'])):
-                                relative = d.islower()
-                                pointlist = [float(number) for number,exponent in pointsre.findall(pointsstr.replace(',',' '))]
-
-                                if (d == "M" or d == "m"):
-                                        x = pointlist.pop(0)
-                                        y = pointlist.pop(0)
-                                        if path:
-                                                #sh = Part.Wire(path)
-                                                sh = makewire(path)
-                                                if self.fill and sh.isClosed():
-                                                    sh = Part.Face(sh)
-                                                sh = self.applyTrans(sh)
-                                                obj = self.doc.addObject("Part::Feature",pathname)
-                                                obj.Shape = sh
-                                                self.format(obj)
-                                                if self.currentsymbol:
-                                                    self.symbols[self.currentsymbol].append(obj)
-                                                path = []
-                                                #if firstvec:
-                                                #        lastvec = firstvec #Move relative to last move command not last draw command
-                                        if relative:
-                                                lastvec = lastvec.add(Vector(x,-y,0))
-                                        else:
-                                                lastvec = Vector(x,-y,0)
-                                        firstvec = lastvec
-                                        FreeCAD.Console.PrintMessage('move %s\n'%str(lastvec))
-                                        lastpole = None
-                                if (d == "L" or d == "l") or \
-                                        ((d == 'm' or d == 'M') and pointlist) :
-                                        for x,y in zip(pointlist[0::2],pointlist[1::2]):
-                                                if relative:
-                                                        currentvec = lastvec.add(Vector(x,-y,0))
-                                                else:
-                                                        currentvec = Vector(x,-y,0)
-                                                if not DraftVecUtils.equals(lastvec,currentvec):
-                                                        seg = Part.Line(lastvec,currentvec).toShape()
-                                                        FreeCAD.Console.PrintMessage("line %s %s\n" %(lastvec,currentvec))
-                                                        lastvec = currentvec
-                                                        path.append(seg)
-                                                lastpole = None
-                                elif (d == "H" or d == "h"):
-                                        for x in pointlist:
-                                                if relative:
-                                                        currentvec = lastvec.add(Vector(x,0,0))
-                                                else:
-                                                        currentvec = Vector(x,lastvec.y,0)
-                                                seg = Part.Line(lastvec,currentvec).toShape()
-                                                lastvec = currentvec
-                                                lastpole = None
-                                                path.append(seg)
-                                elif (d == "V" or d == "v"):
-                                        for y in pointlist:
-                                                if relative:
-                                                        currentvec = lastvec.add(Vector(0,-y,0))
-                                                else:
-                                                        currentvec = Vector(lastvec.x,-y,0)
-                                                seg = Part.Line(lastvec,currentvec).toShape()
-                                                lastvec = currentvec
-                                                lastpole = None
-                                                path.append(seg)
-                                elif (d == "A" or d == "a"):
-                                        for rx,ry,xrotation, largeflag, sweepflag,x,y in \
-                                                zip(pointlist[0::7],pointlist[1::7],pointlist[2::7],pointlist[3::7],pointlist[4::7],pointlist[5::7],pointlist[6::7]):
-
-                                                #support for large-arc and x-rotation are missing
-                                                if relative:
-                                                        currentvec = lastvec.add(Vector(x,-y,0))
-                                                else:
-                                                        currentvec = Vector(x,-y,0)
-                                                chord = currentvec.sub(lastvec)
-                                                if (not largeflag) and abs(rx-ry) < 10**(-1*Draft.precision()): # small circular arc
-                                                        # perp = chord.cross(Vector(0,0,-1))
-                                                        # here is a better way to find the perpendicular
-                                                        if sweepflag == 1:
-                                                                # clockwise
-                                                                perp = DraftVecUtils.rotate2D(chord,-math.pi/2)
-                                                        else:
-                                                                # anticlockwise
-                                                                perp = DraftVecUtils.rotate2D(chord,math.pi/2)
-                                                        chord.multiply(.5)
-                                                        if chord.Length > rx: a = 0
-                                                        else: a = math.sqrt(rx**2-chord.Length**2)
-                                                        s = rx - a
-                                                        perp.multiply(s/perp.Length)
-                                                        midpoint = lastvec.add(chord.add(perp))
-                                                        seg = Part.Arc(lastvec,midpoint,currentvec).toShape()
-                                                else:# big arc or elliptical arc
-                                                        solution,(rx,ry) = arcend2center(lastvec,currentvec,rx,ry,math.radians(-xrotation),True) 
-                                                        negsol = (largeflag != sweepflag)
-                                                        vcenter,angle1,angledelta = solution[negsol]
-                                                        #print angle1
-                                                        #print angledelta
-                                                        if ry > rx:
-                                                                rx,ry=ry,rx
-                                                                swapaxis = True
-                                                        else:
-                                                                swapaxis = False
-                                                         #print 'Elliptical arc %s rx=%f ry=%f' % (vcenter,rx,ry)
-                                                        e1 = Part.Ellipse(vcenter,rx,ry)
-                                                        if sweepflag:
-                                                                #angledelta=-(-angledelta % (math.pi *2)) # Step4
-                                                                #angledelta=(-angledelta % (math.pi *2)) # Step4
-                                                                angle1  = angle1+angledelta
-                                                                angledelta = -angledelta
-                                                                #angle1 = math.pi - angle1 
-
-                                                        e1a = Part.Arc(e1,angle1-swapaxis*math.radians(90),\
-                                                                angle1+angledelta-swapaxis*math.radians(90))
-                                                        #e1a = Part.Arc(e1,angle1-0*swapaxis*math.radians(90),angle1+angledelta-0*swapaxis*math.radians(90))
-                                                        if swapaxis or xrotation >  10**(-1*Draft.precision()):
-                                                                m3=FreeCAD.Matrix()
-                                                                m3.move(vcenter)
-                                                                rot90=FreeCAD.Matrix(0,-1,0,0,1,0) #90
-                                                                #swapaxism=FreeCAD.Matrix(0,1,0,0,1,0) 
-                                                                if swapaxis:
-                                                                        m3=m3.multiply(rot90)
-                                                                m3.rotateZ(math.radians(-xrotation))
-                                                                m3.move(vcenter.multiply(-1))
-                                                                e1a.transform(m3)
-                                                        seg = e1a.toShape()
-                                                        if sweepflag:
-                                                                seg.reverse()
-                                                                #obj = self.doc.addObject("Part::Feature",'DEBUG %s'%pathname) #DEBUG
-                                                                #obj.Shape = seg #DEBUG
-                                                                #seg = Part.Line(lastvec,currentvec).toShape() #DEBUG
-                                                lastvec = currentvec
-                                                lastpole = None
-                                                path.append(seg)
-                                elif (d == "C" or d == "c") or\
-                                        (d =="S" or d == "s"):
-                                        smooth = (d == 'S'  or d == 's')
-                                        if smooth:
-                                            piter = list(zip(pointlist[2::4],pointlist[3::4],pointlist[0::4],pointlist[1::4],pointlist[2::4],pointlist[3::4]))
-                                        else:
-                                            piter = list(zip(pointlist[0::6],pointlist[1::6],pointlist[2::6],pointlist[3::6],pointlist[4::6],pointlist[5::6]))
-                                        for p1x,p1y,p2x,p2y,x,y in piter:
-                                                if smooth:
-                                                        if lastpole is not None and lastpole[0]=='cubic':
-                                                                pole1 = lastvec.sub(lastpole[1]).add(lastvec)
-                                                        else:
-                                                                pole1 = lastvec
-                                                else:
-                                                        if relative:
-                                                                pole1 = lastvec.add(Vector(p1x,-p1y,0))
-                                                        else:
-                                                                pole1 = Vector(p1x,-p1y,0)
-                                                if relative:
-                                                        currentvec = lastvec.add(Vector(x,-y,0))
-                                                        pole2 = lastvec.add(Vector(p2x,-p2y,0))
-                                                else:
-                                                        currentvec = Vector(x,-y,0)
-                                                        pole2 = Vector(p2x,-p2y,0)
-
-                                                if not DraftVecUtils.equals(currentvec,lastvec):
-                                                        mainv = currentvec.sub(lastvec)
-                                                        pole1v = lastvec.add(pole1)
-                                                        pole2v = currentvec.add(pole2)
-                                                        #print "cubic curve data:",mainv.normalize(),pole1v.normalize(),pole2v.normalize()
-                                                        if True and \
-                                                        pole1.distanceToLine(lastvec,currentvec) < 10**(-1*(2+Draft.precision())) and \
-                                                        pole2.distanceToLine(lastvec,currentvec) < 10**(-1*(2+Draft.precision())):
-                                                                #print "straight segment"
-                                                                seg = Part.Line(lastvec,currentvec).toShape()
-                                                        else:
-                                                                #print "cubic bezier segment"
-                                                                b = Part.BezierCurve()
-                                                                b.setPoles([lastvec,pole1,pole2,currentvec])
-                                                                seg = b.toShape()
-                                                        #print "connect ",lastvec,currentvec
-                                                        lastvec = currentvec
-                                                        lastpole = ('cubic',pole2)
-                                                        path.append(seg)
-                                elif (d == "Q" or d == "q") or\
-                                        (d =="T" or d == "t"):
-                                        smooth = (d == 'T'  or d == 't')
-                                        if smooth:
-                                            piter = list(zip(pointlist[1::2],pointlist[1::2],pointlist[0::2],pointlist[1::2]))
-                                        else:
-                                            piter = list(zip(pointlist[0::4],pointlist[1::4],pointlist[2::4],pointlist[3::4]))
-                                        for px,py,x,y in piter:
-                                                if smooth:
-                                                        if lastpole is not None and lastpole[0]=='quadratic':
-                                                                pole = lastvec.sub(lastpole[1]).add(lastvec)
-                                                        else:
-                                                                pole = lastvec
-                                                else:
-                                                        if relative:
-                                                                pole = lastvec.add(Vector(px,-py,0))
-                                                        else:
-                                                                pole = Vector(px,-py,0)
-                                                if relative:
-                                                        currentvec = lastvec.add(Vector(x,-y,0))
-                                                else:
-                                                        currentvec = Vector(x,-y,0)
-
-                                                if not DraftVecUtils.equals(currentvec,lastvec):
-                                                        if True and \
-                                                        pole.distanceToLine(lastvec,currentvec) < 20**(-1*(2+Draft.precision())):
-                                                                #print "straight segment"
-                                                                seg = Part.Line(lastvec,currentvec).toShape()
-                                                        else:
-                                                                #print "quadratic bezier segment"
-                                                                b = Part.BezierCurve()
-                                                                b.setPoles([lastvec,pole,currentvec])
-                                                                seg = b.toShape()
-                                                        #print "connect ",lastvec,currentvec
-                                                        lastvec = currentvec
-                                                        lastpole = ('quadratic',pole)
-                                                        path.append(seg)
-                                elif (d == "Z") or (d == "z"):
-                                        if not DraftVecUtils.equals(lastvec,firstvec):
-                                            try:
-                                                seg = Part.Line(lastvec,firstvec).toShape()
-                                            except Part.OCCError:
-                                                pass
-                                            else:
-                                                path.append(seg)
-                                        if path: #the path should be closed by now
-                                                #sh=makewire(path,True)
-                                                sh=makewire(path,donttry=False)
-                                                if self.fill: sh = Part.Face(sh)
-                                                sh = self.applyTrans(sh)
-                                                obj = self.doc.addObject("Part::Feature",pathname)
-                                                obj.Shape = sh
-                                                self.format(obj)
-                                                path = []
-                                                if firstvec:
-                                                        lastvec = firstvec #Move relative to recent draw command
-                                                point = []
-                                                command = None
-                                                if self.currentsymbol:
-                                                    self.symbols[self.currentsymbol].append(obj)
-                        if path:
-                                sh=makewire(path,checkclosed=False)
-                                #sh = Part.Wire(path)
-                                if self.fill and sh.isClosed():
-                                    sh = Part.Face(sh)
-                                sh = self.applyTrans(sh)
-                                obj = self.doc.addObject("Part::Feature",pathname)
-                                obj.Shape = sh
-                                self.format(obj)
-                                if self.currentsymbol:
-                                    self.symbols[self.currentsymbol].append(obj)
+                        subpaths = parsePath(' '.join(data['d']))
+                        if subpaths:
+                                self.addPath(subpaths,pathname)
 
 
                 # processing rects
@@ -876,12 +1034,7 @@ class svgHandler(xml.sax.ContentHandler):
                                         edges.append(esh2) # elliptical segments
                         sh = Part.Wire(edges)
                         if self.fill: sh = Part.Face(sh)
-                        sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
                         
                 # processing lines
 
@@ -890,12 +1043,7 @@ class svgHandler(xml.sax.ContentHandler):
                         p1 = Vector(data['x1'],-data['y1'],0)
                         p2 = Vector(data['x2'],-data['y2'],0)
                         sh = Part.Line(p1,p2).toShape()
-                        sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
 
                 # processing polylines and polygons
 
@@ -922,11 +1070,7 @@ class svgHandler(xml.sax.ContentHandler):
                                         sh = Part.Wire(path)
                                         if self.fill and sh.isClosed():
                                             sh = Part.Face(sh)
-                                        sh = self.applyTrans(sh)
-                                        obj = self.doc.addObject("Part::Feature",pathname)
-                                        obj.Shape = sh
-                                        if self.currentsymbol:
-                                            self.symbols[self.currentsymbol].append(obj)
+                                        self.addShape(sh,pathname)
 
                 # processing ellipses
 
@@ -949,12 +1093,7 @@ class svgHandler(xml.sax.ContentHandler):
                         if self.fill:
                                 sh = Part.Wire([sh])
                                 sh = Part.Face(sh)
-                        sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
 
 
                 # processing circles
@@ -968,12 +1107,7 @@ class svgHandler(xml.sax.ContentHandler):
                                 sh = Part.Wire([sh])
                                 sh = Part.Face(sh)
                         sh.translate(c)
-                        sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
 
                 # processing texts
 
@@ -1016,14 +1150,11 @@ class svgHandler(xml.sax.ContentHandler):
                                 sh = Part.makeCompound(shapes)
                                 v = FreeCAD.Vector(float(data['x']),-float(data['y']),0)
                                 sh.translate(v)
-                                sh = self.applyTrans(sh)
-                                obj = self.doc.addObject("Part::Feature",symbol)
-                                obj.Shape = sh
-                                self.format(obj)
+                                self.addShape(sh,symbol)
                         else:
                             FreeCAD.Console.PrintMessage("no symbol data\n")
 
-                FreeCAD.Console.PrintMessage("done processing element %d\n"%self.count)
+                FreeCAD.Console.PrintLog("done processing element %d\n"%self.count)
                 
         def characters(self,content):
                 if self.text:
@@ -1050,9 +1181,16 @@ class svgHandler(xml.sax.ContentHandler):
             if not name in ["tspan"]:
                 self.transform = None
                 self.text = None
+            if name == "symbol" or (name == "g" and self.groupShapes):
+                # the paths of the symbol or group are needed when it closes
+                self.addPaths()
             if name == "g" or name == "svg":
-                FreeCAD.Console.PrintMessage("closing group\n")
+                FreeCAD.Console.PrintLog("closing group\n")
                 self.grouptransform.pop()
+            if name == "g":
+                groupname,shapes = self.groups.pop()
+                if shapes:
+                    self.addGroup(groupname,shapes)
             if name == "symbol":
                 if self.doc.getObject("svgsymbols"):
                     group = self.doc.getObject("svgsymbols")
@@ -1063,18 +1201,26 @@ class svgHandler(xml.sax.ContentHandler):
                 self.currentsymbol = None
                     
 
+        def getTransform(self):
+                "returns the composition of the group transforms and of the object transform, or None"
+                if self.transform or self.grouptransform:
+                        m = FreeCAD.Matrix()
+                        for transform in self.grouptransform:
+                                m = m.multiply(transform)
+                        if self.transform:
+                                m = m.multiply(self.transform)
+                        return m
+                return None
+
         def applyTrans(self,sh):
                 if isinstance(sh,Part.Shape):
-                        if self.transform:
-                                FreeCAD.Console.PrintMessage("applying object transform: %s\n" % self.transform)
-                                #sh = transformCopyShape(sh,self.transform)
+                        m = self.getTransform()
+                        if m is not None:
+                                # the geometry is transformed once
+                                FreeCAD.Console.PrintLog("applying transform: %s\n" % m)
+                                #sh = transformCopyShape(sh,m)
                                 # see issue #2062
-                                sh = sh.transformGeometry(self.transform)
-                        for transform in self.grouptransform[::-1]:
-                                FreeCAD.Console.PrintMessage("applying group transform: %s\n" % transform)
-                                #sh = transformCopyShape(sh,transform)
-                                # see issue 2062
-                                sh = sh.transformGeometry(transform)
+                                sh = sh.transformGeometry(m)
                         return sh
                 elif Draft.getType(sh) == "Dimension":
                         pts = []
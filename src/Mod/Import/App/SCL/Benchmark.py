@@ -0,0 +1,235 @@
+# Copyright (c) 2014, FreeCAD developers
+# All rights reserved.
+
+# This file is part of the StepClassLibrary (SCL).
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+#   Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+#   Neither the name of the <ORGANIZATION> nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Benchmarks of the Part21 readers and of the schema classes
+
+Usage: python Benchmark.py [copies] [file.stp ...]
+Without files, the sample files shipped with SCL are used. Every file is
+first replicated copies times (default 500) into a temporary file so that
+the timings are not dominated by the file opening.
+"""
+
+import os,re,sys,time,tempfile
+import Part21,SchemaLoader
+
+
+SAMPLE_FILES = ['gasket1.p21','Aufspannung.stp']
+REFERENCE_RE = re.compile(r"#(\d+)")
+
+class _NullWriter:
+    """ Swallows the progress messages of the parsers while timing them """
+    def write(self, text):
+        pass
+    def flush(self):
+        pass
+
+class LineParser(Part21.Part21Parser):
+    """ Part21Parser running the former line based reader """
+    def parse_file(self):
+        self.parse_file_lines()
+
+def best_time(func, repeat=5):
+    """ Returns the best wall time of repeat calls to func, in seconds """
+    best = None
+    for i in range(repeat):
+        stdout = sys.stdout
+        sys.stdout = _NullWriter()
+        try:
+            init_time = time.time()
+            func()
+            elapsed = time.time()-init_time
+        finally:
+            sys.stdout = stdout
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def write_synthetic_file(source, filename, copies):
+    """ Writes filename with the DATA section of source repeated copies times.
+    Instance names are shifted at each copy so that they stay unique.
+    Returns the number of entity instances written.
+    """
+    text = open(source, 'rb').read()
+    head, data = text.split('DATA;', 1)
+    data, tail = data.split('ENDSEC;', 1)
+    ids = [int(i) for i in REFERENCE_RE.findall(data)]
+    shift = max(ids)+1
+    out = open(filename, 'wb')
+    out.write(head+'DATA;')
+    for k in range(copies):
+        offset = k*shift
+        out.write(REFERENCE_RE.sub(lambda m: '#%i'%(int(m.group(1))+offset), data))
+    out.write('ENDSEC;'+tail)
+    out.close()
+    return data.count('=')*copies
+
+def write_bspline_file(filename, surfaces=20, size=150):
+    """ Writes filename with B-spline surfaces of size x size control points,
+    one row per line, as CAD systems write them. Returns the number of entity
+    instances written.
+    """
+    out = open(filename, 'wb')
+    out.write("ISO-10303-21;\nHEADER;\nFILE_SCHEMA(('AUTOMOTIVE_DESIGN'));\nENDSEC;\nDATA;\n")
+    point = 1
+    for k in range(surfaces):
+        out.write("#%i=B_SPLINE_SURFACE_WITH_KNOTS('',3,3,(\n"%(surfaces*size*size+k+1))
+        rows = []
+        for i in range(size):
+            rows.append('('+','.join(['#%i'%(point+j) for j in range(size)])+')')
+            point += size
+        out.write(',\n'.join(rows))
+        out.write("),.UNSPECIFIED.,.F.,.F.,.F.,(4,4),(4,4),(0.,1.),(0.,1.),.UNSPECIFIED.);\n")
+    out.write("ENDSEC;\nEND-ISO-10303-21;\n")
+    out.close()
+    return surfaces
+
+def bench_parsers(filename, repeat=3):
+    """ Compares the line based and the tokenizer based readers on filename.
+    Returns (line based time, tokenizer time)
+    """
+    old = best_time(lambda: LineParser(filename), repeat)
+    new = best_time(lambda: Part21.Part21Parser(filename), repeat)
+    return old, new
+
+def deep_sizeof(obj):
+    """ Returns the size in bytes of obj and of the objects it contains """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += deep_sizeof(key)+deep_sizeof(value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += deep_sizeof(item)
+    return size
+
+def bench_memory(filename):
+    """ Returns the memory used per million entities, in MB, by the instances
+    definitions of filename kept in a dict and in an InstanceStore.
+    """
+    stdout = sys.stdout
+    sys.stdout = _NullWriter()
+    try:
+        plain = Part21.Part21Parser(filename)._instances_definition
+        compact = Part21.Part21Parser(filename, compact=True)._instances_definition
+    finally:
+        sys.stdout = stdout
+    scale = 1e6/len(plain)/1048576.
+    return deep_sizeof(plain)*scale, compact.memory_usage()*scale
+
+def bench_parallel(filename, process_counts=(1, 2, 4, 8, 16)):
+    """ Returns [(processes, time)] of Part21.parse_file_parallel on filename,
+    the process counts above the number of cores being skipped.
+    """
+    import multiprocessing
+    cores = multiprocessing.cpu_count()
+    return [(n, best_time(lambda: Part21.parse_file_parallel(filename, n), 3))
+            for n in process_counts if n <= cores]
+
+def bench_schema_loading(schema_name='config_control_design', repeat=3):
+    """ Returns the time to compile and run the schema module and the time to
+    load it with SchemaLoader once its code is cached.
+    """
+    import imp
+    source_path = imp.find_module(schema_name)[1]
+    def compile_and_run():
+        source = open(source_path, 'rU').read()
+        module = sys.modules[schema_name] = imp.new_module(schema_name)
+        exec compile(source, source_path, 'exec') in module.__dict__
+    def load():
+        sys.modules.pop(schema_name, None)
+        SchemaLoader.load_schema(schema_name)
+    load()
+    return best_time(compile_and_run, repeat), best_time(load, repeat)
+
+def bench_construction(count=20000, repeat=3):
+    """ Returns the time to create count measure_with_unit instances of
+    config_control_design, whose attributes go through a SELECT check,
+    without and with the TypeChecker verdicts cache, and without validation.
+    """
+    from SCL import TypeChecker
+    schema = SchemaLoader.load_schema('config_control_design')
+    dimensions = schema.dimensional_exponents.__new__(schema.dimensional_exponents)
+    def construct(clear=False):
+        for i in xrange(count):
+            if clear:
+                TypeChecker.clear_cache()
+            schema.measure_with_unit(schema.length_measure(2.0), schema.named_unit(dimensions))
+    uncached = best_time(lambda: construct(True), repeat)
+    cached = best_time(construct, repeat)
+    TypeChecker.set_validation(False)
+    try:
+        unchecked = best_time(construct, repeat)
+    finally:
+        TypeChecker.set_validation(True)
+    return uncached, cached, unchecked
+
+def _report(title, filename, count):
+    size = os.path.getsize(filename)/1048576.
+    old, new = bench_parsers(filename)
+    plain, compact = bench_memory(filename)
+    print "%s: %i entities, %.1f MB"%(title, count, size)
+    print "  line based parser: %.3fs (%.1f MB/s)"%(old, size/old)
+    print "  tokenizer:         %.3fs (%.1f MB/s)"%(new, size/new)
+    print "  memory per million entities: %.0f MB in a dict, %.0f MB in an InstanceStore"%(plain, compact)
+
+def run(filenames, copies=500):
+    fd, filename = tempfile.mkstemp(suffix='.stp')
+    os.close(fd)
+    try:
+        for source in filenames:
+            count = write_synthetic_file(source, filename, copies)
+            _report("%s x%i"%(os.path.basename(source), copies), filename, count)
+        count = write_bspline_file(filename)
+        _report("B-spline surfaces", filename, count)
+        if filenames:
+            count = write_synthetic_file(filenames[0], filename, 20*copies)
+            print "parallel parsing of %s x%i, %i entities:"%(os.path.basename(filenames[0]), 20*copies, count)
+            timings = bench_parallel(filename)
+            for processes, elapsed in timings:
+                print "  %2i processes: %.3fs (x%.1f)"%(processes, elapsed, timings[0][1]/elapsed)
+    finally:
+        os.remove(filename)
+    compiled, cached = bench_schema_loading()
+    print "config_control_design loading: %.3fs compiled, %.3fs from the code cache"%(compiled, cached)
+    uncached, cached, unchecked = bench_construction()
+    print "20000 measure_with_unit: %.3fs, %.3fs with cached type checks, %.3fs without checks"%(uncached, cached, unchecked)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    copies = 500
+    if args and args[0].isdigit():
+        copies = int(args.pop(0))
+    here = os.path.dirname(os.path.abspath(__file__))
+    # the schemas live next to the SCL package and import SCL.*
+    sys.path.append(os.path.dirname(here))
+    if not args:
+        args = [os.path.join(here, f) for f in SAMPLE_FILES]
+    run(args, copies)
@@ -0,0 +1,347 @@
+# Copyright (c) 2014, FreeCAD developers
+# All rights reserved.
+
+# This file is part of the StepClassLibrary (SCL).
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+#   Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+#   Neither the name of the <ORGANIZATION> nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Compact storage of Part21 entity instances
+
+InstanceStore keeps the instances read by Part21.iter_records in a few flat
+arrays instead of one tuple of nested lists per instance:
+- entity type names are interned to small integers,
+- every attribute value is one opcode (byte) plus one integer operand,
+  references being stored as their integer instance name,
+- reals go to a float array, strings to an interned string table.
+An instance is decoded back to (entity_name, attributes) only when accessed,
+so that the store can be used in place of the Part21Parser._instances_definition
+dict.
+
+Stores filled separately, e.g. from chunks of a file parsed in other processes,
+are merged with extend(): the buffers are concatenated and each merged store
+becomes a segment keeping the offsets of its reals and strings, so that the
+attribute streams don't have to be rewritten.
+"""
+
+from array import array
+from bisect import bisect_right
+import Part21
+
+
+# opcodes of the attribute stream, the operand meaning is given in comment
+OP_LIST = 0         # number of items following
+OP_REF = 1          # instance name
+OP_INT = 2          # value
+OP_REAL = 3         # index in the reals array
+OP_STRING = 4       # index in the string table
+OP_ENUM = 5         # index in the string table
+OP_BINARY = 6       # index in the string table
+OP_TYPED = 7        # index of the type name in the string table, a list follows
+OP_UNSET = 8        # unused
+OP_DERIVED = 9      # unused
+OP_LONG = 10        # integer too big for the operand array, as a string
+
+# the position table is indexed by instance name as long as it stays that dense
+MAX_SPARSITY = 8
+
+class InstanceStore(object):
+    """ A dict like container of Part21 instances definitions:
+    store[id] = (entity_name, attributes) encodes the instance,
+    store[id] decodes it.
+    """
+    def __init__(self):
+        self._type_names = []       # type code -> entity name
+        self._type_codes = {}       # entity name -> type code
+        self._strings = []          # string table
+        self._string_codes = {}
+        self._ids = array('l')      # instance names, -1 once redefined
+        self._types = array('H')    # type code of each instance
+        self._starts = array('l')   # first opcode of each instance
+        self._ops = array('B')
+        self._operands = array('l')
+        self._reals = array('d')
+        self._positions = array('l')    # instance name -> index in _ids, or -1
+        self._sparse = None             # the dict used instead when ids are sparse
+        # segments: index of their first instance, offsets of their reals and strings
+        self._segment_starts = [0]
+        self._segment_bases = [(0, 0)]
+        self._extended = False          # the next add() starts a new segment
+
+    def __getstate__(self):
+        # arrays are pickled as raw bytes, much faster than as lists
+        state = self.__dict__.copy()
+        state['_arrays'] = []
+        for name, value in self.__dict__.items():
+            if isinstance(value, array):
+                state[name] = (value.typecode, value.tostring())
+                state['_arrays'].append(name)
+        del state['_string_codes']
+        del state['_type_codes']
+        return state
+
+    def __setstate__(self, state):
+        for name in state.pop('_arrays'):
+            state[name] = array(*state[name])
+        self.__dict__.update(state)
+        self._type_codes = dict((name, code) for code, name in enumerate(self._type_names))
+        self._string_codes = dict((text, code) for code, text in enumerate(self._strings))
+
+    def _intern(self, text):
+        code = self._string_codes.get(text)
+        if code is None:
+            code = len(self._strings)
+            self._string_codes[text] = code
+            self._strings.append(text)
+        return code
+
+    def _encode(self, value):
+        ops = self._ops
+        operands = self._operands
+        if isinstance(value, list):
+            ops.append(OP_LIST)
+            operands.append(len(value))
+            for item in value:
+                self._encode(item)
+        elif isinstance(value, Part21.Reference):
+            ops.append(OP_REF)
+            operands.append(value)
+        elif isinstance(value, float):
+            ops.append(OP_REAL)
+            operands.append(len(self._reals)-self._segment_bases[-1][0])
+            self._reals.append(value)
+        elif isinstance(value, Part21.Enumeration):
+            ops.append(OP_ENUM)
+            operands.append(self._intern(str(value)))
+        elif isinstance(value, Part21.Binary):
+            ops.append(OP_BINARY)
+            operands.append(self._intern(str(value)))
+        elif isinstance(value, str):
+            ops.append(OP_STRING)
+            operands.append(self._intern(value))
+        elif isinstance(value, (int, long)):
+            try:
+                operands.append(value)
+                ops.append(OP_INT)
+            except OverflowError:
+                ops.append(OP_LONG)
+                operands.append(self._intern(str(value)))
+        elif isinstance(value, Part21.TypedParameter):
+            ops.append(OP_TYPED)
+            operands.append(self._intern(value.type_name))
+            self._encode(value.params)
+        elif value is Part21.UNSET:
+            ops.append(OP_UNSET)
+            operands.append(0)
+        elif value is Part21.DERIVED:
+            ops.append(OP_DERIVED)
+            operands.append(0)
+        else:
+            raise TypeError("Can't store attribute %r"%(value,))
+
+    def _decode(self, pos, reals, strings):
+        """ Returns the value starting at opcode pos and the position following it.
+        reals and strings are the offsets of the segment holding the value.
+        """
+        op = self._ops[pos]
+        operand = self._operands[pos]
+        pos += 1
+        if op == OP_LIST:
+            items = []
+            for i in range(operand):
+                item, pos = self._decode(pos, reals, strings)
+                items.append(item)
+            return items, pos
+        elif op == OP_REF:
+            return Part21.Reference(operand), pos
+        elif op == OP_REAL:
+            return self._reals[reals+operand], pos
+        elif op == OP_STRING:
+            return self._strings[strings+operand], pos
+        elif op == OP_INT:
+            return operand, pos
+        elif op == OP_ENUM:
+            return Part21.Enumeration(self._strings[strings+operand]), pos
+        elif op == OP_TYPED:
+            params, pos = self._decode(pos, reals, strings)
+            return Part21.TypedParameter(self._strings[strings+operand], params), pos
+        elif op == OP_UNSET:
+            return Part21.UNSET, pos
+        elif op == OP_DERIVED:
+            return Part21.DERIVED, pos
+        elif op == OP_BINARY:
+            return Part21.Binary(self._strings[strings+operand]), pos
+        else:
+            return long(self._strings[strings+operand]), pos
+
+    def _decode_instance(self, index):
+        reals, strings = self._segment_bases[bisect_right(self._segment_starts, index)-1]
+        return self._decode(self._starts[index], reals, strings)[0]
+
+    def _index(self, instance_id):
+        if self._sparse is not None:
+            return self._sparse.get(instance_id, -1)
+        if 0 <= instance_id < len(self._positions):
+            return self._positions[instance_id]
+        return -1
+
+    def _set_index(self, instance_id, index):
+        if self._sparse is None:
+            positions = self._positions
+            if instance_id >= len(positions):
+                if instance_id > MAX_SPARSITY*(len(self._ids)+1024):
+                    # switch to a dict rather than a mostly empty table
+                    self._sparse = dict((i, p) for i, p in enumerate(positions) if p >= 0)
+                    self._positions = array('l')
+                else:
+                    size = max(instance_id+1, 2*len(positions))
+                    positions.extend([-1]*(size-len(positions)))
+        if self._sparse is not None:
+            self._sparse[instance_id] = index
+        else:
+            self._positions[instance_id] = index
+
+    def add(self, instance_id, entity_name, attributes):
+        """ Stores an instance definition, as yielded by Part21.iter_records
+        """
+        if self._extended:
+            # strings are interned in the whole table, reals continue at the end
+            self._segment_starts.append(len(self._ids))
+            self._segment_bases.append((len(self._reals), 0))
+            self._extended = False
+        previous = self._index(instance_id)
+        if previous >= 0:
+            self._ids[previous] = -1
+        type_code = self._type_codes.get(entity_name)
+        if type_code is None:
+            type_code = len(self._type_names)
+            self._type_codes[entity_name] = type_code
+            self._type_names.append(entity_name)
+        self._set_index(instance_id, len(self._ids))
+        self._ids.append(instance_id)
+        self._types.append(type_code)
+        self._starts.append(len(self._ops))
+        self._encode(attributes)
+
+    def __setitem__(self, instance_id, definition):
+        self.add(instance_id, definition[0], definition[1])
+
+    def __getitem__(self, instance_id):
+        index = self._index(instance_id)
+        if index < 0:
+            raise KeyError(instance_id)
+        return self._type_names[self._types[index]], self._decode_instance(index)
+
+    def get(self, instance_id, default=None):
+        if self._index(instance_id) < 0:
+            return default
+        return self[instance_id]
+
+    def get_entity_name(self, instance_id):
+        """ Returns the entity name of an instance without decoding its attributes
+        """
+        index = self._index(instance_id)
+        if index < 0:
+            raise KeyError(instance_id)
+        return self._type_names[self._types[index]]
+
+    def __contains__(self, instance_id):
+        return self._index(instance_id) >= 0
+
+    has_key = __contains__
+
+    def __len__(self):
+        return len(self._ids)-self._ids.count(-1)
+
+    def __iter__(self):
+        for instance_id in self._ids:
+            if instance_id >= 0:
+                yield instance_id
+
+    def keys(self):
+        return list(self)
+
+    def iteritems(self):
+        for index, instance_id in enumerate(self._ids):
+            if instance_id >= 0:
+                yield instance_id, (self._type_names[self._types[index]], self._decode_instance(index))
+
+    def items(self):
+        return list(self.iteritems())
+
+    def extend(self, other):
+        """ Appends the instances of the InstanceStore other. An instance
+        defined in both stores gets the definition of other.
+        """
+        first = len(self._ids)
+        reals = len(self._reals)
+        strings = len(self._strings)
+        for start, (real_base, string_base) in zip(other._segment_starts, other._segment_bases):
+            self._segment_starts.append(first+start)
+            self._segment_bases.append((reals+real_base, strings+string_base))
+        self._extended = True
+        codes = []
+        for entity_name in other._type_names:
+            code = self._type_codes.get(entity_name)
+            if code is None:
+                code = self._type_codes[entity_name] = len(self._type_names)
+                self._type_names.append(entity_name)
+            codes.append(code)
+        self._types.extend(array('H', [codes[t] for t in other._types]))
+        ops = len(self._ops)
+        self._starts.extend(array('l', [ops+start for start in other._starts]))
+        self._ops.extend(other._ops)
+        self._operands.extend(other._operands)
+        self._reals.extend(other._reals)
+        self._strings.extend(other._strings)
+        self._ids.extend(other._ids)
+        for index in xrange(first, len(self._ids)):
+            instance_id = self._ids[index]
+            if instance_id < 0:
+                continue
+            previous = self._index(instance_id)
+            if previous >= 0:
+                self._ids[previous] = -1
+            self._set_index(instance_id, index)
+
+    def get_type_names(self):
+        """ Returns the interned entity names, indexed by type code """
+        return list(self._type_names)
+
+    def memory_usage(self):
+        """ Returns an estimate of the memory used by the store, in bytes
+        """
+        import sys
+        size = 0
+        for buf in (self._ids, self._types, self._starts, self._ops,
+                    self._operands, self._reals, self._positions):
+            size += buf.buffer_info()[1]*buf.itemsize
+        for table in (self._strings, self._type_names):
+            size += sys.getsizeof(table)+sum(map(sys.getsizeof, table))
+        for table in (self._string_codes, self._type_codes, self._sparse):
+            if table is not None:
+                size += sys.getsizeof(table)
+        return size
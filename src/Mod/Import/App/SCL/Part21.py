@@ -29,13 +29,396 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
 # THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import os
 import re
+import sys
 import Utils
 import time
+from collections import namedtuple
 
 
 INSTANCE_DEFINITION_RE = re.compile("#(\d+)[^\S\n]?=[^\S\n]?(.*?)\((.*)\)[^\S\n]?;[\\r]?$")
 
+# number of bytes read from the file at once by iter_records
+CHUNK_SIZE = 1 << 20
+
+# One token per match. Whitespace, comments and the commas separating
+# parameters are skipped; the kind of a token is given by its first character
+# (see TOKEN_KINDS). A lone quote, dot or slash is an unterminated string,
+# enumeration or comment. The head of a record (#12=NAME) is a single token.
+TOKEN_RE = re.compile(r"""[\s,]*(?:/\*.*?\*/[\s,]*)*(
+      \#\d+(?:[^\S\n]*=[^\S\n]*(?:[A-Za-z_][A-Za-z0-9_-]*)?)?
+    | [+-]?\d[0-9.eE+-]*
+    | '(?:[^']|'')*'
+    | !?[A-Za-z_][A-Za-z0-9_-]*
+    | \.[A-Za-z_][A-Za-z0-9_]*\.
+    | "[0-9A-Fa-f]*"
+    | [^\s,]
+    )""", re.X | re.S)
+
+TOKEN_REF, TOKEN_NUMBER, TOKEN_OPEN, TOKEN_CLOSE, TOKEN_STRING, TOKEN_ENUM, \
+TOKEN_KEYWORD, TOKEN_UNSET, TOKEN_DERIVED, TOKEN_END, TOKEN_EQUAL, TOKEN_BINARY, \
+TOKEN_ERROR = range(1, 14)
+
+TOKEN_KINDS = {'#':TOKEN_REF, '(':TOKEN_OPEN, ')':TOKEN_CLOSE, "'":TOKEN_STRING,
+               '.':TOKEN_ENUM, '!':TOKEN_KEYWORD, '$':TOKEN_UNSET, '*':TOKEN_DERIVED,
+               ';':TOKEN_END, '=':TOKEN_EQUAL, '"':TOKEN_BINARY}
+for c in '0123456789+-':
+    TOKEN_KINDS[c] = TOKEN_NUMBER
+for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_':
+    TOKEN_KINDS[c] = TOKEN_KEYWORD
+
+SECTION_KEYWORDS = ('ISO-10303-21', 'END-ISO-10303-21', 'HEADER', 'DATA', 'ENDSEC')
+
+class Reference(int):
+    """ An entity instance name, i.e. #123
+    """
+    __slots__ = ()
+    def __repr__(self):
+        return '#%i'%self
+
+class Enumeration(str):
+    """ An enumeration value, i.e. .T. or .ADDED. (stored without the dots)
+    """
+    __slots__ = ()
+    def __repr__(self):
+        return '.%s.'%self
+
+class Binary(str):
+    """ A binary value, stored as its hexadecimal string
+    """
+    __slots__ = ()
+    def __repr__(self):
+        return '"%s"'%self
+
+class TypedParameter(namedtuple('TypedParameter', 'type_name params')):
+    """ A typed parameter such as LENGTH_MEASURE(2.5), or one part of a
+    complex entity instance such as #10=(A(1)B(2));
+    """
+    __slots__ = ()
+    def __repr__(self):
+        return '%s(%s)'%(self.type_name, ','.join(map(repr, self.params)))
+
+class _Symbol(object):
+    """ Singleton used for the $ (unset) and * (derived) tokens
+    """
+    __slots__ = ('_token', '_global_name')
+    def __init__(self, token, global_name):
+        self._token = token
+        self._global_name = global_name
+    def __repr__(self):
+        return self._token
+    def __reduce__(self):
+        # keep the singleton identity through pickling
+        return self._global_name
+
+UNSET = _Symbol('$', 'UNSET')
+DERIVED = _Symbol('*', 'DERIVED')
+
+class _RecordLevel(object):
+    """ Stands for the aggregate being filled when outside of any parenthesis
+    """
+    def append(self, value):
+        raise ValueError("Unexpected %r outside of parenthesis"%(value,))
+
+def iter_records(fp, header=None, chunk_size=CHUNK_SIZE):
+    """ Single pass, streaming reader of a Part21 file object.
+    Yields (instance_id, entity_name, attributes) for every entity instance of
+    the DATA section. Attributes are typed: int, float, str, Reference,
+    Enumeration, Binary, TypedParameter, UNSET, DERIVED and nested lists for
+    aggregates. For complex instances, entity_name is '' and the attributes
+    are the list of TypedParameter partial instances.
+    If header is a dict, header entities are stored into it (name -> attributes).
+
+    The file is read by chunks of chunk_size bytes, each chunk being tokenized
+    up to its last ';'. When that ';' lies in a string or a comment, the last
+    record is left unterminated and it is tokenized again with the next chunk.
+    """
+    top = _RecordLevel()
+    findall = TOKEN_RE.findall
+    kinds = TOKEN_KINDS.get
+    buf = ''
+    eof = False
+    while not eof:
+        data = fp.read(chunk_size)
+        if data:
+            buf += data
+            end = buf.rfind(';')+1
+            if not end:
+                continue
+        else:
+            eof = True
+            end = len(buf)
+        records = 0     # number of records ended in this chunk
+        instance_id = entity_name = attributes = pending = None
+        stack = []      # the aggregates being filled, innermost last
+        tags = []       # the typed parameter names matching stack
+        current = top
+        for token in findall(buf, 0, end):
+            kind = kinds(token[0], TOKEN_ERROR)
+            if kind == TOKEN_REF:
+                if stack:
+                    current.append(Reference(token[1:]))
+                elif '=' in token:
+                    instance_id, entity_name = token[1:].split('=')
+                    instance_id = int(instance_id)
+                    entity_name = entity_name.strip()
+                else:
+                    instance_id = int(token[1:])
+            elif kind == TOKEN_OPEN:
+                current = []
+                stack.append(current)
+                tags.append(pending)
+                pending = None
+            elif kind == TOKEN_CLOSE:
+                if not stack:
+                    raise ValueError("Unbalanced parenthesis in entity #%s"%instance_id)
+                params = stack.pop()
+                tag = tags.pop()
+                if tag is not None:
+                    params = TypedParameter(tag, params)
+                if stack:
+                    current = stack[-1]
+                    current.append(params)
+                else:
+                    current = top
+                    attributes = params
+            elif kind == TOKEN_NUMBER:
+                if '.' in token:
+                    current.append(float(token))
+                else:
+                    current.append(int(token))
+            elif kind == TOKEN_STRING and len(token) > 1:
+                if "''" in token:
+                    current.append(token[1:-1].replace("''", "'"))
+                else:
+                    current.append(token[1:-1])
+            elif kind == TOKEN_KEYWORD:
+                if stack:
+                    pending = token
+                else:
+                    entity_name = token
+            elif kind == TOKEN_ENUM and len(token) > 1:
+                current.append(Enumeration(token[1:-1]))
+            elif kind == TOKEN_UNSET:
+                current.append(UNSET)
+            elif kind == TOKEN_DERIVED:
+                current.append(DERIVED)
+            elif kind == TOKEN_END:
+                if stack:
+                    raise ValueError("Unexpected ';' in entity #%s"%instance_id)
+                if entity_name in SECTION_KEYWORDS:
+                    pass
+                elif instance_id is not None:
+                    yield instance_id, entity_name or '', attributes
+                elif header is not None and entity_name:
+                    header[entity_name] = attributes
+                instance_id = entity_name = attributes = None
+                records += 1
+            elif kind == TOKEN_EQUAL and not stack:
+                pass
+            elif kind == TOKEN_BINARY and len(token) > 1:
+                current.append(Binary(token[1:-1]))
+            elif eof:
+                raise ValueError("Unexpected '%s' after entity #%s"%(token, instance_id))
+            else:
+                # a string or a comment goes on in the next chunk
+                break
+        else:
+            if eof and (stack or instance_id is not None):
+                raise ValueError("Unexpected end of file")
+            buf = buf[end:]
+            continue
+        # keep the unterminated record for the next chunk
+        buf = buf[_record_end(buf, records):]
+
+def _record_end(buf, records):
+    """ Returns the offset in buf following the given number of records
+    """
+    if not records:
+        return 0
+    for m in TOKEN_RE.finditer(buf):
+        if m.group(1) == ';':
+            records -= 1
+            if not records:
+                return m.end()
+
+def iter_references(attributes):
+    """ Yields the instance names referenced in attributes, at any depth """
+    pending = [attributes]
+    while pending:
+        for value in pending.pop():
+            if isinstance(value, Reference):
+                yield int(value)
+            elif isinstance(value, list):
+                pending.append(value)
+            elif isinstance(value, TypedParameter):
+                pending.append(value.params)
+
+# files smaller than that are parsed in one process
+PARALLEL_MIN_SIZE = 8 << 20
+
+# a safe place to split a file: after a ';' followed by the head of a record
+RECORD_BOUNDARY_RE = re.compile(r";\s*(?=\#\d+\s*=)")
+
+class _BoundedReader(object):
+    """ Reads at most size bytes from the file object fp """
+    def __init__(self, fp, size):
+        self._fp = fp
+        self._left = size
+
+    def read(self, size):
+        size = min(size, self._left)
+        if size <= 0:
+            return ''
+        data = self._fp.read(size)
+        self._left -= len(data)
+        return data
+
+def split_records(filename, parts):
+    """ Returns the offsets [0, ..., file size] splitting filename into about
+    parts pieces, every piece but the first one starting at a record head.
+    """
+    size = os.path.getsize(filename)
+    offsets = [0]
+    fp = open(filename, 'rb')
+    try:
+        for k in range(1, parts):
+            target = max(size*k//parts, offsets[-1])
+            fp.seek(target)
+            window = ''
+            while True:
+                data = fp.read(1 << 16)
+                if not data:
+                    break
+                window += data
+                m = RECORD_BOUNDARY_RE.search(window)
+                if m:
+                    if target+m.end() > offsets[-1]:
+                        offsets.append(target+m.end())
+                    break
+    finally:
+        fp.close()
+    offsets.append(size)
+    return offsets
+
+def _parse_records_range(args):
+    """ Worker of parse_file_parallel: parses the records between two offsets
+    into an InstanceStore. Returns (store, header).
+    """
+    import InstanceStore
+    filename, start, end = args
+    store = InstanceStore.InstanceStore()
+    header = {}
+    fp = open(filename, 'rb')
+    try:
+        fp.seek(start)
+        for instance_id, entity_name, attributes in iter_records(_BoundedReader(fp, end-start), header):
+            store.add(instance_id, entity_name, attributes)
+    finally:
+        fp.close()
+    return store, header
+
+def parse_file_parallel(filename, processes=None, parts=None, pool=None):
+    """ Parses filename in a pool of processes (default: one per core).
+    The file is split at record boundaries into parts pieces (default: 4 per
+    process), each one parsed into an InstanceStore by a worker; the stores are
+    merged in file order as they come back. Returns (store, header).
+    An embedding application can give its own multiprocessing pool of that
+    many processes, which is left open.
+    A ValueError is raised if a piece can't be parsed on its own, e.g. when a
+    string holds something looking like a record boundary.
+    """
+    import multiprocessing
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if parts is None:
+        parts = 4*processes
+    offsets = split_records(filename, parts)
+    ranges = [(filename, offsets[k], offsets[k+1]) for k in range(len(offsets)-1)]
+    owned = pool is None
+    if owned:
+        pool = multiprocessing.Pool(processes)
+    try:
+        store = header = None
+        for part, part_header in pool.imap(_parse_records_range, ranges):
+            if store is None:
+                store, header = part, part_header
+            else:
+                store.extend(part)
+                header.update(part_header)
+    finally:
+        if owned:
+            pool.terminate()
+            pool.join()
+    return store, header
+
+def instantiation_levels(definitions):
+    """ Orders the instances of definitions (a dict like id -> (entity_name,
+    attributes)) so that every instance comes after the instances it references.
+    Returns (levels, unresolved): levels is a list of lists of instance ids,
+    the instances of a level only referencing instances of the previous levels;
+    unresolved lists the instances left out because they are part of a
+    reference cycle, or depend on one. References to missing instances are
+    ignored. The ordering is iterative (Kahn), so long reference chains don't
+    hit the recursion limit.
+    """
+    dependents = {}     # id -> ids of the instances referencing it
+    waiting = {}        # id -> number of referenced instances not ordered yet
+    level = []
+    for instance_id in definitions.keys():
+        references = set([r for r in iter_references(definitions[instance_id][1]) if r in definitions])
+        if references:
+            waiting[instance_id] = len(references)
+            for r in references:
+                dependents.setdefault(r, []).append(instance_id)
+        else:
+            level.append(instance_id)
+    levels = []
+    while level:
+        levels.append(level)
+        next_level = []
+        for instance_id in level:
+            for d in dependents.pop(instance_id, ()):
+                waiting[d] -= 1
+                if not waiting[d]:
+                    del waiting[d]
+                    next_level.append(d)
+        level = next_level
+    return levels, sorted(waiting)
+
+def find_cycles(definitions, instance_ids, max_cycles=10):
+    """ Returns up to max_cycles reference cycles (lists of instance ids) going
+    through the given instances, typically the unresolved instances returned by
+    instantiation_levels.
+    """
+    candidates = set(instance_ids)
+    def references(instance_id):
+        return iter([r for r in iter_references(definitions[instance_id][1]) if r in candidates])
+    state = {}      # 1: on the current path, 2: done
+    cycles = []
+    for root in sorted(candidates):
+        if root in state:
+            continue
+        state[root] = 1
+        path = [root]
+        stack = [references(root)]
+        while stack:
+            for r in stack[-1]:
+                if state.get(r) == 1:
+                    cycles.append(path[path.index(r):])
+                    if len(cycles) >= max_cycles:
+                        return cycles
+                elif r not in state:
+                    state[r] = 1
+                    path.append(r)
+                    stack.append(references(r))
+                    break
+            else:
+                state[path.pop()] = 2
+                stack.pop()
+    return cycles
+
 def map_string_to_num(stri):
     """ Take a string, check wether it is an integer, a float or not
     """
@@ -97,13 +480,31 @@ class Part21Parser:
     self._instance_definition : stores attibutes, key is the instance integer id
     self._number_of_ancestors : stores the number of ancestors of entity id. This enables
     to define the order of instances creation.
+    With compact=True, self._instance_definition is an InstanceStore.InstanceStore,
+    which has the same lookup API but keeps the instances in flat arrays.
+    With indexed=True, it is a Part21Index.Part21Index: the file is not parsed,
+    instances are decoded from the memory mapped file when accessed.
+    With processes other than 1, big files are parsed by that many processes
+    (0: one per core) into an InstanceStore, or by the given multiprocessing
+    pool of an embedding application.
     """
-    def __init__(self, filename):
+    def __init__(self, filename, compact=False, indexed=False, processes=1, pool=None):
         self._filename = filename
+        self._processes = processes
+        self._pool = pool
         # the schema
         self._schema_name = ""
         # the dict self._instances contain instance definition
-        self._instances_definition = {}
+        if indexed:
+            import Part21Index
+            self._instances_definition = Part21Index.Part21Index(filename)
+            self._schema_name = self._instances_definition.get_schema_name()
+            return
+        if compact:
+            import InstanceStore
+            self._instances_definition = InstanceStore.InstanceStore()
+        else:
+            self._instances_definition = {}
         # this dict contains lists of 0 ancestors, 1 ancestor, etc.
         # initializes this dict
         #self._number_of_ancestors = {} # this kind of sorting don't work on non-trivial files
@@ -120,9 +521,36 @@ class Part21Parser:
         print schema_name
 
     def get_number_of_instances(self):
-        return len(self._instances_definition.keys())
+        return len(self._instances_definition)
 
     def parse_file(self):
+        init_time = time.time()
+        print "Parsing file %s..."%self._filename,
+        header = {}
+        parsed = False
+        if self._processes != 1 and os.path.getsize(self._filename) >= PARALLEL_MIN_SIZE:
+            try:
+                self._instances_definition, header = parse_file_parallel(self._filename, self._processes or None, pool=self._pool)
+                parsed = True
+            except ValueError, e:
+                print "parallel parsing failed (%s), parsing again in one process..."%e,
+        if not parsed:
+            fp = open(self._filename, 'rb')
+            try:
+                for instance_id, entity_name, entity_attrs in iter_records(fp, header):
+                    self._instances_definition[instance_id] = (entity_name, entity_attrs)
+            finally:
+                fp.close()
+        if 'FILE_SCHEMA' in header:
+            #identify the schema name
+            self._schema_name = header['FILE_SCHEMA'][0][0].split(" ")[0].lower()
+        print 'done in %fs.'%(time.time()-init_time)
+        print 'schema: - %s entities %i'%(self._schema_name,len(self._instances_definition))
+
+    def parse_file_lines(self):
+        """ The former line based parser, kept for reference and benchmarks.
+        Attributes are stored as nested lists of strings.
+        """
         init_time = time.time()
         print "Parsing file %s..."%self._filename,
         fp = open(self._filename)
@@ -183,8 +611,9 @@ class Part21Population(object):
     def create_entity_instances(self):
         """ Starts entity instances creation
         """
-        for number_of_ancestor in self._part21_loader._number_of_ancestors.keys():
-            for entity_definition_id in self._part21_loader._number_of_ancestors[number_of_ancestor]:
+        levels, unresolved = instantiation_levels(self._part21_loader._instances_definition)
+        for level in levels:
+            for entity_definition_id in level:
                 self.create_entity_instance(entity_definition_id)
 
     def create_entity_instance(self, instance_id):
@@ -0,0 +1,272 @@
+# Copyright (c) 2014, FreeCAD developers
+# All rights reserved.
+
+# This file is part of the StepClassLibrary (SCL).
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+#   Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+#   Neither the name of the <ORGANIZATION> nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Random access to the instances of a Part21 file
+
+Part21Index maps the file in memory and records the byte offset and the
+entity type of every #id=... record, so that a single instance and the
+instances it references can be decoded without reading the whole file.
+With persist=True, the index is saved next to the file (filename +
+INDEX_SUFFIX) and reused as long as the size and modification time of the
+file are unchanged.
+"""
+
+import os,re,mmap,bisect
+from array import array
+from cStringIO import StringIO
+import Part21
+
+
+INDEX_SUFFIX = '.p21idx'
+INDEX_VERSION = 2
+
+# offsets and lengths are 64 bits everywhere ('L' is 32 bits on Windows),
+# doubles hold them exactly where the array module has no 'Q'
+try:
+    array('Q')
+    OFFSET_TYPECODE = 'Q'
+except ValueError:
+    OFFSET_TYPECODE = 'd'
+
+# strings and comments are matched so that their content is skipped
+RECORD_HEAD_RE = re.compile(r"""'(?:[^']|'')*'|/\*.*?\*/|\#(\d+)\s*=\s*([A-Za-z_][A-Za-z0-9_-]*)?""", re.S)
+
+class Part21Index(object):
+    """ A read only, dict like view of the instances definitions of a Part21
+    file: index[id] returns (entity_name, attributes) as Part21.iter_records
+    yields them.
+    """
+    def __init__(self, filename, persist=False):
+        self._filename = filename
+        self._fp = open(filename, 'rb')
+        stat = os.fstat(self._fp.fileno())
+        self._key = (stat.st_size, int(stat.st_mtime))
+        if stat.st_size:
+            self._data = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = ''
+        self._by_type = {}
+        self._header = None
+        if not self._load():
+            self._build()
+            if persist:
+                self._save()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._fp.close()
+
+    def _build(self):
+        """ Scans the file for the record heads """
+        ids = array('l')
+        types = array('H')
+        offsets = array(OFFSET_TYPECODE)
+        type_names = []
+        type_codes = {}
+        for m in RECORD_HEAD_RE.finditer(self._data):
+            instance_id = m.group(1)
+            if instance_id is None:
+                continue
+            entity_name = m.group(2) or ''
+            code = type_codes.get(entity_name)
+            if code is None:
+                code = type_codes[entity_name] = len(type_names)
+                type_names.append(entity_name)
+            ids.append(int(instance_id))
+            types.append(code)
+            offsets.append(m.start())
+        # a record runs up to the next one in the file
+        lengths = array(OFFSET_TYPECODE, [offsets[i+1]-offsets[i] for i in range(len(offsets)-1)])
+        if offsets:
+            lengths.append(len(self._data)-offsets[-1])
+        # sort by instance name for the lookups
+        if any(ids[i] > ids[i+1] for i in range(len(ids)-1)):
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            ids = array('l', [ids[i] for i in order])
+            types = array('H', [types[i] for i in order])
+            offsets = array(OFFSET_TYPECODE, [offsets[i] for i in order])
+            lengths = array(OFFSET_TYPECODE, [lengths[i] for i in order])
+        self._ids, self._types, self._offsets, self._lengths = ids, types, offsets, lengths
+        self._type_names = type_names
+
+    def _arrays(self):
+        return (self._ids, self._types, self._offsets, self._lengths)
+
+    def _save(self):
+        path = self._filename+INDEX_SUFFIX
+        try:
+            out = open(path, 'wb')
+        except IOError:
+            # read only location, the index is rebuilt next time
+            return
+        try:
+            try:
+                signature = ' '.join([a.typecode+str(a.itemsize) for a in self._arrays()])
+                out.write('P21INDEX %i %i %i %i %s\n'%((INDEX_VERSION,)+self._key+(len(self._ids), signature)))
+                out.write('\t'.join(self._type_names)+'\n')
+                for a in self._arrays():
+                    a.tofile(out)
+            finally:
+                out.close()
+        except IOError:
+            # disk full or the like, no truncated index is left behind
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _load(self):
+        """ Reads the saved index if it matches the file, returns True on success """
+        try:
+            fp = open(self._filename+INDEX_SUFFIX, 'rb')
+        except IOError:
+            return False
+        try:
+            fields = fp.readline().split()
+            if len(fields) < 5 or fields[0] != 'P21INDEX':
+                return False
+            version, size, mtime, count = [int(f) for f in fields[1:5]]
+            if version != INDEX_VERSION or (size, mtime) != self._key:
+                return False
+            self._ids, self._types, self._offsets, self._lengths = arrays = \
+                array('l'), array('H'), array(OFFSET_TYPECODE), array(OFFSET_TYPECODE)
+            if fields[5:] != [a.typecode+str(a.itemsize) for a in arrays]:
+                return False
+            self._type_names = fp.readline()[:-1].split('\t')
+            for a in arrays:
+                a.fromfile(fp, count)
+        except (ValueError, EOFError):
+            return False
+        finally:
+            fp.close()
+        return True
+
+    def _index(self, instance_id):
+        i = bisect.bisect_left(self._ids, instance_id)
+        if i < len(self._ids) and self._ids[i] == instance_id:
+            return i
+        return -1
+
+    def _decode(self, index):
+        start = int(self._offsets[index])
+        record = self._data[start:start+int(self._lengths[index])]
+        for instance_id, entity_name, attributes in Part21.iter_records(StringIO(record)):
+            return entity_name, attributes
+        raise ValueError("Can't decode instance #%i"%self._ids[index])
+
+    def __getitem__(self, instance_id):
+        index = self._index(instance_id)
+        if index < 0:
+            raise KeyError(instance_id)
+        return self._decode(index)
+
+    def get(self, instance_id, default=None):
+        index = self._index(instance_id)
+        if index < 0:
+            return default
+        return self._decode(index)
+
+    def get_entity_name(self, instance_id):
+        """ Returns the entity name of an instance without decoding its attributes
+        """
+        index = self._index(instance_id)
+        if index < 0:
+            raise KeyError(instance_id)
+        return self._type_names[self._types[index]]
+
+    def get_ids_by_type(self, entity_name):
+        """ Returns the names of the instances of the given entity (upper case)
+        """
+        ids = self._by_type.get(entity_name)
+        if ids is None:
+            if entity_name in self._type_names:
+                code = self._type_names.index(entity_name)
+                ids = [i for i, t in zip(self._ids, self._types) if t == code]
+            else:
+                ids = []
+            self._by_type[entity_name] = ids
+        return list(ids)
+
+    def iter_closure(self, instance_ids):
+        """ Yields (instance_id, entity_name, attributes) for the given instances
+        and every instance they reference, directly or not. Each instance is
+        decoded once; missing instances are skipped.
+        """
+        seen = set()
+        pending = list(instance_ids)
+        while pending:
+            instance_id = pending.pop()
+            if instance_id in seen:
+                continue
+            seen.add(instance_id)
+            index = self._index(instance_id)
+            if index < 0:
+                continue
+            entity_name, attributes = self._decode(index)
+            yield instance_id, entity_name, attributes
+            pending.extend(r for r in Part21.iter_references(attributes) if r not in seen)
+
+    def get_header(self):
+        """ Returns the header entities, a dict of name -> attributes """
+        if self._header is None:
+            self._header = {}
+            if self._offsets:
+                end = int(min(self._offsets))
+            else:
+                end = len(self._data)
+            for record in Part21.iter_records(StringIO(self._data[:end]), self._header):
+                pass
+        return self._header
+
+    def get_schema_name(self):
+        header = self.get_header()
+        if 'FILE_SCHEMA' in header:
+            return header['FILE_SCHEMA'][0][0].split(" ")[0].lower()
+        return ""
+
+    def __contains__(self, instance_id):
+        return self._index(instance_id) >= 0
+
+    has_key = __contains__
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def keys(self):
+        return list(self._ids)
+
+    def iteritems(self):
+        for index in range(len(self._ids)):
+            yield self._ids[index], self._decode(index)
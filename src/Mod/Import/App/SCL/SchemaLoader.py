@@ -0,0 +1,116 @@
+# Copyright (c) 2014, FreeCAD developers
+# All rights reserved.
+
+# This file is part of the StepClassLibrary (SCL).
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+#   Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+#   Neither the name of the <ORGANIZATION> nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Loading of the generated EXPRESS schema modules
+
+The schema modules (config_control_design, automotive_design, ifc2x3, ...)
+are tens of thousands of lines long: most of their import time is spent
+compiling them, which happens on every import when Python can't write the
+.pyc next to them (e.g. a read only installation). load_schema() keeps the
+compiled code in a user writable cache directory instead, keyed on the size
+and modification time of the source and on the Python version, and only
+loads a schema when a file actually uses it.
+"""
+
+import os,sys,imp,marshal
+
+
+def get_cache_dir():
+    """ Returns the directory holding the compiled schemas """
+    try:
+        import FreeCAD
+        base = FreeCAD.ConfigGet("UserAppData")
+    except ImportError:
+        base = os.path.join(os.path.expanduser('~'), '.scl')
+    return os.path.join(base, 'SCL', 'schemas')
+
+def _cache_file(schema_name):
+    return os.path.join(get_cache_dir(), '%s-%s.code'%(schema_name, imp.get_magic().encode('hex')))
+
+def _load_code(source_path, schema_name):
+    """ Returns the code object of source_path, from the cache if it is up to date """
+    stat = os.stat(source_path)
+    key = (stat.st_size, int(stat.st_mtime))
+    cache_file = _cache_file(schema_name)
+    try:
+        fp = open(cache_file, 'rb')
+        try:
+            if marshal.load(fp) == key:
+                return marshal.load(fp)
+        finally:
+            fp.close()
+    except (IOError, EOFError, ValueError, TypeError):
+        pass
+    source = open(source_path, 'rU').read()
+    code = compile(source, source_path, 'exec')
+    try:
+        if not os.path.isdir(get_cache_dir()):
+            os.makedirs(get_cache_dir())
+        # write aside and rename, so that a concurrent load never reads half a file
+        fp = open(cache_file+'.tmp', 'wb')
+        try:
+            marshal.dump(key, fp)
+            marshal.dump(code, fp)
+        finally:
+            fp.close()
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        os.rename(cache_file+'.tmp', cache_file)
+    except (IOError, OSError):
+        # no cache this time
+        pass
+    return code
+
+def load_schema(schema_name, path=None):
+    """ Imports and returns the schema module schema_name, as found in the
+    FILE_SCHEMA of a Part21 file (e.g. 'config_control_design'). Raises
+    ImportError if there is no such schema module.
+    """
+    schema_name = schema_name.lower()
+    module = sys.modules.get(schema_name)
+    if module is not None:
+        return module
+    fp, source_path, description = imp.find_module(schema_name, path)
+    if fp:
+        fp.close()
+    if description[2] != imp.PY_SOURCE:
+        # only compiled modules around, the regular import is as fast
+        return __import__(schema_name)
+    code = _load_code(source_path, schema_name)
+    module = imp.new_module(schema_name)
+    module.__file__ = source_path
+    sys.modules[schema_name] = module
+    try:
+        exec code in module.__dict__
+    except:
+        del sys.modules[schema_name]
+        raise
+    return module
@@ -36,7 +36,7 @@ corosbonding classes.
 In addition it writes out a graphwiz file with the entity graph.
 """
 
-import Part21,sys
+import Part21,SchemaLoader,sys
 
 
 
@@ -54,11 +54,14 @@ class SimpleParser:
     Part21.Part21Parser._instance_definition : stores attibutes, key is the instance integer id
     Part21.Part21Parser._number_of_ancestors : stores the number of ancestors of entity id. This enables
     to define the order of instances creation.
+    compact=True keeps the definitions in an InstanceStore (lower memory, decoded on access).
+    indexed=True reads them from a Part21Index of the memory mapped file, without loading it.
+    processes>1 (0 for one per core) parses big files in parallel into an InstanceStore.
     """
-    def __init__(self, filename):
+    def __init__(self, filename, compact=False, indexed=False, processes=1):
         import time
         import sys
-        self._p21loader = Part21.Part21Parser(filename)
+        self._p21loader = Part21.Part21Parser(filename, compact, indexed, processes)
         #self._p21loader._number_of_ancestors = {} # not needed, save memory
         self.schemaModule = None
         self.schemaClasses = None
@@ -70,96 +73,120 @@ class SimpleParser:
         for i in attrList:
             if isinstance(i,list):
                 self._writeGraphVizEdge(num,i,file)
-            elif  isinstance(i,str):
-                if not i == '' and i[0] == '#':
-                    key = int(i[1:])
-                    file.write('  '+`num`+' -> '+`key`+'\n')
-
-
-    def writeGraphViz(self,fileName):
+            elif isinstance(i,Part21.TypedParameter):
+                self._writeGraphVizEdge(num,i.params,file)
+            elif isinstance(i,Part21.Reference):
+                file.write('  '+`num`+' -> '+`int(i)`+'\n')
+
+
+    def _closure(self,roots):
+        """returns the given entities and all the ones they reference"""
+        definitions = self._p21loader._instances_definition
+        seen = set()
+        pending = list(roots)
+        while pending:
+            i = pending.pop()
+            if i in seen or not definitions.has_key(i):
+                continue
+            seen.add(i)
+            pending.extend(Part21.iter_references(definitions[i][1]))
+        return sorted(seen)
+
+    def writeGraphViz(self,fileName,roots=None):
+        """writes the entity graph, or only the part of it reachable from the roots entities"""
         print "Writing GraphViz file %s..."%fileName,
         gvFile = open(fileName,'w')
 
         gvFile.write('digraph G {\n  node [fontname=Verdana,fontsize=12]\n  node [style=filled]\n  node [fillcolor="#EEEEEE"]\n  node [color="#EEEEEE"]\n  edge [color="#31CEF0"]\n')
-        for i in self._p21loader._instances_definition.keys():
+        if roots is None:
+            keys = self._p21loader._instances_definition.keys()
+        else:
+            keys = self._closure(roots)
+        for i in keys:
+            entityDef = self._p21loader._instances_definition[i]
             entityStr = '#'+`i`
-            nameStr   = self._p21loader._instances_definition[i][0].lower()
-            sttrStr   = `self._p21loader._instances_definition[i][1]`.replace('"','').replace("'",'').replace(" ",'')
+            nameStr   = entityDef[0].lower()
+            sttrStr   = `entityDef[1]`.replace('"','').replace("'",'').replace(" ",'')
             if len (sttrStr) > 40:
                 sttrStr = sttrStr[:39]+'....'
             gvFile.write('  '+`i`+' [label="'+entityStr+'\n'+nameStr+'\n'+sttrStr+'"]\n')
-            self._writeGraphVizEdge( i,self._p21loader._instances_definition[i][1],gvFile)
+            self._writeGraphVizEdge( i,entityDef[1],gvFile)
         gvFile.write('}\n')
 
     def instaciate(self):
         """Instaciate the python classe from the enteties"""
-        import inspect
-        # load the needed schema module
-        if self._p21loader.get_schema_name() == 'config_control_design':
-            import config_control_design
-            self.schemaModule = config_control_design
-        if self._p21loader.get_schema_name() == 'automotive_design':
-            import automotive_design
-            self.schemaModule = automotive_design
+        # load the needed schema module, from the compiled code cache
+        try:
+            self.schemaModule = SchemaLoader.load_schema(self._p21loader.get_schema_name())
+        except ImportError:
+            print 'No schema module for',self._p21loader.get_schema_name()
 
         if self.schemaModule:
-            self.schemaClasses = dict(inspect.getmembers(self.schemaModule))
-
-        for i in self._p21loader._instances_definition.keys():
-            #print i
-            if not self.instanceMape.has_key(i):
-                self._create_entity_instance(i)
-
-    def _create_entity_instance(self, instance_id):
-        if self._p21loader._instances_definition.has_key(instance_id):
-            instance_definition = self._p21loader._instances_definition[instance_id]
-            #print "Instance definition to process",instance_definition
-            # first find class name
-            class_name = instance_definition[0].lower()
-            #print "Class name:%s"%class_name
-
-            if not class_name=='':
-                classDef = self.schemaClasses[class_name]
-                # then attributes
-                #print object_.__doc__
-            instance_attributes = instance_definition[1]
-            self._transformAttributes(instance_attributes)
-            print 'Attribute list after transform: ',instance_attributes
-
-            self.instanceMape[instance_id] = str('dummy#:'+str(instance_id)) # dummy instance to test
-        else:
-            print '############################# lost entity: ',instance_id
-            self.instanceMape[instance_id] = int(41) # dummy
+            self.schemaClasses = dict(vars(self.schemaModule))
+
+        definitions = self._p21loader._instances_definition
+        levels, unresolved = Part21.instantiation_levels(definitions)
+        if unresolved:
+            print '############################# %i entities in reference cycles, e.g.: '%len(unresolved),Part21.find_cycles(definitions,unresolved,3)
+        for level in levels:
+            # the entities of a level are independent, create them type by type
+            byType = {}
+            for i in level:
+                byType.setdefault(self._entityName(i),[]).append(i)
+            for class_name,ids in byType.iteritems():
+                classDef = self._getClass(class_name)
+                for i in ids:
+                    self._create_entity_instance(i,classDef)
+        # the entities in cycles keep the references they can't resolve
+        for i in unresolved:
+            self._create_entity_instance(i,self._getClass(self._entityName(i)))
+
+    def _entityName(self, instance_id):
+        definitions = self._p21loader._instances_definition
+        if hasattr(definitions,'get_entity_name'):
+            return definitions.get_entity_name(instance_id).lower()
+        return definitions[instance_id][0].lower()
+
+    def _getClass(self, class_name):
+        """returns the schema class of an entity name, None for complex entities"""
+        if class_name=='':
+            return None
+        return self.schemaClasses[class_name]
+
+    def _create_entity_instance(self, instance_id, classDef=None):
+        instance_definition = self._p21loader._instances_definition[instance_id]
+        #print "Instance definition to process",instance_definition
+        # then attributes
+        #print classDef.__doc__
+        instance_attributes = instance_definition[1]
+        self._transformAttributes(instance_attributes)
+        print 'Attribute list after transform: ',instance_attributes
+
+        self.instanceMape[instance_id] = str('dummy#:'+str(instance_id)) # dummy instance to test
         #print "instance_attributes:",instance_attributes
-        #a = object_(*instance_attributes)
+        #a = classDef(*instance_attributes)
 
     def _transformAttributes(self,attrList):
         n = 0
         for i in attrList:
             if isinstance(i,list):
                 self._transformAttributes(i)
-            elif  isinstance(i,str):
-                if i == '':
-                    print 'empty string'
-                elif i[0] == '#':
-                    key = int(i[1:])
-                    #print 'Item: ',int(i[1:])
-                    if self.instanceMape.has_key(key):
-                        attrList[n] =  self.instanceMape[key]
-                    else:
-                        self._create_entity_instance(key)
-                        if not self.instanceMape.has_key(key):
-                            raise NameError("Needed instance not instanciated: ",key)
-                        else:
-                            attrList[n] =  self.instanceMape[key]
-                elif i[0] == '$':
-                    #print 'Dollar'
-                    pass
-                elif i[0] == "'":
-                    print 'Dopelstring: ',i[1:-1]
-                else:
-                    print 'String: ',i
-            else:
+            elif isinstance(i,Part21.TypedParameter):
+                self._transformAttributes(i.params)
+            elif isinstance(i,Part21.Reference):
+                key = int(i)
+                #print 'Item: ',key
+                if self.instanceMape.has_key(key):
+                    attrList[n] =  self.instanceMape[key]
+                elif not self._p21loader._instances_definition.has_key(key):
+                    print '############################# lost entity: ',key
+                    self.instanceMape[key] = int(41) # dummy
+                    attrList[n] =  self.instanceMape[key]
+                # else: in a reference cycle, the reference is kept
+            elif i is Part21.UNSET or i is Part21.DERIVED:
+                pass
+            elif not isinstance(i,(int,long,float,str)):
+                # strings, enumerations, binaries and numbers are kept as they are
                 raise NameError("Unknown attribute type")
             n = n+1
 
@@ -34,6 +34,41 @@ import BaseType
 
 RAISE_EXCEPTION_IF_TYPE_DOES_NOT_MATCH = True
 DEBUG = False
+# set to False (see set_validation) to skip all checks, e.g. for the bulk
+# import of trusted files. The generated schemas import SCL.TypeChecker.
+VALIDATE = True
+
+# verdicts of SELECT and simple types checks, which only depend on the class
+# of the instance: (instance class, expected type) -> True/False
+_verdicts = {}
+
+def set_validation(enabled):
+    """ Enables or disables type checking; check_type always succeeds when disabled """
+    global VALIDATE
+    VALIDATE = enabled
+
+def clear_cache():
+    """ Forgets the cached verdicts, e.g. after a schema module has been reloaded """
+    _verdicts.clear()
+
+def _verdict(instance, expected_type):
+    """ Returns True if the class of instance matches expected_type (a SELECT
+    or a simple type), from the cache when possible
+    """
+    # __class__ rather than type() for old style classes instances
+    key = (instance.__class__, expected_type)
+    verdict = _verdicts.get(key)
+    if verdict is None:
+        if isinstance(expected_type,SELECT):
+            verdict = False
+            for allowed_type in expected_type.get_allowed_basic_types():
+                if isinstance(instance,allowed_type):
+                    verdict = True
+                    break
+        else:
+            verdict = isinstance(instance,expected_type)
+        _verdicts[key] = verdict
+    return verdict
 
 def cast_python_object_to_aggregate(obj, aggregate):
     """ This function casts a python object to an aggregate type. For instance:
@@ -49,6 +84,8 @@ def check_type(instance, expected_type):
     """ This function checks wether an object is an instance of a given class
     returns False or True
     """
+    if not VALIDATE:
+        return True
     type_match = False #by default, will be set to True if any match
     if DEBUG:
         print "==="
@@ -63,11 +100,9 @@ def check_type(instance, expected_type):
             raise TypeError('Enumeration ids must be %s ( passed %s)'%(allowed_ids,type(instance)))
     elif (isinstance(expected_type,SELECT)):        
         # we check if the instance is of the type of any of the types that are in the SELECT
-        allowed_types = expected_type.get_allowed_basic_types()
-        for allowed_type in allowed_types:
-            if isinstance(instance,allowed_type):
-                type_match = True
+        type_match = _verdict(instance,expected_type)
         if not type_match:
+            allowed_types = expected_type.get_allowed_basic_types()
             if RAISE_EXCEPTION_IF_TYPE_DOES_NOT_MATCH:
                 raise TypeError('Argument type must be %s (you passed %s)'%(allowed_types,type(instance)))
             else:
@@ -91,7 +126,7 @@ def check_type(instance, expected_type):
         else:
             type_match = True
     else: # simple data types
-        type_match = isinstance(instance,expected_type)
+        type_match = _verdict(instance,expected_type)
         if not type_match:
             if RAISE_EXCEPTION_IF_TYPE_DOES_NOT_MATCH:
                 raise TypeError('Argument type must be %s (you passed %s)'%(expected_type,type(instance)))
@@ -228,48 +228,9 @@ class Overlappingfaces():
 
 def findConnectedEdges(edgelist,eps=1e-6,debug=False):
     '''returns a list of list of connected edges'''
-
-    def vertequals(v1,v2,eps=1e-6):
-        '''check two vertices for equality'''
-        #return all([abs(c1-c2)<eps for c1,c2 in zip(v1.Point,v2.Point)])
-        return v1.Point.sub(v2.Point).Length<eps
-
-    def vertindex(forward):
-        '''return index of last or first element'''
-        return -1 if forward else 0
-
-    freeedges = edgelist[:]
-    retlist = []
-    debuglist = []
-    while freeedges:
-        startwire = freeedges.pop(0)
-        forward = True
-        newedge = [(startwire,True)]
-        for forward in (True, False):
-            found = True
-            while found:
-                lastvert = newedge[vertindex(forward)][0].Vertexes[vertindex(forward == newedge[vertindex(forward)][1])]
-                for ceindex, checkedge in enumerate(freeedges):
-                    found = False
-                    for cvindex, cvert in enumerate([checkedge.Vertexes[0],checkedge.Vertexes[-1]]):
-                        if vertequals(lastvert,cvert,eps):
-                            if forward:
-                                newedge.append((checkedge,cvindex == 0))
-                            else:
-                                newedge.insert(0,(checkedge,cvindex == 1))
-                            del freeedges[ceindex]
-                            found = True
-                            break
-                    else:
-                        found = False
-                    if found:
-                        break
-                else:
-                    found = False
-        #we are finished for this edge
-        debuglist.append(newedge)
-        retlist.append([item[0] for item in newedge]) #strip off direction
-    #print debuglist
+    import DraftGeomUtils
+    debuglist = DraftGeomUtils.findConnectedEdges(edgelist,tolerance=eps)
+    retlist = [[item[0] for item in newedge] for newedge in debuglist] #strip off direction
     if debug:
         return retlist,debuglist
     else:
@@ -121,6 +121,152 @@ def newtempfilename():
 
 tempfilenamegen=newtempfilename()
 
+openscadversions = {}
+cachestats = {'hits':0,'misses':0}
+
+def getcachedopenscadversion(osfilename):
+    '''returns the version of the OpenSCAD binary osfilename, which is only
+    called again if the binary changed'''
+    import os
+    key = (osfilename,os.path.getmtime(osfilename))
+    if key not in openscadversions:
+        openscadversions[key] = getopenscadversion(osfilename)
+    return openscadversions[key]
+
+def getcachesize():
+    '''returns the size limit of the result cache in bytes,
+    0 if the cache is disabled'''
+    import FreeCAD
+    return max(0,FreeCAD.ParamGet(\
+        "User parameter:BaseApp/Preferences/Mod/OpenSCAD").\
+        GetInt('resultCacheSize',100))*1024*1024
+
+def getcachedir():
+    '''returns the directory of the result cache,
+    or None if the cache is disabled or not writable'''
+    import FreeCAD,os
+    if not getcachesize():
+        return None
+    cachedir = os.path.join(FreeCAD.getUserAppDataDir(),'OpenSCAD','cache')
+    try:
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+    except OSError:
+        return None
+    if os.access(cachedir,os.W_OK):
+        return cachedir
+
+def cachekey(osfilename,inputfilename,outputext):
+    '''returns the key of the result of OpenSCAD for inputfilename in the
+    result cache: a hash of the SCAD code, in which the names of the imported
+    files are replaced by hashes of their contents, of the OpenSCAD version and
+    of the output type. Returns None if the result can not be cached'''
+    import hashlib,os,re
+    try:
+        text = open(inputfilename).read()
+    except IOError:
+        return None
+    if re.search(r'\b(include|use)\s*<',text):
+        return None # the libraries are not hashed
+    dir1 = os.path.dirname(os.path.abspath(inputfilename))
+    def filehash(match):
+        filename = match.group(2)
+        if not os.path.isfile(filename):
+            filename = os.path.join(dir1,filename)
+        f = open(filename,'rb') # raises IOError if the file is missing
+        try:
+            return '%s"%s"' % (match.group(1),hashlib.md5(f.read()).hexdigest())
+        finally:
+            f.close()
+    try:
+        text = re.sub(r'(\bfile\s*=\s*|\bimport\w*\s*\(\s*)"([^"]*)"',\
+            filehash,text)
+    except IOError:
+        return None
+    version = getcachedopenscadversion(osfilename) or ''
+    return '%s.%s' % (hashlib.md5('\0'.join((version,outputext,text))).\
+        hexdigest(),outputext)
+
+def getcachedresult(cachedir,key,outputfilename):
+    '''copies the cached result for key to outputfilename
+    returns True on a cache hit'''
+    import FreeCAD,os,shutil
+    cachedfilename = os.path.join(cachedir,key)
+    try:
+        shutil.copyfile(cachedfilename,outputfilename)
+        os.utime(cachedfilename,None) # marks the result as recently used
+    except (IOError,OSError):
+        cachestats['misses'] += 1
+        return False
+    cachestats['hits'] += 1
+    FreeCAD.Console.PrintLog('OpenSCAD result cache hit: %s\n' % key)
+    return True
+
+def storecachedresult(cachedir,key,outputfilename):
+    '''stores outputfilename as the result for key in the cache and deletes
+    the least recently used results above the size limit'''
+    import FreeCAD,os,shutil
+    cachedfilename = os.path.join(cachedir,key)
+    tmpfilename = os.path.join(cachedir,'%s.tmp' % tempfilenamegen.next())
+    try:
+        shutil.copyfile(outputfilename,tmpfilename)
+        if os.path.exists(cachedfilename):
+            os.remove(cachedfilename)
+        os.rename(tmpfilename,cachedfilename)
+    except (IOError,OSError),e:
+        FreeCAD.Console.PrintWarning('Could not cache the OpenSCAD result: %s\n' % e)
+        try:
+            os.remove(tmpfilename)
+        except OSError:
+            pass
+        return
+    prunecache(cachedir)
+
+def prunecache(cachedir=None,maxsize=None):
+    '''deletes the least recently used results until the size of the cache
+    is below maxsize, by default the size limit set in the preferences'''
+    import os
+    cachedir = cachedir or getcachedir()
+    if not cachedir:
+        return
+    if maxsize is None:
+        maxsize = getcachesize()
+    entries = []
+    for filename in os.listdir(cachedir):
+        path = os.path.join(cachedir,filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime,st.st_size,path))
+    size = sum(entry[1] for entry in entries)
+    for mtime,filesize,path in sorted(entries):
+        if size <= maxsize:
+            break
+        try:
+            os.remove(path)
+            size -= filesize
+        except OSError:
+            pass
+
+def clearcache():
+    "deletes all the cached results"
+    prunecache(maxsize=0)
+
+def getcachestats():
+    '''returns the hits and misses of the result cache in this session
+    and the number and the total size of the cached results'''
+    import os
+    stats = dict(cachestats)
+    stats['entries'] = 0
+    stats['size'] = 0
+    cachedir = getcachedir()
+    if cachedir:
+        for filename in os.listdir(cachedir):
+            stats['entries'] += 1
+            stats['size'] += os.path.getsize(os.path.join(cachedir,filename))
+    return stats
+
 def callopenscad(inputfilename,outputfilename=None,outputext='csg',keepname=False):
     '''call the open scad binary
     returns the filename of the result (or None),
@@ -151,7 +297,13 @@ def callopenscad(inputfilename,outputfilename=None,outputext='csg',keepname=Fals
             else:
                 outputfilename=os.path.join(dir1,'%s.%s' % \
                     (tempfilenamegen.next(),outputext))
+        cachedir = getcachedir()
+        key = cachedir and cachekey(osfilename,inputfilename,outputext)
+        if key and getcachedresult(cachedir,key,outputfilename):
+            return outputfilename
         check_output2([osfilename,'-o',outputfilename, inputfilename])
+        if key:
+            storecachedresult(cachedir,key,outputfilename)
         return outputfilename
     else:
         raise OpenSCADError('OpenSCAD executeable unavailable')
@@ -0,0 +1,120 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2015 FreeCAD developers                                 *
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+__title__="FreeCAD OpenSCAD Workbench - CSG import benchmark"
+__author__ = "FreeCAD developers"
+__url__ = ["http://www.freecadweb.org"]
+
+'''
+Measures the overhead of the CSG importer per imported file.
+Usage: FreeCADCmd benchmarkcsg.py [file.csg ...]
+Without files, a small generated CSG file is used.
+'''
+
+import FreeCAD, os, sys, time, tempfile, shutil
+import importCSG, tokrules
+import ply.lex as lex
+import ply.yacc as yacc
+
+SAMPLE = '''group() {
+	multmatrix([[1, 0, 0, 10], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]) {
+		cube(size = [1, 2, 3], center = false);
+	}
+	cylinder($fn = 0, $fa = 12, $fs = 2, h = 2, r1 = 1, r2 = 1, center = false);
+}
+'''
+
+def best_time(func, repeat=5):
+    "returns the best wall time of repeat calls to func, in seconds"
+    best = None
+    for i in range(repeat):
+        init_time = time.time()
+        func()
+        elapsed = time.time()-init_time
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def bench_setup(repeat=5):
+    """returns the time to build the lexer and the parser as the importer did for
+    every file, and the times of getParser with no cached tables, with cached
+    tables and once the parser is built. The tables are cached in a temporary
+    directory, the tables of the user are left alone"""
+    def former():
+        lex.lex(module=tokrules)
+        yacc.yacc(debug=0,module=importCSG,write_tables=0)
+    def fresh(clear=False):
+        # PLY imports the tables as modules, they are forgotten to be read again
+        for name in list(sys.modules):
+            if name.startswith('csglextab_') or name.startswith('csgparsetab_'):
+                del sys.modules[name]
+        if clear:
+            # with their .pyc files, so that they are generated again
+            for f in os.listdir(tabledir):
+                os.remove(os.path.join(tabledir,f))
+        importCSG.parser = None
+        importCSG.getParser()
+    getTableDir = importCSG.getTableDir
+    tabledir = tempfile.mkdtemp()
+    importCSG.getTableDir = lambda: tabledir
+    try:
+        old = best_time(former,repeat)
+        cold = best_time(lambda: fresh(True),repeat)
+        warm = best_time(fresh,repeat)
+        built = best_time(importCSG.getParser,repeat)
+    finally:
+        importCSG.getTableDir = getTableDir
+        importCSG.parser = None
+        shutil.rmtree(tabledir,True)
+    return old, cold, warm, built
+
+def bench_import(filename, repeat=5):
+    "returns the time to import filename in a new document"
+    def load():
+        doc = FreeCAD.newDocument("CSGBenchmark")
+        importCSG.insert(filename,doc.Name)
+        FreeCAD.closeDocument(doc.Name)
+    return best_time(load,repeat)
+
+def run(filenames):
+    old, cold, warm, built = bench_setup()
+    print "lexer and parser setup per file:"
+    print "  before, built for every file: %.4fs" % old
+    print "  first file, no cached tables: %.4fs" % cold
+    print "  first file, cached tables:    %.4fs" % warm
+    print "  next files:                   %.6fs" % built
+    sample = None
+    if not filenames:
+        fd, sample = tempfile.mkstemp(suffix='.csg')
+        os.write(fd,SAMPLE)
+        os.close(fd)
+        filenames = [sample]
+    try:
+        for filename in filenames:
+            t = bench_import(filename)
+            print "%s: %.4fs per import, %.4fs before" % (os.path.basename(filename), t, t+old-built)
+    finally:
+        if sample:
+            os.remove(sample)
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
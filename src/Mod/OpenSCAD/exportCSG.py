@@ -76,10 +76,31 @@ def check_multmatrix(csg,ob,x,y,z):
              0, 0, 0, 1]]){\n")
         return 1 # center = false and mm
 
+def formatchunks(fmt,items,chunksize=10000):
+    """formatchunks(fmt,items,[chunksize]): yields the comma separated text of
+    items (sequences of numbers) formatted with fmt, chunksize items at a time,
+    with a single format operation per chunk"""
+    sep = ''
+    for i in range(0,len(items),chunksize):
+        chunk = items[i:i+chunksize]
+        values = tuple([c for item in chunk for c in item])
+        yield sep + ','.join([fmt]*len(chunk)) % values
+        sep = ','
+
+def writepolyhedron(csg,mesh):
+    "writes the polyhedron of mesh to the file csg in large chunks"
+    points,triangles = mesh.Topology
+    csg.write('polyhedron ( points = [')
+    csg.writelines(formatchunks('[%f,%f,%f]',points))
+    csg.write('], triangles = [')
+    csg.writelines(formatchunks('[%d,%d,%d]',triangles))
+    csg.write(']);\n')
+
 def mesh2polyhedron(mesh):
-    pointstr=','.join(['[%f,%f,%f]' % tuple(vec) for vec in mesh.Topology[0]])
-    trianglestr=','.join(['[%d,%d,%d]' % tuple(tri) for tri in mesh.Topology[1]])
-    return 'polyhedron ( points = [%s], triangles = [%s]);' % (pointstr,trianglestr)
+    points,triangles = mesh.Topology
+    return 'polyhedron ( points = [%s], triangles = [%s]);' % \
+        (''.join(formatchunks('[%f,%f,%f]',points)),\
+        ''.join(formatchunks('[%d,%d,%d]',triangles)))
 
 def vector2d(v):
     return [v[0],v[1]]
@@ -88,10 +109,13 @@ def vertexs2polygon(vertex):
     pointstr=','.join(['[%f, %f]'  % tuple(vector2d(v.Point)) for v in vertex])
     return 'polygon ( points = [%s], paths = undef, convexity = 1);}' % pointstr
 
-def shape2polyhedron(shape):
+def shape2mesh(shape):
     import MeshPart
-    return mesh2polyhedron(MeshPart.meshFromShape(Shape=shape,\
-        Deflection= params.GetFloat('meshdeflection',0.0)))
+    return MeshPart.meshFromShape(Shape=shape,\
+        Deflection= params.GetFloat('meshdeflection',0.0))
+
+def shape2polyhedron(shape):
+    return mesh2polyhedron(shape2mesh(shape))
 
 def process_object(csg,ob):
     
@@ -136,7 +160,7 @@ def process_object(csg,ob):
             csg.write("circle($fn = 0, "+fafs+", r = "+str(ob.Radius2)+");\n")          
             if mm == 1 : csg.write("}\n")
         else : # Cannot convert to rotate extrude so best effort is polyhedron
-            csg.write('%s\n' % shape2polyhedron(ob.Shape))
+            writepolyhedron(csg,shape2mesh(ob.Shape))
 
     elif ob.TypeId == "Part::Prism":
         import math
@@ -239,7 +263,7 @@ def process_object(csg,ob):
     elif ob.isDerivedFrom('Part::Feature') :
         print "Part::Feature"
         mm = check_multmatrix(csg,ob,0,0,0)
-        csg.write('%s\n' % shape2polyhedron(ob.Shape))
+        writepolyhedron(csg,shape2mesh(ob.Shape))
         if mm == 1 : csg.write("}\n")
 
 def export(exportList,filename):
@@ -248,7 +272,7 @@ def export(exportList,filename):
     # process Objects
     print "\nStart Export 0.1d\n"
     print "Open Output File"
-    csg = pythonopen(filename,'w')
+    csg = pythonopen(filename,'w',1<<20)
     print "Write Inital Output"
     # Not sure if comments as per scad are allowed in csg file              
     csg.write("// CSG file generated from FreeCAD %s\n" % \
@@ -56,6 +56,16 @@ if open.__module__ == '__builtin__':
 import tokrules
 from tokrules import tokens
 
+# the lexer and the parser, built once by getParser()
+lexer = None
+parser = None
+# if True, the CSG tree is built with CSGNodes and evaluated at the end of the import
+collapsetree = False
+# [(seconds,node)] of the CSGNodes evaluated during the import
+nodetimings = []
+# the pool of processes computing booleans, started by getBooleanPool() for each import
+booleanpool = None
+
 def translate(context,text):
     "convenience function for Qt translator"
     from PySide import QtGui
@@ -111,19 +121,412 @@ def insert(filename,docname):
         pathName = os.path.dirname(os.path.normpath(filename))
         processcsg(filename)
 
+def getGrammarSignature():
+    "returns a hash of the token rules, of the grammar and of the PLY version"
+    import hashlib
+    pinfo = yacc.ParserReflect(globals())
+    pinfo.get_all()
+    sig = hashlib.md5(pinfo.signature())
+    for name in sorted(dir(tokrules)):
+        if name.startswith('t_') or name == 'tokens':
+            rule = getattr(tokrules,name)
+            if callable(rule):
+                rule = rule.__doc__
+            sig.update('%s=%s\n' % (name,rule))
+    sig.update(yacc.__version__)
+    return sig.hexdigest()
+
+def getTableDir():
+    "returns the user directory where the parser tables are cached, or None if it is not writable"
+    path = os.path.join(FreeCAD.getUserAppDataDir(),'OpenSCAD')
+    try:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    except OSError:
+        return None
+    if os.access(path,os.W_OK):
+        return path
+
+def getParser():
+    """getParser(): returns the lexer and the parser of CSG files. They are built
+    once per session, from tables cached in the user directory under the grammar
+    signature, so they are only generated again when the grammar changes"""
+    global lexer, parser
+    if parser is None:
+        tabledir = getTableDir()
+        if tabledir:
+            sig = getGrammarSignature()
+            # PLY imports the tables by module name
+            sys.path.insert(0,tabledir)
+            try:
+                if printverbose: print 'Start Lex'
+                lexer = lex.lex(module=tokrules,optimize=1,lextab='csglextab_'+sig,outputdir=tabledir)
+                if printverbose: print 'Load Parser'
+                # No debug out otherwise Linux has protection exception
+                parser = yacc.yacc(debug=0,optimize=1,tabmodule='csgparsetab_'+sig,outputdir=tabledir)
+            finally:
+                sys.path.remove(tabledir)
+        else:
+            lexer = lex.lex(module=tokrules)
+            parser = yacc.yacc(debug=0,write_tables=0)
+    return lexer,parser
+
+class CSGViewObject:
+    "records the view properties set on a CSGNode"
+
+    def hide(self):
+        self.Visibility = False
+
+class CSGNode:
+    '''stands for a document object of the CSG tree when the tree is collapsed.
+    The properties set on it are only recorded, the document objects are
+    created by addToDocument once the whole tree is known'''
+    # the types of the document objects replaced by CSGNodes. A Matrix node
+    # applies a general transformation matrix to its Source.
+    types = ['Part::Box','Part::Sphere','Part::Cylinder','Part::Cone','Part::Prism',
+             'Part::Plane','Part::Feature','Part::Fuse','Part::MultiFuse','Part::Cut',
+             'Part::Common','Part::MultiCommon','Part::Mirroring','Matrix']
+    # the attributes which are not properties of the document object
+    internal = ['TypeId','Name','ViewObject','Line','Computed']
+
+    def __init__(self,type,name):
+        self.TypeId = type
+        self.Name = name
+        # where the node ends in the CSG file, to find it in the timings report
+        self.Line = lexer.lineno
+        self.Label = name
+        self.Placement = FreeCAD.Placement()
+        self.ViewObject = CSGViewObject()
+
+    def getChildren(self):
+        "returns the CSGNodes or document objects whose shapes make the shape of this node"
+        t = self.TypeId
+        if t in ['Matrix','Part::Mirroring']:
+            return [self.Source]
+        elif t in ['Part::Fuse','Part::Cut','Part::Common']:
+            return [self.Base,self.Tool]
+        elif t in ['Part::MultiFuse','Part::MultiCommon']:
+            return self.Shapes
+        return []
+
+    def isBoolean(self):
+        return self.TypeId in ['Part::Fuse','Part::MultiFuse','Part::Cut','Part::Common','Part::MultiCommon']
+
+    def makeShape(self,shape=None):
+        '''returns the shape of a node which is not a boolean, from the shape of its
+        child if any'''
+        t = self.TypeId
+        if t == 'Part::Box':
+            shape = Part.makeBox(self.Length,self.Width,self.Height)
+        elif t == 'Part::Sphere':
+            shape = Part.makeSphere(self.Radius)
+        elif t == 'Part::Cylinder':
+            shape = Part.makeCylinder(self.Radius,self.Height)
+        elif t == 'Part::Cone':
+            shape = Part.makeCone(self.Radius1,self.Radius2,self.Height)
+        elif t == 'Part::Prism':
+            import math
+            angle = 2*math.pi/self.Polygon
+            nodes = [FreeCAD.Vector(self.Circumradius*math.cos(i*angle),\
+                self.Circumradius*math.sin(i*angle),0) for i in range(self.Polygon)]
+            nodes.append(nodes[0])
+            shape = Part.Face(Part.makePolygon(nodes)).extrude(FreeCAD.Vector(0,0,self.Height))
+        elif t == 'Part::Plane':
+            shape = Part.makePlane(self.Length,self.Width)
+        elif t == 'Part::Feature':
+            shape = self.Shape
+        elif t == 'Matrix':
+            shape = shape.transformGeometry(self.Matrix)
+        elif t == 'Part::Mirroring':
+            shape = shape.mirror(FreeCAD.Vector(),self.Normal)
+        return shape
+
+    def getShape(self):
+        "returns the shape of this node, see computeShapes"
+        if not hasattr(self,'Computed'):
+            computeShapes([self])
+        shape,error = self.Computed
+        if error:
+            raise error
+        return shape
+
+    def addToDocument(self,depth=0):
+        '''adds this node to the document, as a feature of its own type linking
+        its children added the same way if depth > 0, or as a Part::Feature
+        holding the shape of the whole node otherwise'''
+        if depth > 0 and self.TypeId != 'Matrix':
+            obj = doc.addObject(self.TypeId,self.Name)
+            # the placement of a Part::Feature is taken from its shape
+            props = sorted(self.__dict__.keys(),key=lambda prop: prop != 'Shape')
+            for prop in props:
+                if not prop in self.internal:
+                    value = getattr(self,prop)
+                    if isinstance(value,CSGNode):
+                        value = value.addToDocument(depth-1)
+                    elif isinstance(value,list):
+                        value = [toObject(v,depth-1) for v in value]
+                    setattr(obj,prop,value)
+        else:
+            obj = doc.addObject('Part::Feature',self.Name)
+            obj.Label = self.Label
+            try:
+                obj.Shape = self.getShape()
+            except Exception as e:
+                FreeCAD.Console.PrintError('Unable to compute %s: %s\n' % (self.Label,str(e)))
+        if gui:
+            for prop,value in self.ViewObject.__dict__.items():
+                setattr(obj.ViewObject,prop,value)
+        return obj
+
+def getBooleanPool():
+    '''getBooleanPool(): returns the pool of processes computing the booleans of
+    the collapsed CSG tree being imported, or None if they are computed in FreeCAD'''
+    global booleanpool
+    if booleanpool is None:
+        booleanpool = False
+        processes = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/OpenSCAD").\
+            GetInt('csgProcesses',1)
+        if processes != 1:
+            import Draft
+            booleanpool = Draft.getProcessPool(processes or None) or False
+            if not booleanpool:
+                FreeCAD.Console.PrintWarning("Unable to start the boolean processes, computing the booleans in FreeCAD\n")
+    return booleanpool or None
+
+def closeBooleanPool():
+    "closeBooleanPool(): terminates the boolean processes at the end of an import"
+    global booleanpool
+    if booleanpool:
+        booleanpool.terminate()
+        booleanpool.join()
+    booleanpool = None
+
+def booleanOperation(op,shape1,shape2):
+    "returns the fusion ('fuse'), the difference ('cut') or the intersection ('common') of two shapes"
+    if op == 'fuse':
+        return shape1.fuse(shape2)
+    elif op == 'cut':
+        return shape1.cut(shape2)
+    return shape1.common(shape2)
+
+def booleanWorker(args):
+    '''booleanWorker((op,brep1,brep2)): returns (brep,seconds) of booleanOperation(op)
+    on two breps and the time it took, or (None,error message) if it failed. Run by
+    the boolean processes'''
+    import time
+    op,brep1,brep2 = args
+    try:
+        starttime = time.time()
+        shape1 = Part.Shape()
+        shape1.importBrepFromString(brep1)
+        shape2 = Part.Shape()
+        shape2.importBrepFromString(brep2)
+        brep = booleanOperation(op,shape1,shape2).exportBrepToString()
+        return brep,time.time()-starttime
+    except Exception as e:
+        return None,str(e)
+
+def computeBooleans(booleans):
+    '''computeBooleans(booleans): returns [(shape,seconds)] or [(None,error message)]
+    of the booleanOperations given as [(op,shape1,shape2)]. They are independent,
+    and are computed together by the boolean processes if any'''
+    import time
+    pool = getBooleanPool()
+    if pool and len(booleans) > 1:
+        results = []
+        for brep,value in pool.map(booleanWorker,[(op,s1.exportBrepToString(),\
+                s2.exportBrepToString()) for op,s1,s2 in booleans]):
+            if brep is None:
+                results.append((None,value))
+            else:
+                shape = Part.Shape()
+                shape.importBrepFromString(brep)
+                results.append((shape,value))
+        return results
+    results = []
+    for op,s1,s2 in booleans:
+        try:
+            starttime = time.time()
+            shape = booleanOperation(op,s1,s2)
+            results.append((shape,time.time()-starttime))
+        except Exception as e:
+            results.append((None,str(e)))
+    return results
+
+def getLevels(nodes):
+    '''getLevels(nodes): returns the CSGNodes of the trees of the given nodes by
+    level, [[nodes]]: the leaves first, then the nodes whose children are all in
+    the former levels. The trees are walked without recursion'''
+    heights = {}
+    levels = []
+    stack = [(node,False) for node in nodes]
+    while stack:
+        node,expanded = stack.pop()
+        if id(node) in heights:
+            continue
+        # the nodes computed before are left out with their children
+        children = [c for c in node.getChildren() if isinstance(c,CSGNode) and not hasattr(c,'Computed')]
+        if expanded:
+            height = max([heights[id(c)] for c in children]+[-1])+1
+            heights[id(node)] = height
+            while len(levels) <= height:
+                levels.append([])
+            levels[height].append(node)
+        else:
+            stack.append((node,True))
+            stack.extend([(c,False) for c in children if not id(c) in heights])
+    return levels
+
+def computeShapes(nodes):
+    '''computeShapes(nodes): computes the shapes of the given CSGNodes and of
+    their children, stored as (shape,error) in their Computed attribute. The
+    trees are computed level by level from the leaves: the booleans of a level
+    are independent, and all of them (the pairs of the balanced reductions of
+    the fusions and intersections, and the cuts) are computed in one batch per
+    round by computeBooleans. Operands with disjoint bounding boxes are put in a
+    compound by a fusion, give an empty shape with an intersection, and leave
+    the base of a cut unchanged. The time spent on each node itself is recorded
+    in nodetimings'''
+    import time
+    refine = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Part/Boolean").\
+        GetBool("RefineModel",False)
+    def getInputs(node):
+        "returns the shapes of the children of node, raises the error of a failed child"
+        shapes = []
+        for child in node.getChildren():
+            if isinstance(child,CSGNode):
+                shape,error = child.Computed
+                if error:
+                    raise error
+                shapes.append(shape)
+            else:
+                shapes.append(child.Shape)
+        return shapes
+    for level in getLevels(nodes):
+        # [node,op,operands,seconds] of the booleans of this level
+        reductions = []
+        for node in level:
+            if hasattr(node,'Computed'):
+                continue
+            starttime = time.time()
+            try:
+                shapes = getInputs(node)
+                if node.isBoolean():
+                    if node.TypeId == 'Part::Cut':
+                        op = 'cut'
+                    elif node.TypeId in ['Part::Fuse','Part::MultiFuse']:
+                        op = 'fuse'
+                    else:
+                        op = 'common'
+                    reductions.append([node,op,shapes,time.time()-starttime])
+                    continue
+                node.Computed = (node.makeShape(*shapes[:1]),None)
+            except Exception as e:
+                node.Computed = (None,e)
+            nodetimings.append((time.time()-starttime,node))
+        while reductions:
+            booleans = []
+            for reduction in reductions:
+                node,op,shapes,seconds = reduction
+                reduced = []
+                for i in range(0,len(shapes)-1,2):
+                    s1,s2 = shapes[i],shapes[i+1]
+                    if s1.BoundBox.isIntersection(s2.BoundBox):
+                        reduced.append(len(booleans))
+                        booleans.append((op,s1,s2))
+                    elif op == 'fuse':
+                        reduced.append(Part.makeCompound([s1,s2]))
+                    elif op == 'cut':
+                        reduced.append(s1)
+                    else:
+                        reduced = [Part.makeCompound([])]
+                        break
+                else:
+                    if len(shapes) % 2:
+                        reduced.append(shapes[-1])
+                reduction[2] = reduced
+            results = computeBooleans(booleans)
+            remaining = []
+            for reduction in reductions:
+                node,op,shapes,seconds = reduction
+                error = None
+                reduced = []
+                for s in shapes:
+                    if isinstance(s,int):
+                        shape,value = results[s]
+                        if shape is None:
+                            error = value
+                        else:
+                            seconds += value
+                        s = shape
+                    reduced.append(s)
+                reduction[2:] = [reduced,seconds]
+                if error:
+                    node.Computed = (None,RuntimeError(error))
+                elif len(reduced) > 1:
+                    remaining.append(reduction)
+                    continue
+                else:
+                    starttime = time.time()
+                    try:
+                        shape = reduced[0]
+                        if refine:
+                            shape = shape.removeSplitter()
+                        shape.Placement = node.Placement.multiply(shape.Placement)
+                        node.Computed = (shape,None)
+                    except Exception as e:
+                        node.Computed = (None,e)
+                    seconds += time.time()-starttime
+                nodetimings.append((seconds,node))
+            reductions = remaining
+
+def addObject(type,name):
+    '''addObject(type,name): adds an object to the document, or returns a CSGNode
+    standing for it if the CSG tree is collapsed'''
+    if collapsetree and type in CSGNode.types:
+        return CSGNode(type,name)
+    return doc.addObject(type,name)
+
+def getShapeNodes(objs,depth=0):
+    '''getShapeNodes(objs,[depth]): returns the CSGNodes added as Part::Features
+    holding their whole shape when the given objects are added to the document
+    with toObject(obj,depth)'''
+    nodes = []
+    stack = [(obj,depth) for obj in objs]
+    while stack:
+        obj,d = stack.pop()
+        if isinstance(obj,CSGNode):
+            if d > 0 and obj.TypeId != 'Matrix':
+                stack.extend([(child,d-1) for child in obj.getChildren()])
+            else:
+                nodes.append(obj)
+    return nodes
+
+def toObject(obj,depth=0):
+    "returns the given object, added to the document first if it is a CSGNode"
+    if isinstance(obj,CSGNode):
+        return obj.addToDocument(depth)
+    return obj
+
+def toObjects(objs):
+    '''toObjects(objs): returns the given objects, the CSGNodes among them being
+    added to the document as single Part::Features. Used by the features
+    which have to link document objects'''
+    if not [obj for obj in objs if isinstance(obj,CSGNode)]:
+        return objs
+    # the shapes of the document objects in the nodes are needed
+    doc.recompute()
+    computeShapes([obj for obj in objs if isinstance(obj,CSGNode)])
+    return [toObject(obj) for obj in objs]
+
 def processcsg(filename):
-    global doc
+    global doc, collapsetree
     
     if printverbose: print 'ImportCSG Version 0.5d'
-    # Build the lexer
-    if printverbose: print 'Start Lex'
-    lex.lex(module=tokrules)
-    if printverbose: print 'End Lex'
-
-    # Build the parser   
-    if printverbose: print 'Load Parser'
-    # No debug out otherwise Linux has protection exception
-    parser = yacc.yacc(debug=0)
+    collapsetree = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/OpenSCAD").\
+        GetBool('collapseCSGTree')
+    del nodetimings[:]
+    lexer,parser = getParser()
     if printverbose: print 'Parser Loaded'
     # Give the lexer some input
     #f=open('test.scad', 'r')
@@ -131,13 +534,32 @@ def processcsg(filename):
     #lexer.input(f.read())
 
     if printverbose: print 'Start Parser'
-    # Swap statements to enable Parser debugging
-    #result = parser.parse(f.read(),debug=1)
-    result = parser.parse(f.read())
-    f.close()
-    if printverbose:
-        print 'End Parser'
-        print result  
+    lexer.lineno = 1
+    try:
+        # Swap statements to enable Parser debugging
+        #result = parser.parse(f.read(),lexer=lexer,debug=1)
+        result = parser.parse(f.read(),lexer=lexer)
+        f.close()
+        if printverbose:
+            print 'End Parser'
+            print result  
+        if collapsetree and result:
+            depth = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/OpenSCAD").\
+                GetInt('collapseCSGTreeDepth')
+            doc.recompute()
+            # the independent subtrees are computed together
+            computeShapes(getShapeNodes(result,depth))
+            for obj in result:
+                toObject(obj,depth)
+            if nodetimings:
+                FreeCAD.Console.PrintMessage('Slowest CSG nodes:\n')
+                for t,node in sorted(nodetimings,key=lambda timing: timing[0],reverse=True)[:10]:
+                    FreeCAD.Console.PrintMessage('    %s (%s) ending at line %i: %.3fs\n' \
+                        % (node.Label,node.TypeId,node.Line,t))
+                del nodetimings[:]
+    finally:
+        # the next import starts its own pool, with the preferences of that time
+        closeBooleanPool()
     FreeCAD.Console.PrintMessage('End processing CSG file\n')
     doc.recompute()
 
@@ -342,6 +764,7 @@ def p_operation(p):
 
 def placeholder(name,children,arguments):
     from OpenSCADFeatures import OpenSCADPlaceholder
+    children = toObjects(children)
     newobj=doc.addObject("Part::FeaturePython",name)
     OpenSCADPlaceholder(newobj,children,str(arguments))
     if gui:
@@ -355,6 +778,7 @@ def placeholder(name,children,arguments):
     return newobj
 
 def CGALFeatureObj(name,children,arguments=[]):
+    children = toObjects(children)
     myobj=doc.addObject("Part::FeaturePython",name)
     CGALFeature(myobj,name,children,str(arguments))
     if gui:
@@ -465,14 +889,14 @@ def fuse(lst,name):
     # Is this Multi Fuse
     elif len(lst) > 2:
        if printverbose: print "Multi Fuse"
-       myfuse = doc.addObject('Part::MultiFuse',name)
+       myfuse = addObject('Part::MultiFuse',name)
        myfuse.Shapes = lst
        if gui:
            for subobj in myfuse.Shapes:
                subobj.ViewObject.hide()
     else:
        if printverbose: print "Single Fuse"
-       myfuse = doc.addObject('Part::Fuse',name)
+       myfuse = addObject('Part::Fuse',name)
        myfuse.Base = lst[0]
        myfuse.Tool = lst[1]
        if gui:
@@ -500,7 +924,7 @@ def p_difference_action(p):
         p[0] = p[5]
     else:
 # Cut using Fuse    
-        mycut = doc.addObject('Part::Cut',p[1])
+        mycut = addObject('Part::Cut',p[1])
         mycut.Base = p[5][0]
 #       Can only Cut two objects do we need to fuse extras
         if (len(p[5]) > 2 ):
@@ -522,14 +946,14 @@ def p_intersection_action(p):
     # Is this Multi Common
     if (len(p[5]) > 2):
        if printverbose: print "Multi Common"
-       mycommon = doc.addObject('Part::MultiCommon',p[1])
+       mycommon = addObject('Part::MultiCommon',p[1])
        mycommon.Shapes = p[5]
        if gui:
            for subobj in mycommon.Shapes:
                subobj.ViewObject.hide()
     elif (len(p[5]) == 2):
        if printverbose: print "Single Common"
-       mycommon = doc.addObject('Part::Common',p[1])
+       mycommon = addObject('Part::Common',p[1])
        mycommon.Base = p[5][0]
        mycommon.Tool = p[5][1]
        if gui:
@@ -543,6 +967,7 @@ def p_intersection_action(p):
     if printverbose: print "End Intersection"
 
 def process_rotate_extrude(obj):
+    obj = toObjects([obj])[0]
     newobj=doc.addObject("Part::FeaturePython",'RefineRotateExtrude')
     RefineShape(newobj,obj)
     if gui:
@@ -582,6 +1007,7 @@ def p_rotate_extrude_file(p):
     if printverbose: print "End Rotate Extrude File"
 
 def process_linear_extrude(obj,h) :
+    obj = toObjects([obj])[0]
     #if gui:
     newobj=doc.addObject("Part::FeaturePython",'RefineLinearExtrude')
     RefineShape(newobj,obj)#mylinear)
@@ -604,6 +1030,7 @@ def process_linear_extrude(obj,h) :
     return(mylinear)
 
 def process_linear_extrude_with_twist(base,height,twist) :   
+    base = toObjects([base])[0]
     newobj=doc.addObject("Part::FeaturePython",'twist_extrude')
     Twist(newobj,base,height,-twist) #base is an FreeCAD Object, heigth and twist are floats
     if gui:
@@ -764,7 +1191,7 @@ def p_multmatrix_action(p):
     elif isrotoinversionpython(fcsubmatrix(transform_matrix)):
         if printverbose: print "orthogonal and inversion"
         cmat,axisvec = decomposerotoinversion(transform_matrix)
-        new_part=doc.addObject("Part::Mirroring",'mirr_%s'%part.Name)
+        new_part=addObject("Part::Mirroring",'mirr_%s'%part.Name)
         new_part.Source=part
         new_part.Normal=axisvec
         if matrixisrounded:
@@ -779,6 +1206,7 @@ def p_multmatrix_action(p):
     elif FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/OpenSCAD").\
         GetBool('useMultmatrixFeature'):
         from OpenSCADFeatures import MatrixTransform
+        part = toObjects([part])[0]
         new_part=doc.addObject("Part::FeaturePython",'Matrix Deformation')
         MatrixTransform(new_part,transform_matrix,part)
         if gui:
@@ -789,6 +1217,19 @@ def p_multmatrix_action(p):
             else:
                 new_part.ViewObject.Proxy = 0
             part.ViewObject.hide()
+    elif collapsetree:
+        if printverbose: print "Deferred Transform Geometry"
+        if isinstance(part,CSGNode) and part.TypeId == 'Matrix':
+            # successive deformations are applied at once
+            part.Matrix = transform_matrix.multiply(part.Placement.toMatrix()).multiply(part.Matrix)
+            part.Placement = FreeCAD.Placement()
+            new_part = part
+        else:
+            new_part = CSGNode('Matrix','Matrix Deformation')
+            new_part.Source = part
+            new_part.Matrix = transform_matrix
+            if gui:
+                part.ViewObject.hide()
     else :
         if printverbose: print "Transform Geometry"
 #       Need to recompute to stop transformGeometry causing a crash        
@@ -829,7 +1270,7 @@ def p_sphere_action(p):
     'sphere_action : sphere LPAREN keywordargument_list RPAREN SEMICOL'
     if printverbose: print "Sphere : ",p[3]
     r = float(p[3]['r'])
-    mysphere = doc.addObject("Part::Sphere",p[1])
+    mysphere = addObject("Part::Sphere",p[1])
     mysphere.Radius = r
     if printverbose: print "Push Sphere"
     p[0] = [mysphere]
@@ -867,7 +1308,7 @@ def p_cylinder_action(p):
         if ( r1 == r2 and r1 > 0):
             if printverbose: print "Make Cylinder"
             if n < 3 or fnmax != 0 and n > fnmax:
-                mycyl=doc.addObject("Part::Cylinder",p[1])
+                mycyl=addObject("Part::Cylinder",p[1])
                 mycyl.Height = h
                 mycyl.Radius = r1
             else :
@@ -891,7 +1332,7 @@ def p_cylinder_action(p):
                     if gui:
                         mycyl.Base.ViewObject.hide()
                 else: #Use Part::Prism primitive
-                    mycyl=doc.addObject("Part::Prism","prism")
+                    mycyl=addObject("Part::Prism","prism")
                     mycyl.Polygon = n
                     mycyl.Circumradius  = r1
                     mycyl.Height  = h
@@ -899,7 +1340,7 @@ def p_cylinder_action(p):
         elif (r1 != r2):
             if n < 3 or fnmax != 0 and n > fnmax:
                 if printverbose: print "Make Cone"
-                mycyl=doc.addObject("Part::Cone",p[1])
+                mycyl=addObject("Part::Cone",p[1])
                 mycyl.Height = h
                 mycyl.Radius1 = r1
                 mycyl.Radius2 = r2
@@ -916,11 +1357,11 @@ def p_cylinder_action(p):
                         mycyl.ViewObject.Proxy = 0
         else: # r1 == r2 == 0
             FreeCAD.Console.PrintWarning('cylinder with radius zero\n')
-            mycyl=doc.addObject("Part::Feature","emptycyl")
+            mycyl=addObject("Part::Feature","emptycyl")
             mycyl.Shape = Part.Compound([])
     else: # h == 0
         FreeCAD.Console.PrintWarning('cylinder with height <= zero\n')
-        mycyl=doc.addObject("Part::Feature","emptycyl")
+        mycyl=addObject("Part::Feature","emptycyl")
         mycyl.Shape = Part.Compound([])
     if printverbose: print "Center = ",tocenter
     if tocenter=='true' :
@@ -948,13 +1389,13 @@ def p_cube_action(p):
     l,w,h = [float(str1) for str1 in p[3]['size']]
     if (l > 0 and w > 0 and h >0):
         if printverbose: print "cube : ",p[3]
-        mycube=doc.addObject('Part::Box',p[1])
+        mycube=addObject('Part::Box',p[1])
         mycube.Length=l
         mycube.Width=w
         mycube.Height=h
     else:
         FreeCAD.Console.PrintWarning('cube with radius zero\n')
-        mycube=doc.addObject("Part::Feature","emptycube")
+        mycube=addObject("Part::Feature","emptycube")
         mycube.Shape = Part.Compound([])
     if p[3]['center']=='true' :
        center(mycube,l,w,h);
@@ -999,7 +1440,7 @@ def p_square_action(p) :
     size = p[3]['size']
     x = float(size[0])
     y = float(size[1])
-    mysquare = doc.addObject('Part::Plane',p[1])
+    mysquare = addObject('Part::Plane',p[1])
     mysquare.Length=x
     mysquare.Width=y
     if p[3]['center']=='true' :
@@ -1020,7 +1461,7 @@ def p_polygon_action_nopath(p) :
     if printverbose: print "Polygon"
     if printverbose: print p[6]
     v = convert_points_list_to_vector(p[6])
-    mypolygon = doc.addObject('Part::Feature',p[1])
+    mypolygon = addObject('Part::Feature',p[1])
     if printverbose: print "Make Parts"
     # Close Polygon
     v.append(v[0])
@@ -1038,7 +1479,7 @@ def p_polygon_action_plus_path(p) :
     if printverbose: print p[12]
     for i in p[12] :
          if printverbose: print i
-         mypolygon = doc.addObject('Part::Feature','wire')
+         mypolygon = addObject('Part::Feature','wire')
          path_list = []
          for j in i :
              j = int(j)
@@ -1053,30 +1494,27 @@ def p_polygon_action_plus_path(p) :
          p[0] = [mypolygon]
 #        This only pushes last polygon
 
-def make_face(v1,v2,v3):
-    wire = Part.makePolygon([v1,v2,v3,v1])
-    face = Part.Face(wire)
-    return face
-
 def p_polyhedron_action(p) :
     '''polyhedron_action : polyhedron LPAREN points EQ OSQUARE points_list_3d ESQUARE COMMA faces EQ OSQUARE points_list_3d ESQUARE COMMA keywordargument_list RPAREN SEMICOL
                       | polyhedron LPAREN points EQ OSQUARE points_list_3d ESQUARE COMMA triangles EQ OSQUARE points_list_3d ESQUARE COMMA keywordargument_list RPAREN SEMICOL'''
     if printverbose: print "Polyhedron Points"
-    v = []
-    for i in p[6] :
-        if printverbose: print i
-        v.append(FreeCAD.Vector(float(i[0]),float(i[1]),float(i[2])))
+    v = [FreeCAD.Vector(float(i[0]),float(i[1]),float(i[2])) for i in p[6]]
+    triangles = [(int(i[0]),int(i[1]),int(i[2])) for i in p[12]]
     if printverbose:
         print v
         print "Polyhedron triangles"
-        print p[12]
-    faces_list = []    
-    mypolyhed = doc.addObject('Part::Feature',p[1])
-    for i in p[12] :
-        if printverbose: print i
-        f = make_face(v[int(i[0])],v[int(i[1])],v[int(i[2])])
-        faces_list.append(f)
-    shell=Part.makeShell(faces_list)
+        print triangles
+    mypolyhed = addObject('Part::Feature',p[1])
+    # one mesh to shape conversion, sewing all the triangles at once. The points
+    # of the triangles closer than polyhedronTolerance (preferences) are merged,
+    # or closer than sewPolyhedraTolerance if sewPolyhedra is set, to close the
+    # gaps left between the triangles
+    param = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/OpenSCAD")
+    tolerance = param.GetFloat('polyhedronTolerance',1e-7)
+    if param.GetBool('sewPolyhedra'):
+        tolerance = max(tolerance,param.GetFloat('sewPolyhedraTolerance',1e-4))
+    shell = Part.Shape()
+    shell.makeShapeFromMesh((v,triangles),tolerance)
     solid=Part.Solid(shell).removeSplitter()
     if solid.Volume < 0:
         solid.reverse()
@@ -1090,7 +1528,7 @@ def p_projection_action(p) :
         planedim=1e9 # large but finite
         #inifinite planes look bad in the GUI
         planename='xy_plane_used_for_project_cut'
-        obj=doc.addObject('Part::MultiCommon','projection_cut')
+        obj=addObject('Part::MultiCommon','projection_cut')
         plane = doc.getObject(planename)
         if not plane:
             plane=doc.addObject("Part::Plane",planename)